@@ -0,0 +1,32 @@
+# token_extractor.py
+"""
+token 观察 (SlayTheSpireEnv(obs_mode="tokens")) 的特征提取器
+卡牌/怪物/意图 id 各查一张嵌入表 (0 号是空位，固定为 0 向量)，和稠密数值块拼在一起交给策略网络。
+第一层从 "1000+ 维稀疏输入 x 512" 变成 "两百来维 x 512"，嵌入表还能让相似的卡学到相近的表示。
+
+    policy_kwargs = dict(features_extractor_class=TokenExtractor, net_arch=[512, 512])
+    model = MaskablePPO("MultiInputPolicy", env, policy_kwargs=policy_kwargs)
+"""
+import torch as th
+from torch import nn
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+
+class TokenExtractor(BaseFeaturesExtractor):
+    def __init__(self, observation_space, card_dim=16, monster_dim=8, intent_dim=4):
+        spaces = observation_space.spaces
+        n_cards = spaces["cards"].shape[0]
+        n_monsters = spaces["monsters"].shape[0]
+        dense_size = spaces["dense"].shape[0]
+        features_dim = n_cards * card_dim + n_monsters * (monster_dim + intent_dim) + dense_size
+        super().__init__(observation_space, features_dim)
+        # 词表大小 = Box 上限 + 1 (含 0 号空位)
+        self.card_emb = nn.Embedding(int(spaces["cards"].high.max()) + 1, card_dim, padding_idx=0)
+        self.monster_emb = nn.Embedding(int(spaces["monsters"].high.max()) + 1, monster_dim, padding_idx=0)
+        self.intent_emb = nn.Embedding(int(spaces["intents"].high.max()) + 1, intent_dim, padding_idx=0)
+
+    def forward(self, obs):
+        # rollout buffer 里 id 存成 float，这里转回整数下标
+        cards = self.card_emb(obs["cards"].long()).flatten(1)
+        monsters = self.monster_emb(obs["monsters"].long()).flatten(1)
+        intents = self.intent_emb(obs["intents"].long()).flatten(1)
+        return th.cat([cards, monsters, intents, obs["dense"].float()], dim=1)
@@ -0,0 +1,83 @@
+# bench_decode.py
+"""
+[基准测试] 不同 JSON 后端解码 CommunicationMod 状态的耗时
+用法 (在项目根目录):
+    python benchmarks/bench_decode.py
+会按牌堆大小构造从开局到后期的几档状态，输出每档状态的体积和各后端的单次解码耗时。
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spire_env.codec import available_decoders, get_decoder
+from spire_env.vocabulary import IRONCLAD_CARDS
+
+def make_card(i):
+    card_id = IRONCLAD_CARDS[i % len(IRONCLAD_CARDS)]
+    return {
+        "id": card_id, "name": card_id, "uuid": f"{i:08x}-0000-0000-0000-000000000000",
+        "cost": i % 4, "type": ["ATTACK", "SKILL", "POWER"][i % 3], "rarity": "COMMON",
+        "upgrades": i % 2, "has_target": i % 2 == 0, "is_playable": True, "exhausts": False,
+    }
+
+def make_state(pile_size):
+    """构造一个战斗中的状态，pile_size 控制抽牌堆/弃牌堆/消耗堆/牌组的大小"""
+    cards = [make_card(i) for i in range(pile_size)]
+    return {
+        "available_commands": ["play", "end", "potion", "key", "click", "wait", "state"],
+        "ready_for_command": True,
+        "in_game": True,
+        "game_state": {
+            "screen_type": "NONE", "room_phase": "COMBAT", "floor": 40, "act": 3,
+            "gold": 350, "current_hp": 55, "max_hp": 90, "class": "IRONCLAD",
+            "deck": cards,
+            "relics": [{"id": f"Relic{i}", "name": f"Relic{i}", "counter": -1} for i in range(20)],
+            "potions": [{"id": "Fire Potion", "name": "Fire Potion", "can_use": True,
+                         "can_discard": True, "requires_target": True}] * 3,
+            "map": [{"x": x, "y": y, "symbol": "M", "children": [{"x": x, "y": y + 1}], "parents": []}
+                    for x in range(7) for y in range(15)],
+            "combat_state": {
+                "turn": 5, "cards_discarded_this_turn": 0,
+                "player": {"current_hp": 55, "max_hp": 90, "block": 12, "energy": 3,
+                           "powers": [{"id": "Strength", "name": "Strength", "amount": 3}]},
+                "hand": cards[:10],
+                "draw_pile": cards,
+                "discard_pile": cards,
+                "exhaust_pile": cards[: pile_size // 2],
+                "monsters": [{"id": "Darkling", "name": "Darkling", "current_hp": 40, "max_hp": 50,
+                              "block": 0, "intent": "ATTACK", "move_adjusted_damage": 9,
+                              "is_gone": False, "half_dead": False, "powers": []}] * 3,
+            },
+        },
+    }
+
+def bench(loads, line, min_time=0.3):
+    """重复解码直到累计超过 min_time 秒，返回单次耗时 (微秒)"""
+    n = 0
+    start = time.perf_counter()
+    while True:
+        loads(line)
+        n += 1
+        elapsed = time.perf_counter() - start
+        if elapsed > min_time:
+            return elapsed / n * 1e6
+
+def main():
+    backends = available_decoders()
+    print(f"可用后端: {backends}")
+    header = f"{'pile':>6} {'size(KB)':>10} " + " ".join(f"{b + '(us)':>14}" for b in backends)
+    print(header)
+    print("-" * len(header))
+    for pile_size in [10, 50, 100, 200, 400, 800]:
+        line = json.dumps(make_state(pile_size)).encode('utf-8')
+        cols = []
+        for b in backends:
+            _, loads = get_decoder(b)
+            cols.append(f"{bench(loads, line):>14.1f}")
+        print(f"{pile_size:>6} {len(line) / 1024:>10.1f} " + " ".join(cols))
+
+if __name__ == '__main__':
+    main()
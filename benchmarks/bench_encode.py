@@ -0,0 +1,60 @@
+# bench_encode.py
+"""
+[基准测试] 观察编码耗时：逐个 encode_state vs 批量 encode_states vs 逐步 IncrementalEncoder
+状态取自 SimGame 随机对局 (开局/战斗/奖励界面混合) 和 bench_decode 构造的后期大牌堆战斗状态。
+用法 (在项目根目录):
+    python benchmarks/bench_encode.py --states 4000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_decode import make_state
+from spire_env.sim.combat import SimGame
+from utils.state_encoder import encode_state, encode_states, IncrementalEncoder
+from utils.action_mapper import ActionMapper
+
+def sim_states(n, seed):
+    rng = random.Random(seed)
+    mapper = ActionMapper()
+    game = SimGame(seed=seed)
+    state = game.handle("start")
+    states = []
+    while len(states) < n:
+        states.append(state)
+        valid = [i for i, ok in enumerate(mapper.get_mask(state)) if ok]
+        state = game.handle(mapper.decode_action(rng.choice(valid), state) or "state")
+    return states
+
+def per_state_us(fn, states, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(states)
+        best = min(best, time.perf_counter() - start)
+    return best / len(states) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--states", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    suites = {
+        "sim": sim_states(args.states, args.seed),
+        "pile=50": [make_state(50) for _ in range(args.states)],
+    }
+    for name, states in suites.items():
+        single = per_state_us(lambda ss: [encode_state(s) for s in ss], states)
+        batch = per_state_us(encode_states, states)
+        incremental = per_state_us(lambda ss: [enc.encode(s) for enc in [IncrementalEncoder()] for s in ss], states)
+        print(f"{name:>8}: encode_state {single:6.1f} us/个   encode_states {batch:6.1f} us/个   "
+              f"incremental {incremental:6.1f} us/个")
+
+if __name__ == '__main__':
+    main()
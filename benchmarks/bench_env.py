@@ -0,0 +1,51 @@
+# bench_env.py
+"""
+[基准测试] SlayTheSpireEnv 在本地替身游戏上的 steps/秒
+不需要启动游戏，用 mock_server 的内置剧本 (或录好的 trace) 代替。
+用法 (在项目根目录):
+    python benchmarks/bench_env.py --steps 500 --latency 0.002
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spire_env.env import SlayTheSpireEnv
+from spire_env.mock_server import connect_mock, ScriptedGame, TraceReplayGame
+from spire_env.logic.navigator import navigator_for
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="替身每条指令的响应延迟 (秒)")
+    parser.add_argument("--trace", default=None, help="用 trace 回放代替内置剧本")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    game = TraceReplayGame(args.trace, loop=True) if args.trace else ScriptedGame.demo()
+    conn = connect_mock(game, latency=args.latency, log_filename="bench_env_log.txt", mailbox=True)
+    env = SlayTheSpireEnv(conn=conn)
+
+    env.reset()
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        valid = [i for i, ok in enumerate(env.action_masks()) if ok]
+        _, _, done, truncated, _ = env.step(rng.choice(valid))
+        if done or truncated:
+            episodes += 1
+            env.reset()
+    elapsed = time.perf_counter() - start
+
+    print(f"steps={args.steps} episodes={episodes} 用时 {elapsed:.2f}s -> {args.steps / elapsed:.1f} steps/s")
+    print(f"替身处理指令 {conn.mock_server.commands} 条 | state 请求: {conn.state_stats()} | "
+          f"丢弃过期状态 {conn.dropped_states} | 丢失响应 {conn.lost_responses}")
+    print(f"导航统计 (按屏幕): {navigator_for(conn).stats()}")
+    conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# bench_inference.py
+"""
+[基准测试] 多个 env 线程各自单条 model.predict vs 交给 InferenceServer 攒批
+观察和掩码取自 BatchedCombat，模型是随机初始化的 MaskablePPO (只测前向开销)。
+用法 (在项目根目录):
+    python benchmarks/bench_inference.py --workers 32 --rounds 100
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sb3_contrib import MaskablePPO
+from spire_env.sim.batched import BatchedCombat
+from spire_env.sim.vec_env import BatchedSimVecEnv
+from spire_env.inference import InferenceServer
+
+def bench_single(model, obs, masks, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for i in range(len(obs)):
+            model.predict(obs[i], action_masks=masks[i], deterministic=True)
+    return len(obs) * rounds / (time.perf_counter() - start)
+
+def bench_server(model, obs, masks, rounds, max_wait):
+    with InferenceServer(model, max_batch=len(obs), max_wait=max_wait) as server:
+        def worker(i):
+            for _ in range(rounds):
+                server.predict(obs[i], masks[i])
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(obs))]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    return len(obs) * rounds / elapsed, server.stats()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--max-wait", type=float, default=0.002)
+    args = parser.parse_args()
+
+    torch.set_num_threads(1) # 模拟单核评估节点
+    model = MaskablePPO("MlpPolicy", BatchedSimVecEnv(2), device="cpu", policy_kwargs=dict(net_arch=[512, 512]))
+    sim = BatchedCombat(args.workers, seed=0)
+    obs, masks = sim.observe(), sim.action_masks()
+
+    print(f"single  : {bench_single(model, obs, masks, args.rounds):>8.0f} predicts/s")
+    rate, stats = bench_server(model, obs, masks, args.rounds, args.max_wait)
+    print(f"server  : {rate:>8.0f} predicts/s {stats}")
+
+if __name__ == '__main__':
+    main()
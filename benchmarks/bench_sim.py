@@ -0,0 +1,64 @@
+# bench_sim.py
+"""
+[基准测试] 战斗模拟器吞吐 (随机合法动作)
+  - dict:    SimGame.handle + encode_state + get_mask，一次一步
+  - batched: BatchedCombat，N 场一起走，观察直接出 (N, SIZE) 矩阵
+用法 (在项目根目录):
+    python benchmarks/bench_sim.py --seconds 5 --envs 1024
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spire_env.sim.combat import SimGame
+from spire_env.sim.batched import BatchedCombat
+from utils.state_encoder import encode_state
+from utils.action_mapper import ActionMapper
+
+def bench_dict(seconds, seed):
+    rng = random.Random(seed)
+    mapper = ActionMapper()
+    game = SimGame(seed=seed)
+    state = game.handle("start")
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        valid = [i for i, ok in enumerate(mapper.get_mask(state)) if ok]
+        state = game.handle(mapper.decode_action(rng.choice(valid), state) or "state")
+        encode_state(state)
+        steps += 1
+    return steps / (time.perf_counter() - start)
+
+def bench_batched(seconds, n, seed):
+    rng = np.random.default_rng(seed)
+    sim = BatchedCombat(n, seed=seed)
+    obs = sim.observe()
+    steps = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        masks = sim.action_masks()
+        actions = (rng.random(masks.shape) * masks).argmax(axis=1)
+        _, terminated, truncated, _ = sim.step(actions)
+        sim.reset_where(terminated | truncated)
+        sim.observe(obs)
+        steps += n
+    return steps / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--envs", type=int, default=1024, help="batched 模式的并行场数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"dict    : {bench_dict(args.seconds, args.seed):>10.0f} steps/s")
+    print(f"batched : {bench_batched(args.seconds, args.envs, args.seed):>10.0f} steps/s (N={args.envs})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# bench_state.py
+"""
+[基准测试] GameState 视图：建视图的耗时、各消费者 (掩码/解码/奖励/编码) 在视图上的耗时，
+以及 env 保存一条状态时常驻的内存 (原始 dict vs 视图，原始 dict 丢掉之后)。
+用法 (在项目根目录):
+    python benchmarks/bench_state.py --states 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_decode import make_state
+from bench_encode import sim_states, per_state_us
+from spire_env.state import GameState
+from spire_env.logic.reward import calculate_reward
+from utils.state_encoder import encode_state
+from utils.action_mapper import ActionMapper
+
+def consumers(mapper):
+    """env.step 里每一步对同一条状态做的事"""
+    def run(states):
+        prev = None
+        for s in states:
+            mapper.get_mask(s)
+            mapper.decode_action(0, s)
+            calculate_reward(prev, s)
+            encode_state(s)
+            prev = s
+    return run
+
+def retained_bytes(lines, keep):
+    """解码每一行、只留下 keep(dict) 的结果，返回平均每条常驻的字节数"""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = [keep(json.loads(line)) for line in lines]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+    return used / len(lines)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--states", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mapper = ActionMapper()
+    suites = {
+        "sim": sim_states(args.states, args.seed),
+        "pile=50": [make_state(50) for _ in range(args.states)],
+    }
+    for name, raws in suites.items():
+        parse = per_state_us(lambda ss: [GameState.parse(s) for s in ss], raws)
+        views = [GameState.parse(s) for s in raws]
+        on_views = per_state_us(consumers(mapper), views)
+        lines = [json.dumps(s) for s in raws[:500]]
+        raw_b = retained_bytes(lines, lambda d: d)
+        view_b = retained_bytes(lines, GameState.parse)
+        print(f"{name:>8}: 建视图 {parse:5.1f} us/条   视图上跑全部消费者 {on_views:6.1f} us/条   "
+              f"常驻内存 dict {raw_b / 1024:6.1f} KB -> 视图 {view_b / 1024:6.1f} KB")
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,8 @@ from sb3_contrib.common.wrappers import ActionMasker
 from stable_baselines3.common.logger import configure
 from stable_baselines3.common.callbacks import CheckpointCallback
 from spire_env.env import SlayTheSpireEnv
+from spire_env.broker import make_broker_vec_env
+from agents.token_extractor import TokenExtractor
 n_steps = 2048
 # --- [新增] 自定义回调函数：存档并写日志 ---
 class SmartCheckpointCallback(CheckpointCallback):
@@ -51,22 +53,37 @@ def main():
     latest_model_path = os.path.join(models_dir, "spire_ai_latest.zip")
 
     # --- 2. 创建环境 ---
-    env = SlayTheSpireEnv()
-    env = ActionMasker(env, mask_fn)
+    # SPIRE_NUM_GAMES > 1 时进入多实例模式：本脚本从终端启动，
+    # 每个游戏的 CommunicationMod 拉起 spire_env/relay.py，经 socket 连到这里 (见 broker.py)
+    num_games = int(os.environ.get("SPIRE_NUM_GAMES", "1"))
+    # SPIRE_OBS_MODE=tokens：Dict 观察 (卡/怪/意图 id + 稠密数值块)，策略用嵌入层 (TokenExtractor)
+    obs_mode = os.environ.get("SPIRE_OBS_MODE", "dense")
+    if num_games > 1:
+        print(f">>> 多实例模式：等待 {num_games} 个游戏的 relay 连入...")
+        env = make_broker_vec_env(num_games, obs_mode=obs_mode)
+        conn = env.envs[0].conn
+    else:
+        env = SlayTheSpireEnv(obs_mode=obs_mode)
+        env = ActionMasker(env, mask_fn)
+        conn = env.conn
     try:
         num_envs = env.num_envs
-        env.conn.log(f"【PPO 更新检查】检测到环境数量: {num_envs}")
-        env.conn.log(f"【PPO 更新检查】总收集步数阈值: {model.n_steps * num_envs}")
+        conn.log(f"【PPO 更新检查】检测到环境数量: {num_envs}")
+        conn.log(f"【PPO 更新检查】总收集步数阈值: {n_steps * num_envs}")
     except AttributeError:
         # 如果不是 VecEnv，会抛出 AttributeError，通常 num_envs = 1
-        env.conn.log(f"【PPO 更新检查】环境为单实例 (num_envs = 1)。阈值为 {n_steps} 步。")
+        conn.log(f"【PPO 更新检查】环境为单实例 (num_envs = 1)。阈值为 {n_steps} 步。")
     # --- 3. 模型加载/初始化 ---
     model = None
     reset_timesteps = True
 
+    if obs_mode == "tokens":
+        # 两种观察的网络结构不同，存档分开
+        latest_model_path = os.path.join(models_dir, "spire_ai_tokens_latest.zip")
+
     if os.path.exists(latest_model_path):
         try:
-            env.conn.log(f"检测到存档，正在加载: {latest_model_path}")
+            conn.log(f"检测到存档，正在加载: {latest_model_path}")
             model = MaskablePPO.load(latest_model_path, env=env)
             reset_timesteps = False
             print(">>> 模型加载完毕，继续之前的训练进度 <<<")
@@ -76,8 +93,13 @@ def main():
 
     if model is None:
         print("初始化新模型...")
+        policy_kwargs = dict(
+            net_arch=[512, 512] # 网络加宽。输入有1200维，256的层有点窄了，建议 512x512
+        )
+        if obs_mode == "tokens":
+            policy_kwargs["features_extractor_class"] = TokenExtractor
         model = MaskablePPO(
-            "MlpPolicy",
+            "MultiInputPolicy" if obs_mode == "tokens" else "MlpPolicy",
             env,
             verbose=1,
             device="cuda",          # 确保你有 GPU，没有就写 "cpu"
@@ -93,9 +115,7 @@ def main():
             
             batch_size=256,         # 稍微加大 Batch
             n_steps=n_steps,           # 每次收集更多步数再更新
-            policy_kwargs=dict(
-                net_arch=[512, 512] # 网络加宽。输入有1200维，256的层有点窄了，建议 512x512
-            )
+            policy_kwargs=policy_kwargs
         )
         reset_timesteps = True
 
@@ -105,9 +125,9 @@ def main():
 
 
     # 打印模型当前的步数，以确定何时会触发下一次更新
-    env.conn.log(f"当前模型步数 (num_timesteps): {model.num_timesteps}")
+    conn.log(f"当前模型步数 (num_timesteps): {model.num_timesteps}")
     next_update_step = model.num_timesteps - (model.num_timesteps % model.n_steps) + model.n_steps
-    env.conn.log(f"下次更新/日志写入预计在步数: {next_update_step}")
+    conn.log(f"下次更新/日志写入预计在步数: {next_update_step}")
 
     # --- [关键修改] 配置智能存档回调 ---
     # save_freq=5000: 每 5000 步存一次 (约 10-20 分钟)
@@ -116,7 +136,7 @@ def main():
         save_freq=1000, 
         save_path=models_dir,
         name_prefix="spire_ckpt",
-        connection=env.env.conn # 把底层的 connection 对象传进去用于写日志
+        connection=conn # 把底层的 connection 对象传进去用于写日志
     )
 
     # --- 4. 训练循环 ---
@@ -134,7 +154,7 @@ def main():
         )
         # 训练跑满后的正常保存
         model.save(latest_model_path)
-        env.conn.log("训练目标达成，最终模型已保存。")
+        conn.log("训练目标达成，最终模型已保存。")
 
     except KeyboardInterrupt:
         # 这个通常只有你在终端按 Ctrl+C 才会触发
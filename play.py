@@ -1,24 +1,65 @@
 import time
 import os
+import threading
 from sb3_contrib import MaskablePPO
 from sb3_contrib.common.wrappers import ActionMasker
 from spire_env.env import SlayTheSpireEnv
+from spire_env.broker import make_broker_vec_env
+from spire_env.inference import InferenceServer
 
 def mask_fn(env):
     return env.action_masks()
 
-def main():
-    # 1. 创建环境
-    env = SlayTheSpireEnv()
-    env = ActionMasker(env, mask_fn)
-    
-    # 2. 加载模型
+def find_model_path(obs_mode="dense"):
+    # 两种观察的网络结构不同，存档分开 (和 main.py 一致)：tokens 模式只能加载 tokens 的存档
+    if obs_mode == "tokens":
+        return "models/spire_ai_tokens_latest.zip"
+
     # 这里你可以选你想看的任何一个存档，比如 30000 步的那个
     model_path = "models/spire_ckpt_30000_steps.zip"
     
     # 如果找不到指定步数的，就找 latest
     if not os.path.exists(model_path):
         model_path = "models/spire_ai_latest.zip"
+    return model_path
+
+def main_multi(num_games, obs_mode="dense"):
+    """
+    多实例观战/评估：每个游戏一个线程，
+    所有线程的预测交给 InferenceServer 攒批，一次前向算出所有动作
+    """
+    vec = make_broker_vec_env(num_games, obs_mode=obs_mode)
+    model_path = find_model_path(obs_mode)
+    print(f"正在加载模型: {model_path} ...")
+    model = MaskablePPO.load(model_path, device="cpu")
+
+    stop = threading.Event()
+    with InferenceServer(model, max_batch=num_games, deterministic=True) as server:
+        threads = [threading.Thread(target=server.serve_env, args=(env, stop), daemon=True) for env in vec.envs]
+        for t in threads:
+            t.start()
+        print(f"开始观战 {num_games} 局！(按 Ctrl+C 退出)")
+        try:
+            while True:
+                time.sleep(30)
+                print(f"[推理] {server.stats()}")
+        except KeyboardInterrupt:
+            stop.set()
+    vec.close()
+
+def main():
+    num_games = int(os.environ.get("SPIRE_NUM_GAMES", "1"))
+    # SPIRE_OBS_MODE=tokens：和训练时 (main.py) 用同一种观察，否则模型的输入对不上
+    obs_mode = os.environ.get("SPIRE_OBS_MODE", "dense")
+    if num_games > 1:
+        return main_multi(num_games, obs_mode)
+
+    # 1. 创建环境
+    env = SlayTheSpireEnv(obs_mode=obs_mode)
+    env = ActionMasker(env, mask_fn)
+    
+    # 2. 加载模型
+    model_path = find_model_path(obs_mode)
 
     print(f"正在加载模型: {model_path} ...")
     model = MaskablePPO.load(model_path, env=env)
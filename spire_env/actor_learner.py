@@ -0,0 +1,367 @@
+# actor_learner.py
+"""
+Actor / Learner 分离训练：采样和 PPO 更新同时进行
+model.learn 是 "采 n_steps 步 -> 更新 -> 再采" 交替执行的，更新期间游戏干等、采样期间显卡干等。
+这里拆成两种进程：
+  - actor (每个游戏一个进程)：用本地 CPU 策略跑 SlayTheSpireEnv，
+    把 (obs, mask, action, reward, logp, value) 按段写进自己的共享内存环形缓冲 RolloutRing；
+  - learner (主进程)：从每个 ring 各取一段拼成 MaskableRolloutBuffer，跑 model.train()，
+    再把新权重写进共享内存 WeightBoard，actor 每采完一段检查一次版本号并同步。
+ring 有多个槽位，learner 更新时 actor 继续往下一个槽位写，两边都不闲着；
+代价是 actor 用的策略最多落后 slots 个版本，PPO 的重要性比率裁剪本来就是为这种轻微 off-policy 准备的，
+落后程度记在 TensorBoard 的 async/policy_lag。
+
+    learner = Learner(model, env_factories)   # model.n_steps 即每段长度
+    learner.learn(total_timesteps=500000)
+"""
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch as th
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+# ring 槽位状态
+FREE = 0
+FULL = 1
+
+def _alloc(fields, name=None):
+    """
+    按 {字段: (shape, dtype)} 在一块 SharedMemory 里顺序排布，返回 (shm, {字段: ndarray 视图})
+    name 为 None 时新建，否则挂到已有的块上 (子进程用)
+    """
+    layout, size = [], 0
+    for key, (shape, dtype) in fields.items():
+        dtype = np.dtype(dtype)
+        size = (size + 7) // 8 * 8 # 8 字节对齐
+        layout.append((key, shape, dtype, size))
+        size += int(np.prod(shape)) * dtype.itemsize
+    shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(size, 8))
+    views = {key: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset) for key, shape, dtype, offset in layout}
+    return shm, views
+
+class RolloutRing:
+    """
+    单生产者 (actor) / 单消费者 (learner) 的共享内存环形缓冲，每个槽位是一段长度 seg_len 的轨迹。
+    actor 直接往槽位里逐步写 (不额外拷贝)，写满一段把状态置 FULL；learner 拷走后置回 FREE。
+    """
+    def __init__(self, obs_dim, n_actions, seg_len, slots=2, name=None):
+        self.spec = (obs_dim, n_actions, seg_len, slots)
+        s, t = slots, seg_len
+        self.shm, v = _alloc({
+            "state": ((s,), np.int32),
+            "version": ((s,), np.int64),       # 这一段开始时 actor 用的策略版本
+            "obs": ((s, t, obs_dim), np.float32),
+            "mask": ((s, t, n_actions), np.bool_),
+            "action": ((s, t), np.int64),
+            "reward": ((s, t), np.float32),
+            "episode_start": ((s, t), np.bool_),
+            "value": ((s, t), np.float32),
+            "logp": ((s, t), np.float32),
+            "last_value": ((s,), np.float32),  # 段末下一个观察的价值 (GAE 自举用)
+            "last_done": ((s,), np.bool_),
+        }, name=name)
+        if name is None:
+            v["state"][:] = FREE
+        self.__dict__.update(v)
+        self.slots = slots
+        self.seg_len = seg_len
+        self.pos = 0 # 生产者/消费者各自的游标，不共享
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def attach(cls, name, spec):
+        return cls(*spec, name=name)
+
+    # --- actor 端 ---
+    def acquire(self, stop=None, poll=0.001):
+        """等当前槽位空出来，返回槽位号；stop 被置位时返回 None"""
+        while self.state[self.pos] != FREE:
+            if stop is not None and stop.is_set():
+                return None
+            time.sleep(poll)
+        return self.pos
+
+    def publish(self):
+        """当前槽位写满，交给 learner"""
+        self.state[self.pos] = FULL
+        self.pos = (self.pos + 1) % self.slots
+
+    # --- learner 端 ---
+    def ready(self):
+        return self.state[self.pos] == FULL
+
+    def release(self):
+        self.state[self.pos] = FREE
+        self.pos = (self.pos + 1) % self.slots
+
+    def close(self, unlink=False):
+        self.__dict__.update({k: None for k in ("obs", "mask", "action", "reward", "episode_start",
+                                                 "value", "logp", "last_value", "last_done", "state", "version")})
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+class WeightBoard:
+    """
+    learner -> actor 的权重广播：一块共享内存 = 序号 + 扁平化的 state_dict。
+    写的时候序号先变奇数、写完变偶数 (seqlock)，读端前后两次序号一致且为偶数才算读到完整的一份。
+    """
+    def __init__(self, policy=None, name=None, size=None):
+        if policy is not None:
+            size = sum(t.numel() for t in policy.state_dict().values())
+        self.size = size
+        self.shm, v = _alloc({"seq": ((1,), np.int64), "params": ((size,), np.float32)}, name=name)
+        self.seq, self.params = v["seq"], v["params"]
+        if name is None:
+            self.seq[0] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def version(self):
+        return int(self.seq[0]) // 2
+
+    def publish(self, policy):
+        flat = th.cat([t.detach().reshape(-1).float().cpu() for t in policy.state_dict().values()]).numpy()
+        self.seq[0] += 1
+        self.params[:] = flat
+        self.seq[0] += 1
+
+    def pull(self, policy, known_version=-1):
+        """有新版本就拷进 policy，返回拿到的版本号 (没有新版本返回 known_version)"""
+        while True:
+            seq = int(self.seq[0])
+            if seq // 2 == known_version or seq == 0:
+                return known_version
+            if seq % 2:
+                time.sleep(0.0005)
+                continue
+            flat = self.params.copy()
+            if int(self.seq[0]) == seq:
+                break
+        state, offset = policy.state_dict(), 0
+        for key, tensor in state.items():
+            n = tensor.numel()
+            state[key] = th.from_numpy(flat[offset:offset + n]).view_as(tensor).to(tensor.dtype)
+            offset += n
+        policy.load_state_dict(state)
+        return seq // 2
+
+    def close(self, unlink=False):
+        self.seq = self.params = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+def run_actor(index, env_factory, ring_name, ring_spec, board_name, board_size, policy_spec, gamma, stop):
+    """
+    actor 进程入口：env_factory() 造出自己的 SlayTheSpireEnv，用共享权重的本地策略一直采样
+    """
+    th.set_num_threads(1) # 多个 actor 抢核心只会更慢
+    policy_class, policy_kwargs = policy_spec
+    env = env_factory()
+    ring = RolloutRing.attach(ring_name, ring_spec)
+    board = WeightBoard(name=board_name, size=board_size)
+    policy = policy_class(env.observation_space, env.action_space, lambda _: 0.0, **policy_kwargs)
+    policy.set_training_mode(False)
+    version = -1
+    while board.version == 0 and not stop.is_set(): # 等 learner 发布第一份权重
+        time.sleep(0.01)
+
+    obs, _ = env.reset()
+    episode_start = True
+    try:
+        while not stop.is_set():
+            slot = ring.acquire(stop)
+            if slot is None:
+                break
+            version = board.pull(policy, version)
+            ring.version[slot] = version
+            for t in range(ring.seg_len):
+                mask = np.asarray(env.action_masks(), dtype=bool)
+                with th.no_grad():
+                    action, value, logp = policy(th.as_tensor(obs[None]), action_masks=mask[None])
+                action = int(action[0])
+                ring.obs[slot, t] = obs
+                ring.mask[slot, t] = mask
+                ring.action[slot, t] = action
+                ring.value[slot, t] = float(value[0])
+                ring.logp[slot, t] = float(logp[0])
+                ring.episode_start[slot, t] = episode_start
+
+                obs, reward, terminated, truncated, _ = env.step(action)
+                if truncated and not terminated:
+                    # 超时截断：和 SB3 一样用终局观察的价值自举
+                    with th.no_grad():
+                        reward += gamma * float(policy.predict_values(th.as_tensor(obs[None]))[0])
+                ring.reward[slot, t] = reward
+                episode_start = terminated or truncated
+                if episode_start:
+                    obs, _ = env.reset()
+            with th.no_grad():
+                ring.last_value[slot] = float(policy.predict_values(th.as_tensor(obs[None]))[0])
+            ring.last_done[slot] = episode_start
+            ring.publish()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            env.conn.close()
+        except Exception:
+            pass
+        ring.close()
+        board.close()
+
+class _SpacesOnlyVecEnv(VecEnv):
+    """learner 不跑环境，只借这个壳告诉 SB3 观察/动作空间和并行数 (n_envs = actor 数)"""
+    def __init__(self, num_envs, observation_space, action_space):
+        self.render_mode = None
+        super().__init__(num_envs, observation_space, action_space)
+
+    def reset(self):
+        return np.zeros((self.num_envs,) + self.observation_space.shape, dtype=np.float32)
+
+    def step_async(self, actions):
+        raise RuntimeError("learner 端不采样，数据来自 actor 进程")
+
+    def step_wait(self):
+        raise RuntimeError("learner 端不采样，数据来自 actor 进程")
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [None for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        pass
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        raise RuntimeError("learner 端不采样，数据来自 actor 进程")
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+def spaces_only_env(num_actors, observation_space, action_space):
+    """给 MaskablePPO(...) / MaskablePPO.load(...) 用的占位 env"""
+    return _SpacesOnlyVecEnv(num_actors, observation_space, action_space)
+
+class Learner:
+    def __init__(self, model, env_factories, slots=2, log=print):
+        """
+        :param model: MaskablePPO，env 必须是 spaces_only_env(len(env_factories), ...)；
+                      model.n_steps 就是每个 actor 每段的长度
+        :param env_factories: 每个 actor 一个可 pickle 的无参工厂，在 actor 进程里造 env
+        :param slots: 每个 ring 的槽位数，越大 actor 越不容易被 learner 卡住，但策略滞后越多
+        """
+        assert model.n_envs == len(env_factories), "model 的 n_envs 必须等于 actor 数"
+        self.model = model
+        self.log = log
+        obs_dim = model.observation_space.shape[0]
+        n_actions = model.action_space.n
+        self.board = WeightBoard(model.policy)
+        self.rings = [RolloutRing(obs_dim, n_actions, model.n_steps, slots) for _ in env_factories]
+        ctx = mp.get_context("spawn")
+        self.stop = ctx.Event()
+        policy_spec = (model.policy_class, model.policy_kwargs)
+        self.actors = [
+            ctx.Process(target=run_actor, daemon=True, name=f"actor{i}",
+                        args=(i, factory, ring.name, ring.spec, self.board.name, self.board.size,
+                              policy_spec, model.gamma, self.stop))
+            for i, (factory, ring) in enumerate(zip(env_factories, self.rings))
+        ]
+        # 每个 actor 正在进行的那局的累计奖励/步数 (拼 rollout/ep_rew_mean 用)
+        self._ep_return = np.zeros(len(self.rings))
+        self._ep_length = np.zeros(len(self.rings), dtype=np.int64)
+
+    def _publish(self):
+        self.board.publish(self.model.policy)
+
+    def _collect(self):
+        """每个 ring 各取一段填进 rollout_buffer，返回 (等数据用时, 平均策略滞后)"""
+        model, rb = self.model, self.model.rollout_buffer
+        rb.reset()
+        t0 = time.perf_counter()
+        last_values = np.zeros(len(self.rings), dtype=np.float32)
+        last_dones = np.zeros(len(self.rings), dtype=bool)
+        lags = []
+        for i, ring in enumerate(self.rings):
+            while not ring.ready():
+                if not self.actors[i].is_alive():
+                    raise RuntimeError(f"actor{i} 进程已退出 (exitcode={self.actors[i].exitcode})")
+                time.sleep(0.001)
+            s = ring.pos
+            rb.observations[:, i] = ring.obs[s]
+            rb.action_masks[:, i] = ring.mask[s]
+            rb.actions[:, i, 0] = ring.action[s]
+            rb.rewards[:, i] = ring.reward[s]
+            rb.episode_starts[:, i] = ring.episode_start[s]
+            rb.values[:, i] = ring.value[s]
+            rb.log_probs[:, i] = ring.logp[s]
+            last_values[i] = ring.last_value[s]
+            last_dones[i] = ring.last_done[s]
+            lags.append(self.board.version - int(ring.version[s]))
+            ring.release()
+            self._track_episodes(i, rb.rewards[:, i], np.append(rb.episode_starts[1:, i], last_dones[i]))
+        rb.pos, rb.full = rb.buffer_size, True
+        rb.compute_returns_and_advantage(last_values=th.as_tensor(last_values), dones=last_dones)
+        model.num_timesteps += rb.buffer_size * rb.n_envs
+        return time.perf_counter() - t0, float(np.mean(lags))
+
+    def _track_episodes(self, i, rewards, dones):
+        for r, d in zip(rewards, dones):
+            self._ep_return[i] += r
+            self._ep_length[i] += 1
+            if d:
+                self.model.ep_info_buffer.append({"r": float(self._ep_return[i]), "l": int(self._ep_length[i])})
+                self._ep_return[i], self._ep_length[i] = 0.0, 0
+
+    def learn(self, total_timesteps, reset_num_timesteps=True, save_path=None, save_every=10, tb_log_name="MaskablePPO"):
+        """
+        :param save_path: 每 save_every 次更新存一次档 (None 不存)
+        """
+        model = self.model
+        total_timesteps, _ = model._setup_learn(total_timesteps, None, reset_num_timesteps, tb_log_name)
+        self._publish()
+        for p in self.actors:
+            p.start()
+        iteration = 0
+        try:
+            while model.num_timesteps < total_timesteps:
+                wait_time, lag = self._collect()
+                model._update_current_progress_remaining(model.num_timesteps, total_timesteps)
+                t0 = time.perf_counter()
+                model.train()
+                self._publish()
+                iteration += 1
+                model.logger.record("async/wait_for_data_s", wait_time)
+                model.logger.record("async/train_s", time.perf_counter() - t0)
+                model.logger.record("async/policy_lag", lag)
+                model.dump_logs(iteration)
+                if save_path and iteration % save_every == 0:
+                    model.save(save_path)
+                    self.log(f"【自动存档】步数: {model.num_timesteps} | 已保存至: {save_path}")
+        finally:
+            self.close()
+        return model
+
+    def close(self):
+        if self.board is None:
+            return
+        self.stop.set()
+        for p in self.actors:
+            if p.pid is not None:
+                p.join(timeout=10)
+                if p.is_alive():
+                    p.terminate()
+        for ring in self.rings:
+            ring.close(unlink=True)
+        self.board.close(unlink=True)
+        self.rings, self.board = [], None
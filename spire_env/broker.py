@@ -0,0 +1,125 @@
+# broker.py
+"""
+多实例训练：一个训练进程同时驱动多个游戏
+每个游戏的 CommunicationMod 拉起 relay.py，relay 连到这里的 SocketBroker；
+broker 为每个连进来的 relay 建一个 Connection (in/out 流就是 socket)，
+再套上 SlayTheSpireEnv，最后由 SpireVecEnv 打包成 SB3 VecEnv。
+
+不开游戏也能在本地测试：launch_mock_games 用 mock_server 拉起若干个替身游戏，
+每个替身把 relay 当作 "AI 进程" 启动，流程和真实游戏完全一样：
+
+    broker = SocketBroker()
+    procs = launch_mock_games(4, broker.address, script="sim")
+    env = make_broker_vec_env(4, broker=broker)
+"""
+import os
+import sys
+import json
+import socket
+import subprocess
+
+from .relay import DEFAULT_ADDRESS, parse_address
+
+class SocketBroker:
+    def __init__(self, address=DEFAULT_ADDRESS, backlog=16):
+        """
+        :param address: Unix socket 路径，或 host:port (走 TCP)
+        """
+        self.address = address
+        self.family, addr = parse_address(address)
+        if self.family == socket.AF_UNIX and os.path.exists(addr):
+            os.unlink(addr) # 上次没清理掉的残留 socket 文件
+        self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(addr)
+        self.sock.listen(backlog)
+        self.connections = []
+
+    def accept(self, timeout=None, **conn_kwargs):
+        """
+        等一个 relay 连进来，返回连到它的 Connection (conn.relay_name 是 relay 报上来的实例名)。
+        :param conn_kwargs: 透传给 Connection (mailbox / log_filename / ...)
+        """
+        from .interface import Connection
+        self.sock.settimeout(timeout)
+        client, _ = self.sock.accept()
+        client.settimeout(None)
+        if self.family == socket.AF_INET:
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        reader = client.makefile('rb')
+        writer = client.makefile('w', encoding='utf-8')
+        hello = json.loads(reader.readline() or b"{}")
+        conn = Connection(in_stream=reader, out_stream=writer, **conn_kwargs)
+        conn.relay_name = hello.get("relay", f"relay{len(self.connections)}")
+        conn.relay_socket = client
+        conn.log(f"[Broker] relay 已连接: {conn.relay_name} (pid {hello.get('pid')})")
+        self.connections.append(conn)
+        return conn
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                # makefile() 出来的读写流还引用着 fd，必须 shutdown 才能让 relay 读到 EOF
+                conn.relay_socket.shutdown(socket.SHUT_RDWR)
+                conn.relay_socket.close()
+            except Exception:
+                pass
+            conn.close()
+        self.sock.close()
+        if self.family == socket.AF_UNIX:
+            try:
+                os.unlink(self.address)
+            except OSError:
+                pass
+
+def make_broker_vec_env(num_games, broker=None, address=DEFAULT_ADDRESS, timeout=None, obs_mode="dense", **conn_kwargs):
+    """
+    等 num_games 个游戏 (relay) 连进来，返回 SpireVecEnv。
+    每个实例的日志写到 logs/ai_debug_log_<i>.txt。
+    :param obs_mode: 透传给 SlayTheSpireEnv ("dense" / "tokens")
+    """
+    from .env import SlayTheSpireEnv
+    from .vec_env import SpireVecEnv
+    broker = broker or SocketBroker(address)
+    conn_kwargs.setdefault("mailbox", True)
+    envs = []
+    for i in range(num_games):
+        conn = broker.accept(timeout=timeout, log_filename=f"ai_debug_log_{i}.txt", **conn_kwargs)
+        envs.append(SlayTheSpireEnv(conn=conn, obs_mode=obs_mode))
+    vec = SpireVecEnv(envs)
+    vec.broker = broker
+    return vec
+
+def indexed_address(address, i):
+    """第 i 个实例自己的地址：/tmp/x.sock -> /tmp/x_<i>.sock；host:port -> host:(port+i)"""
+    family, addr = parse_address(address)
+    if family == socket.AF_INET:
+        return f"{addr[0]}:{addr[1] + i}"
+    root, ext = os.path.splitext(address)
+    return f"{root}_{i}{ext}"
+
+def make_broker_env(address, index=0, timeout=None, **conn_kwargs):
+    """
+    单实例版：在 address 上等一个 relay 连进来，返回 SlayTheSpireEnv (actor 进程里用，见 actor_learner.py)。
+    broker 挂在 env.conn.broker 上，随 env 一起存活。
+    """
+    from .env import SlayTheSpireEnv
+    broker = SocketBroker(address)
+    conn_kwargs.setdefault("mailbox", True)
+    conn = broker.accept(timeout=timeout, log_filename=f"ai_debug_log_{index}.txt", **conn_kwargs)
+    conn.broker = broker
+    return SlayTheSpireEnv(conn=conn)
+
+def launch_mock_games(n, address, script="sim", latency=0.0, seed=0):
+    """拉起 n 个 mock_server 替身游戏，每个都通过 relay 连到 address，返回 Popen 列表"""
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    relay = os.path.join(project_root, "spire_env", "relay.py")
+    procs = []
+    for i in range(n):
+        argv = [sys.executable, "-m", "spire_env.mock_server", "--script", script, "--latency", str(latency)]
+        if script == "sim":
+            argv += ["--seed", str(seed + i)]
+        argv += ["--", sys.executable, relay, "--address", address, "--name", f"mock{i}"]
+        procs.append(subprocess.Popen(argv, cwd=project_root))
+    return procs
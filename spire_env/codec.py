@@ -0,0 +1,49 @@
+# codec.py
+"""
+JSON 解码后端 (可插拔)
+默认使用标准库 json；如果装了 orjson / msgspec，"auto" 会自动选用更快的那个。
+所有后端都同时接受 bytes 和 str。
+"""
+import json
+
+def _stdlib_loads():
+    return json.loads
+
+def _orjson_loads():
+    import orjson
+    return orjson.loads
+
+def _msgspec_loads():
+    import msgspec
+    return msgspec.json.Decoder().decode
+
+# 名字 -> 工厂函数 (按 auto 模式的优先级排列)
+DECODERS = {
+    "orjson": _orjson_loads,
+    "msgspec": _msgspec_loads,
+    "json": _stdlib_loads,
+}
+
+def available_decoders():
+    """返回当前环境里能用的后端名字列表"""
+    names = []
+    for name, factory in DECODERS.items():
+        try:
+            factory()
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+def get_decoder(name="auto"):
+    """
+    返回 (后端名字, loads 函数)。
+    - name="auto": 依次尝试 orjson -> msgspec -> json
+    - 指定的后端没装时退回标准库 json
+    """
+    if name == "auto":
+        name = available_decoders()[0]
+    try:
+        return name, DECODERS[name]()
+    except (KeyError, ImportError):
+        return "json", _stdlib_loads()
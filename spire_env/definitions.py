@@ -50,4 +50,13 @@ class ObservationConfig:
     SCREEN_SIZE = 8
     
     # 总维度
-    SIZE = PLAYER_SIZE + HAND_SIZE + MONSTER_SIZE + RELIC_SIZE + PILE_SIZE + GLOBAL_SIZE + POTION_SIZE + SCREEN_SIZE
\ No newline at end of file
+    SIZE = PLAYER_SIZE + HAND_SIZE + MONSTER_SIZE + RELIC_SIZE + PILE_SIZE + GLOBAL_SIZE + POTION_SIZE + SCREEN_SIZE
+
+    # --- 稀疏 (token) 模式：身份类特征用整数 id 表示，其余数值放进一个小的稠密块 ---
+    # id 约定：0 = 空位 (没牌 / 没怪 / 怪已死)，词表下标 + 1 = 具体的卡/怪/意图
+    TOKEN_HAND = 10
+    TOKEN_MONSTERS = 5
+    HAND_NUMERIC_SIZE = 5     # 费用 + 攻击/技能/能力 + 是否升级
+    MONSTER_NUMERIC_SIZE = 3  # HP + 格挡 + 意图伤害
+    DENSE_SIZE = (PLAYER_SIZE + TOKEN_HAND * HAND_NUMERIC_SIZE + TOKEN_MONSTERS * MONSTER_NUMERIC_SIZE
+                  + RELIC_SIZE + PILE_SIZE + GLOBAL_SIZE + POTION_SIZE + SCREEN_SIZE)
@@ -0,0 +1,146 @@
+# diff.py
+"""
+两条状态 (GameState) 之间的结构化差异，算一次，大家共用：
+    d = diff(prev, curr)
+    d.card_played / d.potion_used(slot) / d.new_turn   各等待逻辑的 "动作生效了" 判定
+    d.hp_loss / d.damage_dealt / d.monsters_died ...    奖励
+    d.sections                                          IncrementalEncoder 的 changed 提示
+    d.summary()                                         日志
+"动作生效" 的定义只在这里写一份，不再分散在各个等待函数里各比各的。
+便宜的字段 (都来自视图里预先算好的值) 在 diff() 里直接算；
+逐段比较 dict 的 sections 和手牌增减按需才算 (等待逻辑对每条中间态都会 diff 一次，不需要它们)。
+"""
+from collections import Counter
+
+from .state import as_state
+
+# 出现这些屏幕说明战斗已经结束 (或离开了战斗)，任何战斗动作都视为完成
+END_SCREENS = frozenset(['VICTORY', 'GAME_OVER', 'COMBAT_REWARD', 'MAP', 'SHOP', 'REST'])
+
+_MONSTER_SECTIONS = tuple(f'monster{i}' for i in range(5))
+
+def section_changed(new, old):
+    """同一个非空 dict/list 可能被原地改过，一律算变了；空的 () / None 可以放心复用"""
+    return (new is old and bool(new)) or new != old
+
+class StateDelta:
+    __slots__ = (
+        'prev', 'curr',
+        'screen_changed',   # screen_type 变了
+        'screen_left',      # 切到了 COMBAT/NONE 以外的新屏幕
+        'combat_over',      # 当前屏幕在 END_SCREENS 里
+        'both_combat',      # 前后都在战斗中
+        'hp_delta',         # 玩家血量变化 (curr - prev)
+        'energy_changed', 'hand_changed', 'powers_changed',
+        'turn_advanced',    # 回合数变大了
+        'damage_dealt',     # 活着的怪物总血量下降值
+        'monsters_died',    # 活着的怪物数减少了几只
+        'potion_slots',     # 名字变了的药水槽下标
+        'potions_used',     # 已装药水的槽少了几个
+        'floor_delta', 'gold_delta',
+        '_sections',
+    )
+
+    # --- 各等待逻辑的判定 ---
+    @property
+    def card_played(self):
+        """出牌生效：战斗结束 / 切走屏幕 / 能量、手牌、能力数任意一个变了"""
+        if self.combat_over or self.screen_left:
+            return True
+        curr = self.curr
+        if not curr.in_combat or not curr.player:
+            # 读到了数据但不是战斗状态 (动画中间态)
+            return False
+        return self.energy_changed or self.hand_changed or self.powers_changed
+
+    def potion_used(self, slot):
+        """药水生效：战斗结束，或这个槽的药水名字变了 (变空或变其他)"""
+        return self.combat_over or slot in self.potion_slots
+
+    @property
+    def new_turn(self):
+        """新回合：战斗结束，或回合数变大且我方能 play/end"""
+        return self.combat_over or (self.turn_advanced and self.curr.can_act)
+
+    @property
+    def hp_loss(self):
+        return -self.hp_delta if self.hp_delta < 0 else 0
+
+    # --- 按需计算的部分 ---
+    @property
+    def sections(self):
+        """编码器各段里源字段变了的段名 (IncrementalEncoder.encode 的 changed 参数)"""
+        s = self._sections
+        if s is None:
+            prev, curr = self.prev, self.curr
+            s = set()
+            if section_changed(curr.player, prev.player):
+                s.add('player')
+            if section_changed(curr.hand, prev.hand):
+                s.add('hand')
+            pm, cm = prev.monsters[:5], curr.monsters[:5]
+            for i in range(max(len(pm), len(cm))):
+                if section_changed(cm[i] if i < len(cm) else None, pm[i] if i < len(pm) else None):
+                    s.add(_MONSTER_SECTIONS[i])
+            if self.gold_delta or self.floor_delta:
+                s.add('global')
+            if curr.screen_key != prev.screen_key:
+                s.add('screen')
+            s = self._sections = frozenset(s)
+        return s
+
+    def cards_moved(self):
+        """手牌的增减 -> (进手牌的 id 列表, 离开手牌的 id 列表)"""
+        if not self.hand_changed:
+            return [], []
+        before, after = Counter(self.prev.hand_ids), Counter(self.curr.hand_ids)
+        return list((after - before).elements()), list((before - after).elements())
+
+    def summary(self):
+        """日志用的一行摘要，只列出有变化的项"""
+        parts = []
+        if self.hp_delta:
+            parts.append(f"HP {self.hp_delta:+d}")
+        if self.damage_dealt:
+            parts.append(f"伤害 {self.damage_dealt}")
+        if self.monsters_died > 0:
+            parts.append(f"击杀 {self.monsters_died}")
+        added, removed = self.cards_moved()
+        if added or removed:
+            parts.append(f"手牌 +{added} -{removed}")
+        if self.potions_used > 0:
+            parts.append(f"药水 -{self.potions_used}")
+        if self.floor_delta:
+            parts.append(f"楼层 {self.floor_delta:+d}")
+        if self.gold_delta:
+            parts.append(f"金币 {self.gold_delta:+d}")
+        if self.screen_changed:
+            parts.append(f"屏幕 {self.prev.screen}->{self.curr.screen}")
+        return " | ".join(parts) or "无变化"
+
+def diff(prev, curr):
+    """prev / curr: GameState (原始 dict 也行)，两个都不能是 None"""
+    prev, curr = as_state(prev), as_state(curr)
+    d = StateDelta.__new__(StateDelta)
+    d.prev = prev
+    d.curr = curr
+    screen = curr.screen
+    d.screen_changed = screen != prev.screen
+    d.screen_left = d.screen_changed and screen not in ('COMBAT', 'NONE')
+    d.combat_over = screen in END_SCREENS
+    d.both_combat = prev.in_combat and curr.in_combat
+    d.hp_delta = curr.hp - prev.hp
+    d.energy_changed = curr.energy != prev.energy
+    d.hand_changed = (len(curr.hand_ids) != len(prev.hand_ids)
+                      or sorted(curr.hand_ids) != sorted(prev.hand_ids))
+    d.powers_changed = len(curr.powers) != len(prev.powers)
+    d.turn_advanced = curr.turn > prev.turn
+    d.damage_dealt = prev.monster_hp - curr.monster_hp
+    d.monsters_died = prev.alive_count - curr.alive_count
+    pn, cn = prev.potion_names, curr.potion_names
+    d.potion_slots = tuple([i for i in range(min(len(pn), len(cn))) if pn[i] != cn[i]])
+    d.potions_used = prev.filled_potions - curr.filled_potions
+    d.floor_delta = curr.floor - prev.floor
+    d.gold_delta = curr.gold - prev.gold
+    d._sections = None
+    return d
@@ -3,25 +3,50 @@ import time
 import gymnasium as gym
 from gymnasium import spaces
 from .interface import Connection
+from .log_writer import DEBUG
 from .definitions import ObservationConfig, ActionConfig # [修改] 引用 ActionConfig
-from utils.state_encoder import encode_state
+from utils.state_encoder import IncrementalEncoder, encode_tokens, TOKEN_CARD_VOCAB, TOKEN_MONSTER_VOCAB, TOKEN_INTENT_VOCAB
 from utils.action_mapper import ActionMapper
 
+from .diff import diff
 from .logic import game_io, combat, navigator, reward
+from .logic.wait_engine import engine_for
 
 class SlayTheSpireEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, conn=None, obs_mode="dense"):
+        """
+        :param conn: 外部传入的 Connection (比如连到 mock_server 的替身游戏)；
+                     默认走本进程 stdin/stdout，由 CommunicationMod 拉起。
+        :param obs_mode: "dense" = 1000+ 维 One-Hot 向量；
+                         "tokens" = Dict 观察 (卡/怪/意图 id + 小的稠密数值块)，配合 MultiInputPolicy 和嵌入层使用
+        """
         super(SlayTheSpireEnv, self).__init__()
-        self.conn = Connection()
+        # 信箱模式：只保留最新状态，动画期间的中间态直接丢弃不解析
+        self.conn = conn if conn is not None else Connection(mailbox=True)
         self.mapper = ActionMapper()
+        # 逐步编码：只重编相对上一步变了的段 (玩家/手牌/各怪物...)
+        self.encoder = IncrementalEncoder()
         
         # [修改] 使用新的 TOTAL_ACTIONS (67)
         self.action_space = spaces.Discrete(ActionConfig.TOTAL_ACTIONS)
         
-        # 观察空间保持不变 (1000+ 维)
-        self.observation_space = spaces.Box(low=-5.0, high=1000.0, shape=(ObservationConfig.SIZE,), dtype=np.float32)
+        self.obs_mode = obs_mode
+        if obs_mode == "tokens":
+            # id 用整数 Box 而不是 MultiDiscrete：SB3 会把 MultiDiscrete 预处理成 One-Hot，Box 则原样交给特征提取器
+            C = ObservationConfig
+            self.observation_space = spaces.Dict({
+                "cards": spaces.Box(0, TOKEN_CARD_VOCAB - 1, shape=(C.TOKEN_HAND,), dtype=np.int64),
+                "monsters": spaces.Box(0, TOKEN_MONSTER_VOCAB - 1, shape=(C.TOKEN_MONSTERS,), dtype=np.int64),
+                "intents": spaces.Box(0, TOKEN_INTENT_VOCAB - 1, shape=(C.TOKEN_MONSTERS,), dtype=np.int64),
+                "dense": spaces.Box(low=-5.0, high=1000.0, shape=(C.DENSE_SIZE,), dtype=np.float32),
+            })
+        elif obs_mode == "dense":
+            # 观察空间保持不变 (1000+ 维)
+            self.observation_space = spaces.Box(low=-5.0, high=1000.0, shape=(ObservationConfig.SIZE,), dtype=np.float32)
+        else:
+            raise ValueError(f"未知的 obs_mode: {obs_mode}")
         
-        self.last_state = None
+        self.last_state = None # 上一步的 GameState 视图 (见 state.py)，不再保存完整的原始 dict
         self.steps_since_reset = 0
         # [新增] 用于记录上一场战斗的怪物指纹，防止重复打印
         self.last_encounter_fingerprint = None
@@ -40,6 +65,10 @@ class SlayTheSpireEnv(gym.Env):
         start_time = time.time()
         last_action_time = 0
         stuck_counter = 0 # 重新引入卡顿计数器
+        # 点击间隔按历史延迟推导：记下上一次点击 (屏幕, 指令类型, 指令列表, 时刻)，界面一变就记一个样本
+        latency = engine_for(self.conn).latency
+        pending = None
+        state = None
         
         while True:
             # 1. 超时保护
@@ -50,15 +79,25 @@ class SlayTheSpireEnv(gym.Env):
                     raise RuntimeError("Reset timeout - 无法回到游戏状态")
 
             # 2. 获取状态
-            self.conn.send_command("state")
-            state = game_io.get_latest_state(self.conn, retry_limit=2)
-            
-            if not state: 
-                time.sleep(0.01); continue
+            # 事件驱动：阻塞到本界面的点击间隔结束，或者提前等到界面/指令变化的新状态；
+            # 间隔结束还没动静才请求一条 state —— 每个间隔最多一条请求，而不是整段间隔里空转刷新
+            if state is None:
+                state = game_io.refresh_state(self.conn)
+            else:
+                remaining = last_action_time + self._reset_gap(latency, s, cmds) - time.time()
+                new_state = None
+                if remaining > 0:
+                    prev_s, prev_cmds = s, cmds
+                    new_state = self.conn.wait_for_state(
+                        predicate=lambda ns: ns.screen != prev_s or ns.command_set != prev_cmds,
+                        timeout=remaining)
+                state = new_state if new_state else game_io.refresh_state(self.conn)
 
-            g = state.get('game_state') or {}
-            s = g.get('screen_type')
-            cmds = state.get('available_commands', [])
+            s = state.screen
+            cmds = state.command_set
+            if pending and (s != pending[0] or cmds != pending[2]):
+                latency.observe(pending[0], pending[1], None, time.monotonic() - pending[3])
+                pending = None
             
             # 3. 退出条件 (成功进入可玩状态)
             is_ready = False
@@ -68,15 +107,21 @@ class SlayTheSpireEnv(gym.Env):
             
             if is_ready:
                 self.conn.log(f">>> [Reset] 就绪! 当前界面: {s} <<<")
+                self.conn.log(f"[IO] state 请求统计: {self.conn.state_stats()} | 丢弃过期状态: {self.conn.dropped_states}")
+                self.conn.log(f"[Wait] 等待统计: {engine_for(self.conn).stats()}")
+                self.conn.log(f"[Nav] 导航统计 (按屏幕): {navigator.navigator_for(self.conn).stats()} "
+                              f"| 选项记忆: {navigator.navigator_for(self.conn).choices.stats()}")
+                self.conn.debug(f"[Wait] 延迟分位数 (样本数, ms): {latency.stats()}")
                 self.last_state = state
                 break
 
             # 4. 主菜单逻辑 (快速开始)
             if s == 'MAIN_MENU' or 'start' in cmds:
-                if time.time() - last_action_time > 1.2:
+                if time.time() - last_action_time > self._reset_gap(latency, s, cmds):
                     self.conn.log(">>> [Reset] 主菜单 -> start ironclad")
                     self.conn.send_command("start ironclad")
                     last_action_time = time.time()
+                    pending = (s, "start", cmds, time.monotonic())
                 continue
 
             # ==================================================
@@ -84,8 +129,8 @@ class SlayTheSpireEnv(gym.Env):
             # ==================================================
             
             # [关键修改] 将结算界面的等待时间大幅延长到 1.5s
-            # 只有等动画播完了，点击才有效。
-            wait_t = 1.5 if s in ['GAME_OVER', 'VICTORY'] else 0.5
+            # 只有等动画播完了，点击才有效。(见 _reset_gap)
+            wait_t = self._reset_gap(latency, s, cmds)
             
             if time.time() - last_action_time > wait_t:
                 nav = None
@@ -135,30 +180,40 @@ class SlayTheSpireEnv(gym.Env):
                         self.conn.log(f"[Reset] 清理: {nav}")
                     self.conn.send_command(nav)
                     last_action_time = time.time()
-            
-            time.sleep(0.01)
+                    pending = (s, "reset", cmds, time.monotonic())
 
         self.last_state = navigator.process_non_combat(self.conn, self.last_state)
-        return encode_state(self.last_state), {}
+        self.encoder.reset()
+        return self._encode(self.last_state), {}
+    @staticmethod
+    def _reset_gap(latency, screen, cmds):
+        """
+        reset 里同一界面两次点击之间的最小间隔。
+        主菜单 (1.2s) 和结算界面 (1.5s) 的常数是给动画/输入生效留的时间，
+        "点击 -> 界面变化" 的响应延迟量不到它，所以保持常数；其他界面按历史响应延迟收紧 (上限 0.5s)。
+        """
+        if screen == 'MAIN_MENU' or 'start' in cmds:
+            return 1.2
+        if screen in ('GAME_OVER', 'VICTORY'):
+            return 1.5
+        return latency.delay(screen, "reset", None, 0.5)
+
     def step(self, action):
         self.steps_since_reset += 1
         prev = self.last_state
-        prev_turn = prev['game_state']['combat_state']['turn'] if 'combat_state' in prev['game_state'] else 0
 
-        # --- 日志 ---
-        try:
-            aname = self.mapper.get_action_name(action, prev)
-            mask = self.mapper.get_mask(prev)
-            valid = [self.mapper.get_action_name(i, prev) for i, m in enumerate(mask) if m]
-            valid_str = str(valid[:6] + ['...']) if len(valid) > 6 else str(valid)
-            
-            combat_st = prev.get('game_state', {}).get('combat_state', {})
-            e = combat_st.get('player', {}).get('energy', '?')
-            h = len(combat_st.get('hand', []))
-            
-            self.conn.log(f"┌─ [State] E:{e} H:{h} | 可选: {valid_str}")
-            self.conn.log(f"└─ [Decision] AI选: {aname}")
-        except: pass
+        # --- 日志 (DEBUG 级别；关闭时连动作名都不拼) ---
+        if self.conn.log_enabled(DEBUG):
+            try:
+                aname = self.mapper.get_action_name(action, prev)
+                mask = self.mapper.get_mask(prev)
+                valid = [self.mapper.get_action_name(i, prev) for i, m in enumerate(mask) if m]
+                valid_str = str(valid[:6] + ['...']) if len(valid) > 6 else str(valid)
+                
+                e = prev.energy if prev.player else '?'
+                self.conn.debug(f"┌─ [State] E:{e} H:{len(prev.hand)} | 可选: {valid_str}")
+                self.conn.debug(f"└─ [Decision] AI选: {aname}")
+            except: pass
 
         # --- 执行 ---
         try:
@@ -189,85 +244,78 @@ class SlayTheSpireEnv(gym.Env):
                 
                 # [核心修复] 直接发送 mapper 生成的完整指令
                 # 不再画蛇添足去计算 safe_target，因为 AI 已经选好了目标
-                self.conn.send_command(cmd)
+                ticket = self.conn.send_command(cmd)
                 
                 # 进入专用等待
-                combat.wait_for_potion_used(self.conn, prev, p_idx, cmd)
+                combat.wait_for_potion_used(self.conn, prev, p_idx, cmd, ticket=ticket)
             except Exception as e:
                 self.conn.log(f"[Error] 药水指令异常: {e}")
                 time.sleep(0.5)
             
             # 药水动作后强制刷新
-            self.conn.send_command("state") 
-            game_io.get_latest_state(self.conn)
+            game_io.refresh_state(self.conn)
 
         # ======================================================================
         # 2. 打牌逻辑 (需要显式发送)
         # ======================================================================
         elif "play" in cmd:
-            # 1. 物理延迟
-            time.sleep(0.01)
-            
-            # 2. [重要] 必须在这里发送指令！
-            self.conn.send_command(cmd)
+            # 1. [重要] 必须在这里发送指令！记下指令编号，只认它的响应
+            ticket = self.conn.send_command(cmd)
             
-            # 3. 计算费用并等待
-            card_cost = 0
+            # 2. 计算费用并等待 (cmd 是 "play {手牌序号+1} [目标]")
+            card_cost, card_id = 0, None
             try:
-                if action <= 9:
-                    c = prev['game_state']['combat_state']['hand'][action]
-                    card_cost = c.get('cost', 0)
+                card = prev.hand[int(cmd.split()[1]) - 1]
+                card_cost, card_id = card.get('cost', 0), card.get('id')
             except: pass
             
-            combat.wait_for_card_played(self.conn, prev, card_cost)
+            combat.wait_for_card_played(self.conn, prev, card_cost, ticket=ticket, card_id=card_id)
 
         # ======================================================================
         # 3. 结束回合逻辑 (需要显式发送)
         # ======================================================================
         elif "end" in cmd: 
             # [重要] 必须在这里发送指令！
-            self.conn.send_command(cmd)
+            ticket = self.conn.send_command(cmd)
             
-            combat.wait_for_new_turn(self.conn, prev_turn)
+            combat.wait_for_new_turn(self.conn, prev, ticket=ticket)
 
         # ======================================================================
         # 4. 常规指令 (choose, wait, null 等)
         # ======================================================================
         else: 
             # [重要] 必须在这里发送指令！
-            self.conn.send_command(cmd)
+            ticket = self.conn.send_command(cmd)
             
             # [核心修复] 如果是选牌操作，调用刚才写的 wait_for_choice_result
             if "choose" in cmd:
-                combat.wait_for_choice_result(self.conn)
-            else:
-                time.sleep(0.01)
+                combat.wait_for_choice_result(self.conn, ticket=ticket, prev_state=prev)
                 
             # self.conn.send_command("state")
 
         # --- 获取新状态 ---
-        self.conn.send_command("state")
-        curr = game_io.get_latest_state(self.conn, retry_limit=20)
+        curr = game_io.refresh_state(self.conn)
         
         if not curr: 
-            return encode_state(prev), 0, True, False, {}
+            return self._encode(prev), 0, True, False, {}
 
         final = navigator.process_non_combat(self.conn, curr)
-        rew = reward.calculate_reward(prev, final)
+        # 前后两步的结构化差异只算一次：奖励、日志、逐步编码共用
+        delta = diff(prev, final)
+        rew = reward.calculate_reward(prev, final, delta)
 
-        if abs(rew) > 0.01:
+        if abs(rew) > 0.01 and self.conn.log_enabled(DEBUG):
             # 打印到控制台，给自己看 (不要用 self.conn.log)
-            self.conn.log(f"   >>> Reward: {rew:.2f} (HP变动/伤害/击杀)")
+            self.conn.debug(f"   >>> Reward: {rew:.2f} ({delta.summary()})")
         # ---------------------------------------------------------
         # [修正版] 怪物识别日志 (基于指纹去重)
         # ---------------------------------------------------------
         try:
             # 1. 检查是否在战斗中
-            if 'combat_state' in final['game_state']:
-                monsters = final['game_state']['combat_state']['monsters']
+            if final.in_combat:
                 # 生成当前怪物指纹 (比如 "Cultist,JawWorm")
-                # 过滤掉已经死亡的 (is_gone)
-                active_monsters = sorted([m.get('id', 'Unknown') for m in monsters if not m.get('is_gone')])
+                # 视图里的 monster_ids 已过滤掉死亡的 (is_gone) 并排好序
+                active_monsters = list(final.monster_ids)
                 curr_fingerprint = ",".join(active_monsters)
                 # self.conn.log(curr_fingerprint)
                 # self.conn.log(self.last_encounter_fingerprint)
@@ -298,16 +346,21 @@ class SlayTheSpireEnv(gym.Env):
         self.last_state = final
         done = False
         
-        screen = final['game_state'].get('screen_type')
-        self.conn.log(f"screen = {screen}")
+        screen = final.screen
+        self.conn.debug(f"screen = {screen}")
         if screen in ['GAME_OVER', 'VICTORY']:
             done = True
             rew += 100 if screen == 'VICTORY' else -10
             self.conn.log(f"Game Over: {screen}")
 
         truncated = self.steps_since_reset > 2000
-        msg = f"done = {done}，truncated = {truncated}"
-        self.conn.log(msg)
-        return encode_state(final), rew, done, truncated, {}
+        self.conn.debug(f"done = {done}，truncated = {truncated}")
+        return self._encode(final, delta), rew, done, truncated, {}
+
+    def _encode(self, state, delta=None):
+        """:param delta: diff(上一次编码的状态, state)，给逐步编码器当 changed 提示"""
+        if self.obs_mode == "tokens":
+            return encode_tokens(state)
+        return self.encoder.encode(state, changed=delta.sections if delta is not None else None)
 
     def action_masks(self): return self.mapper.get_mask(self.last_state)
\ No newline at end of file
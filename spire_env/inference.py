@@ -0,0 +1,142 @@
+# inference.py
+"""
+进程内的策略推理服务：把多个 env 线程的单条预测攒成一批，一次前向
+CPU 上单条 model.predict 的时间大部分花在 PyTorch 的调度开销上，
+N 个 env 各自调一次不如攒起来调一次。
+
+每个 env 线程调用 server.predict(obs, mask) (阻塞，拿到动作才返回)；
+后台线程收到第一条请求后最多再等 max_wait 秒 (或攒满 max_batch 条)，
+然后把这一批 obs / action_masks 叠起来跑一次 model.predict，再把动作分发回去。
+
+    with InferenceServer(model, max_batch=32, max_wait=0.005) as server:
+        for env in envs:
+            threading.Thread(target=server.serve_env, args=(env,), daemon=True).start()
+"""
+import time
+import threading
+
+import numpy as np
+
+from .vec_env import stack_obs
+
+class _Request:
+    __slots__ = ("obs", "mask", "action", "done")
+
+    def __init__(self, obs, mask):
+        self.obs = obs
+        self.mask = mask
+        self.action = None
+        self.done = threading.Event()
+
+class InferenceServer:
+    def __init__(self, model, max_batch=64, max_wait=0.005, deterministic=True):
+        """
+        :param model: MaskablePPO (或任何 predict(obs, action_masks=..., deterministic=...) 支持批量输入的模型)
+        :param max_batch: 一批最多几条
+        :param max_wait: 收到第一条请求后最多再等多久凑批 (秒)，即额外引入的延迟上限
+        """
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.deterministic = deterministic
+        self._cond = threading.Condition()
+        self._queue = []
+        self._running = False
+        self._thread = None
+        self.requests = 0
+        self.batches = 0
+        self.busy_time = 0.0 # 花在前向上的总时间
+
+    # --- 生命周期 ---
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="inference")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- env 线程调用 ---
+    def predict(self, obs, action_masks=None):
+        """阻塞直到这一条的动作算出来，返回 int 动作"""
+        if not isinstance(obs, dict):
+            obs = np.asarray(obs, dtype=np.float32)
+        req = _Request(obs, None if action_masks is None else np.asarray(action_masks, dtype=bool))
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("InferenceServer 没有启动")
+            self._queue.append(req)
+            self._cond.notify_all()
+        req.done.wait()
+        if isinstance(req.action, BaseException):
+            raise req.action
+        return req.action
+
+    def serve_env(self, env, stop=None):
+        """在当前线程里用本服务驱动一个 env 一直玩下去 (观战/评估用)，stop 是 threading.Event"""
+        obs, _ = env.reset()
+        while stop is None or not stop.is_set():
+            action = self.predict(obs, env.action_masks())
+            obs, _, done, truncated, _ = env.step(action)
+            if done or truncated:
+                obs, _ = env.reset()
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch": round(self.requests / max(1, self.batches), 2),
+            "avg_forward_ms": round(1000 * self.busy_time / max(1, self.batches), 3),
+        }
+
+    # --- 后台线程 ---
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._running and not self._queue:
+                    return
+                # 第一条到了：在截止时间前尽量凑满一批
+                deadline = time.monotonic() + self.max_wait
+                while len(self._queue) < self.max_batch and self._running:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        t0 = time.perf_counter()
+        try:
+            obs = stack_obs([r.obs for r in batch])
+            masks = None
+            if all(r.mask is not None for r in batch):
+                masks = np.stack([r.mask for r in batch])
+            actions, _ = self.model.predict(obs, action_masks=masks, deterministic=self.deterministic)
+            actions = np.asarray(actions).reshape(len(batch))
+            for r, a in zip(batch, actions):
+                r.action = int(a)
+        except Exception as e:
+            for r in batch:
+                r.action = e
+        self.busy_time += time.perf_counter() - t0
+        self.batches += 1
+        self.requests += len(batch)
+        for r in batch:
+            r.done.set()
@@ -1,13 +1,86 @@
 # interface.py
 import sys
-import json
 import os
 import time
 import threading
-import queue
+import collections
+from .codec import get_decoder
+from .log_writer import AsyncLogWriter, parse_level, DEBUG, INFO, WARNING
+from .trace import TraceRecorder
+from .state import GameState
+
+class StateRequestScheduler:
+    """
+    [state 请求调度器] 所有向游戏发出的 "state" 请求都从这里走。
+    1. 去重：已经有指令在等响应时不再发 state —— 那条响应本身就是最新状态。
+    2. 限流：两次 state 之间至少间隔 1 / max_rate 秒。
+    3. 保活：keepalive(idle) 只在长时间收不到数据时才催一下游戏。
+    计数器 (needed / sent / deduped / throttled) 用来衡量省掉了多少流量。
+    """
+    def __init__(self, conn, max_rate=200.0):
+        self.conn = conn
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.last_sent_t = 0.0
+        self.needed = 0     # 调用方想要一条新状态的次数
+        self.sent = 0       # 实际发出的 state 条数
+        self.deduped = 0    # 因为已有指令在路上而省掉的
+        self.throttled = 0  # 因为超出频率预算而被推迟/丢弃的
+
+    def request(self, wait=True):
+        """
+        请求一条新状态，返回能等到它的指令编号 (用于 wait_for_response)。
+        - 已有指令在等响应：不发送，返回最新那条未响应指令的编号
+        - 超出频率预算：wait=True 时补足间隔再发；wait=False 时直接放弃，返回 None
+        """
+        self.needed += 1
+        inflight = self.conn.latest_pending_ticket()
+        if inflight is not None:
+            self.deduped += 1
+            return inflight
+        
+        gap = self.min_interval - (time.monotonic() - self.last_sent_t)
+        if gap > 0:
+            self.throttled += 1
+            if not wait:
+                return None
+            time.sleep(gap)
+        
+        self.last_sent_t = time.monotonic()
+        self.sent += 1
+        return self.conn.send_command("state")
+
+    def keepalive(self, idle=2.0):
+        """距离上一条收到的数据超过 idle 秒，且没有在路上的请求时，催一下游戏"""
+        if time.monotonic() - self.conn.last_recv_t > idle:
+            return self.request(wait=False)
+        return None
+
+    def stats(self):
+        return {"needed": self.needed, "sent": self.sent,
+                "deduped": self.deduped, "throttled": self.throttled}
 
 class Connection:
-    def __init__(self, log_filename="ai_debug_log.txt"):
+    def __init__(self, log_filename="ai_debug_log.txt", mailbox=False, decoder="auto", max_state_rate=200.0,
+                 log_level=None, log_max_bytes=20 * 1024 * 1024, log_compress=False, trace_path=None,
+                 in_stream=None, out_stream=None):
+        """
+        :param mailbox: 信箱模式。读线程只保留最新的一行，新行到达时直接覆盖还没被读走的旧行
+                        (计入 dropped_states)，消费者永远不会解析/检查过期快照。
+                        关闭时为 FIFO 队列模式：不丢行，积压到 1000 行时读线程暂停读取 (背压)，
+                        等消费者取走再继续，保证每条指令的响应都能被取到。
+        :param decoder: JSON 解码后端 ("auto" / "json" / "orjson" / "msgspec")，见 codec.py。
+                        解码在后台解码线程完成，并顺手建成 GameState 视图 (见 state.py)，
+                        主线程和各种 predicate 拿到的都是视图，不再是原始 dict。
+        :param max_state_rate: state 请求的频率预算 (次/秒)，见 StateRequestScheduler。
+        :param log_level: 日志级别 ("DEBUG"/"INFO"/...)，默认读环境变量 SPIRE_LOG_LEVEL，再默认 INFO。
+        :param log_max_bytes / log_compress: 日志按大小轮转，历史文件可选 gzip 压缩。
+        :param trace_path: 开启原始数据流录制 (见 trace.py)，默认读环境变量 SPIRE_TRACE；
+                           相对路径放在 logs/ 下。不设置则不录制。
+        :param in_stream / out_stream: 收/发数据用的流，默认是本进程的 stdin/stdout
+                                       (CommunicationMod 拉起本脚本)。指向 mock_server 等替身时传入。
+        """
+        self._in = in_stream
+        self._out = out_stream
         # 1. 日志路径
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         log_dir = os.path.join(project_root, "logs")
@@ -16,39 +89,230 @@ class Connection:
             
         self.log_path = os.path.join(log_dir, log_filename)
         
-        # 2. 高效日志
+        # 2. 高效日志 (后台线程批量写盘，低于级别的消息零开销)
+        if log_level is None:
+            log_level = os.environ.get("SPIRE_LOG_LEVEL", "INFO")
         try:
-            self.log_file = open(self.log_path, "w", encoding='utf-8', buffering=1)
+            self.log_writer = AsyncLogWriter(self.log_path, level=parse_level(log_level),
+                                             max_bytes=log_max_bytes, compress=log_compress)
         except:
-            self.log_file = None
+            self.log_writer = None
+        
+        # 2.5 原始数据流录制 (可选，后台线程压缩写盘)
+        self.trace = None
+        if trace_path is None:
+            trace_path = os.environ.get("SPIRE_TRACE")
+        if trace_path:
+            try:
+                self.trace = TraceRecorder(os.path.join(log_dir, trace_path))
+            except Exception as e:
+                self.log(f"[IO] ⚠️ trace 录制开启失败: {e}", WARNING)
         
-        # 3. 多线程队列 (带容量限制，防止内存泄漏)
-        self.input_queue = queue.Queue(maxsize=1000)
+        # 3. 带序号的两级缓冲区 (共用一个条件变量，有新数据就唤醒等待者)
+        # 读线程 -> _raw: 未解码的原始行 (seq, bytes)
+        # 解码线程 -> _buffer: 已解码、还没被消费的状态 (seq, dict)
+        self.mailbox = mailbox
+        # 信箱模式：新行一到，旧行全部作废；队列模式：不丢，积压 queue_limit 行后背压
+        self.queue_limit = 1000
+        self._cond = threading.Condition()
+        self._raw = collections.deque()
+        self._buffer = collections.deque()
+        self.state_seq = 0      # 读线程收到的最新一行的序号 (单调递增，即状态版本号)
+        self.dropped_states = 0 # [信箱模式] 没被读走就被新行取代的过期行数 (每行最多计一次)
+        self.decode_errors = 0  # 无法解析的行数
+        self.consumed_seq = 0   # 主线程最近一次拿到的状态的序号
+        self._eof = False       # 读线程已读到 EOF
+        self.closed = False     # stdin 已关闭且剩余数据已解码完 (游戏退出)
+        self.decoder_name, self._loads = get_decoder(decoder)
         
-        # 4. 启动后台线程
+        # 4. 指令-响应关联
+        # CommunicationMod 对每条指令恰好回一条消息 (状态或 error)，且按顺序处理，
+        # 所以按 FIFO 把收到的行和未响应的指令一一对应即可。
+        self.cmd_seq = 0            # 指令编号 (send_command 的返回值，单调递增)
+        self._pending = collections.deque() # 未响应的指令: (ticket, cmd, 发送时刻)
+        self.response_timeout = 10.0 # 超过这个时间还没响应的指令视为丢失
+        self.lost_responses = 0     # 被判定丢失的响应数
+        self.command_errors = 0     # 游戏回 error 的指令数
+        self.consumed_ticket = None # 主线程最近一次拿到的状态所响应的指令编号 (None 表示主动推送)
+        self.consumed_command = None # ...以及对应的指令文本
+        self.last_recv_t = time.monotonic() # 最近一次收到数据的时刻
+        
+        # 延迟统计 / 选项记忆的存盘路径 (见 logic/latency.py、logic/choice_cache.py)：None = 默认文件；"" = 不存盘。
+        # 替身游戏 (mock_server) 拉起的进程会带 SPIRE_NO_PERSIST=1，它的延迟和界面对真游戏没有参考价值
+        no_persist = bool(os.environ.get("SPIRE_NO_PERSIST"))
+        self.latency_path = "" if no_persist else None
+        self.choice_cache_path = "" if no_persist else None
+        
+        # 所有 state 请求统一走调度器 (去重 + 限流 + 保活)
+        self.state_scheduler = StateRequestScheduler(self, max_rate=max_state_rate)
+        
+        # 5. 启动后台线程 (读取 + 解码)
         self.reader_thread = threading.Thread(target=self._read_stdin_loop, daemon=True)
         self.reader_thread.start()
+        self.decode_thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self.decode_thread.start()
         
-        self.log(">>> Connection initialized (Blocking-IO Support) <<<")
+        self.log(f">>> Connection initialized (Event-Driven IO, {'mailbox' if mailbox else 'queue'}, decoder={self.decoder_name}) <<<")
 
     def _read_stdin_loop(self):
-        """后台线程：死循环读取，读到就塞队列"""
+        """后台线程：死循环读取原始字节，读到就编号入 _raw 并唤醒解码线程"""
+        # 直接读 bytes，省掉一次 utf-8 解码；用独立的文件对象，避免退出时和 sys.stdin 抢锁
+        stream = self._in
+        if stream is None:
+            try:
+                stream = os.fdopen(sys.stdin.fileno(), 'rb', closefd=False)
+            except Exception:
+                stream = sys.stdin
         while True:
             try:
-                line = sys.stdin.readline()
-                if line:
-                    self.input_queue.put(line) # 如果队列满了会阻塞等待，形成背压
-                else:
-                    break 
+                if not self.mailbox:
+                    # 队列模式的背压：积压太多时先不读，让数据留在管道里 (游戏那边写满了自然会等)
+                    with self._cond:
+                        while len(self._raw) + len(self._buffer) >= self.queue_limit:
+                            self._cond.wait()
+                line = stream.readline()
+                if not line:
+                    break
+                if self.trace:
+                    self.trace.record_recv(line)
+                with self._cond:
+                    self.state_seq += 1
+                    self.last_recv_t = time.monotonic()
+                    ticket, cmd = self._match_response()
+                    if self.mailbox and (self._raw or self._buffer):
+                        # 还没解码 / 还没被读走的旧行都过期了 (正在解码的那条由解码线程自己丢弃并计数)
+                        self.dropped_states += len(self._raw) + len(self._buffer)
+                        self._raw.clear()
+                        self._buffer.clear()
+                    self._raw.append((self.state_seq, line, ticket, cmd))
+                    self._cond.notify_all()
             except:
                 break
+        with self._cond:
+            self._eof = True
+            self._cond.notify_all()
 
-    def log(self, message):
-        if not self.log_file: return
-        timestamp = time.strftime('%H:%M:%S')
-        try:
-            self.log_file.write(f"[{timestamp}] {message}\n")
-        except: pass 
+    def _decode_loop(self):
+        """
+        后台线程：把 _raw 里的原始行解码、建成 GameState 视图放进 _buffer。
+        解码期间新到的行在信箱模式下会互相覆盖，所以只会解码最新的那一条。
+        """
+        while True:
+            with self._cond:
+                while not self._raw and not self._eof:
+                    self._cond.wait()
+                if not self._raw:
+                    self.closed = True
+                    self._cond.notify_all()
+                    return
+                seq, line, ticket, cmd = self._raw.popleft()
+            # 解码放在锁外，不阻塞读线程和主线程
+            try:
+                state = GameState.parse(self._loads(line))
+            except Exception:
+                state = None
+            with self._cond:
+                if state is None:
+                    self.decode_errors += 1
+                    continue
+                if state.error is not None:
+                    self.command_errors += 1
+                if self.mailbox and seq < self.state_seq:
+                    # 解码期间已经来了更新的行：这条作废
+                    self.dropped_states += 1
+                    continue
+                self._buffer.append((seq, state, ticket, cmd))
+                self._cond.notify_all()
+            if state.error is not None:
+                self.log(f"[IO] ⚠️ 指令 '{cmd}' 被游戏拒绝: {state.error}", WARNING)
+
+    def _expire_pending(self):
+        """[持锁调用] 丢掉超时未响应的指令，防止一条丢失的响应让后面的关联全部错位"""
+        now = time.monotonic()
+        while self._pending and now - self._pending[0][2] > self.response_timeout:
+            self._pending.popleft()
+            self.lost_responses += 1
+
+    def _match_response(self):
+        """[持锁调用] 把刚收到的一行和最早的未响应指令配对，返回 (ticket, cmd)；没有则是主动推送"""
+        self._expire_pending()
+        if not self._pending:
+            return None, None
+        ticket, cmd, _ = self._pending.popleft()
+        return ticket, cmd
+
+    def awaiting_response(self):
+        """是否还有已发送、未超时、但尚未收到响应的指令"""
+        return self.latest_pending_ticket() is not None
+
+    def latest_pending_ticket(self):
+        """最新一条还在等响应的指令编号；没有则返回 None"""
+        with self._cond:
+            self._expire_pending()
+            return self._pending[-1][0] if self._pending else None
+
+    def request_state(self, wait=True):
+        """请求一条新状态 (经过调度器去重/限流)，返回可等待的指令编号，见 StateRequestScheduler.request"""
+        return self.state_scheduler.request(wait=wait)
+
+    def state_stats(self):
+        return self.state_scheduler.stats()
+
+    def log(self, message, level=INFO):
+        if not self.log_writer: return
+        self.log_writer.write(message, level)
+
+    def debug(self, message):
+        self.log(message, DEBUG)
+
+    def log_enabled(self, level=DEBUG):
+        """调用方在拼接昂贵的日志字符串之前先问一下，级别关闭时直接跳过"""
+        return self.log_writer is not None and self.log_writer.enabled(level)
+
+    def _pop_unread(self, after_seq, response_to):
+        """[持锁调用] 取出下一条符合序号/响应条件的未读状态，更老的直接丢弃"""
+        if self._buffer and not self.mailbox:
+            self._cond.notify_all() # 队列腾出了位置，唤醒可能在背压中等待的读线程
+        while self._buffer:
+            seq, state, ticket, cmd = self._buffer.popleft()
+            if after_seq is not None and seq <= after_seq:
+                continue
+            # 是更早指令的响应 -> 过期；主动推送 (ticket=None) 的状态总是比较新，照收
+            if response_to is not None and ticket is not None and ticket < response_to:
+                continue
+            self.consumed_seq = seq
+            self.consumed_ticket = ticket
+            self.consumed_command = cmd
+            return state
+        return None
+
+    def wait_for_state(self, after_seq=None, predicate=None, timeout=None, response_to=None):
+        """
+        [主线程调用] 事件驱动的等待接口。
+        阻塞到出现一条 序号 > after_seq 且满足 predicate 的状态为止，
+        读线程一送达新行就会被唤醒，不需要 sleep 轮询。
+        - after_seq=None: 不限制序号，从下一条未读状态开始
+        - predicate=None: 任何可解析的状态都算满足
+        - timeout=None: 一直等到满足或 stdin 关闭
+        - response_to: send_command 返回的指令编号，只接受这条指令 (或之后指令) 的响应
+        途中不满足条件的状态会被消费掉。超时返回 None。
+        拿到的状态响应的是哪条指令，记录在 consumed_ticket / consumed_command。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                state = self._pop_unread(after_seq, response_to)
+                while state is None:
+                    if self.closed:
+                        return None
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+                    state = self._pop_unread(after_seq, response_to)
+            # predicate 放在锁外判定，避免阻塞后台线程
+            if predicate is None or predicate(state):
+                return state
 
     def receive_state(self, timeout=None):
         """
@@ -57,28 +321,43 @@ class Connection:
         - timeout=None: 非阻塞模式 (立即返回数据或None)
         - timeout=float: 阻塞等待模式 (直到有数据或超时)
         """
+        return self.wait_for_state(timeout=0 if timeout is None else timeout)
+
+    def wait_for_response(self, ticket, timeout=None):
+        """[主线程调用] 等待编号为 ticket 的指令的响应 (或更新的状态)，超时返回 None"""
+        return self.wait_for_state(response_to=ticket, timeout=timeout)
+
+    def send_command(self, cmd):
+        """发送指令，返回指令编号 (ticket)，可用于 wait_for_response / wait_for_state(response_to=...)"""
+        # 先登记再发送，保证响应到达时一定能配对上
+        with self._cond:
+            self.cmd_seq += 1
+            ticket = self.cmd_seq
+            entry = (ticket, cmd.strip(), time.monotonic())
+            self._pending.append(entry)
         try:
-            # 如果 timeout 是数字，就会阻塞等待；如果是 None，就是非阻塞
-            block = (timeout is not None)
-            line = self.input_queue.get(block=block, timeout=timeout)
-            return json.loads(line)
-        except queue.Empty:
-            return None
-        except json.JSONDecodeError:
-            return None
-        except Exception:
+            print(cmd.strip(), file=self._out or sys.stdout, flush=True)
+        except (OSError, ValueError) as e:
+            # 没发出去就不会有响应：撤掉登记，否则后面收到的每一行都会错配到这条指令上
+            with self._cond:
+                try:
+                    self._pending.remove(entry)
+                except ValueError:
+                    pass
+            self.log(f"[IO] ❌ 指令 '{cmd.strip()}' 发送失败: {e}", WARNING)
             return None
+        if self.trace:
+            self.trace.record_send(cmd.strip())
+        if cmd != "state":
+            self.log(f"Send -> {cmd}", DEBUG)
+        return ticket
 
-    def send_command(self, cmd):
+    def close(self):
         try:
-            print(cmd.strip(), flush=True)
-            if cmd != "state":
-                self.log(f"Send -> {cmd}")
+            if self.trace: self.trace.close()
         except:
             pass
-
-    def close(self):
         try:
-            if self.log_file: self.log_file.close()
+            if self.log_writer: self.log_writer.close()
         except:
-            pass
\ No newline at end of file
+            pass
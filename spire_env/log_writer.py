@@ -0,0 +1,125 @@
+# log_writer.py
+"""
+异步分级日志 (给 Connection.log 用)
+主线程只做"级别判断 + 入队"，时间格式化、批量写盘、按大小轮转、gzip 压缩都在后台线程完成。
+"""
+import os
+import time
+import gzip
+import shutil
+import atexit
+import threading
+import collections
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+
+def parse_level(level):
+    """'debug' / 'INFO' / 20 -> 数字级别"""
+    if isinstance(level, int):
+        return level
+    return LEVEL_NAMES.get(str(level).upper(), INFO)
+
+class AsyncLogWriter:
+    def __init__(self, path, level=INFO, max_bytes=20 * 1024 * 1024, backup_count=3,
+                 compress=False, flush_interval=0.5, max_pending=50000):
+        """
+        :param level: 低于该级别的消息直接丢弃 (连字符串都不会被格式化)
+        :param max_bytes: 单个日志文件的大小上限，超过后轮转为 path.1, path.2 ...
+        :param backup_count: 保留的历史文件个数
+        :param compress: 轮转出去的历史文件是否 gzip 压缩 (path.1.gz)
+        :param flush_interval: 后台线程批量写盘的间隔 (秒)
+        :param max_pending: 队列上限，写盘跟不上时丢弃最老的消息 (计入 dropped)
+        """
+        self.path = path
+        self.level = parse_level(level)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        
+        self._queue = collections.deque(maxlen=max_pending) # deque.append 本身线程安全
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._file = open(path, "w", encoding='utf-8')
+        self._size = 0
+        
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def write(self, message, level=INFO):
+        """[任意线程调用] 只记录时间戳并入队，不做任何 IO"""
+        if level < self.level or self._stopped:
+            return
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append((time.time(), message))
+
+    def flush(self):
+        """要求后台线程立刻写盘 (不等待写完)"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        if not self._queue:
+            return
+        lines = []
+        last_sec, stamp = None, ""
+        while self._queue:
+            t, message = self._queue.popleft()
+            sec = int(t)
+            if sec != last_sec: # 同一秒内的消息复用格式化好的时间戳
+                last_sec, stamp = sec, time.strftime('%H:%M:%S', time.localtime(t))
+            lines.append(f"[{stamp}] {message}\n")
+        data = "".join(lines)
+        try:
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data.encode('utf-8'))
+            if self.max_bytes and self._size > self.max_bytes:
+                self._rotate()
+        except Exception:
+            pass
+
+    def _rotate(self):
+        """path -> path.1 (.gz)，已有的历史文件依次后移，超出 backup_count 的删除"""
+        self._file.close()
+        suffix = ".gz" if self.compress else ""
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}{suffix}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}{suffix}")
+        if self.backup_count > 0:
+            if self.compress:
+                with open(self.path, "rb") as f_in, gzip.open(f"{self.path}.1.gz", "wb") as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+            else:
+                os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "w", encoding='utf-8')
+        self._size = 0
+
+    def close(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=2.0)
+        try:
+            self._file.close()
+        except Exception:
+            pass
@@ -0,0 +1,135 @@
+# choice_cache.py
+"""
+[选项记忆] 记住每个界面上哪些 choose 下标真的生效了、花了多久，下次遇到同一界面先试它
+键是 (屏幕, 事件 id/名字, 选项列表签名)；每个下标记 生效次数 / 没生效次数 / 平均耗时。
+导航卡住时不再从 0 开始按固定节奏轮换下标：
+    - 有生效过的下标：选成功率最高的 (一样高时选快的)
+    - 都没生效过：选还没试过的最小下标
+    - 全都试过且都没生效：交回调用方的默认做法
+样本按 JSON 存盘 (默认 logs/choice_cache.json，环境变量 SPIRE_CHOICE_CACHE 可改，设为空串则不存盘)，
+长时间训练里反复出现的事件不用每次重新试错。
+"""
+import os
+import json
+import time
+import atexit
+import threading
+import collections
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_PATH = os.path.join(_PROJECT_ROOT, "logs", "choice_cache.json")
+
+def choice_key(state):
+    """(屏幕, 事件, 选项列表签名) -> 字符串键"""
+    return f"{state.screen}|{state.event or '*'}|{'/'.join(map(str, state.choices))}"
+
+class ChoiceCache:
+    def __init__(self, path=None, max_keys=5000, save_every=20):
+        """
+        :param path: 存盘文件，None = 读环境变量 SPIRE_CHOICE_CACHE，再默认 logs/choice_cache.json；"" = 不存盘
+        :param max_keys: 最多记多少个界面，超出时丢掉最久没更新的
+        """
+        if path is None:
+            path = os.environ.get("SPIRE_CHOICE_CACHE", DEFAULT_PATH)
+        self.path = path or None
+        self.max_keys = max_keys
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict() # 键 -> {下标(str): [生效次数, 没生效次数, 生效耗时总和]}
+        self._dirty = 0
+        self.hits = 0 # best() 给出了建议的次数
+        self.load()
+        if self.path:
+            atexit.register(self.save)
+
+    # --- 记录 ---
+    def record(self, state, idx, ok, seconds):
+        """记一次 choose idx 的结果 (ok = 界面确实变了)"""
+        key = choice_key(state)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                entry = {}
+                if len(self._entries) >= self.max_keys:
+                    self._entries.popitem(last=False)
+            self._entries[key] = entry # 放到最后 = 最近更新
+            rec = entry.get(str(idx))
+            if rec is None:
+                rec = entry[str(idx)] = [0, 0, 0.0]
+            if ok:
+                rec[0] += 1
+                rec[2] += seconds
+            else:
+                rec[1] += 1
+            self._dirty += 1
+            due = self.path and self._dirty >= self.save_every
+        if due:
+            self.save()
+
+    # --- 查询 ---
+    def best(self, state, default=None):
+        """这个界面上最该试的下标；没有任何依据时返回 default"""
+        n = len(state.choices)
+        with self._lock:
+            entry = self._entries.get(choice_key(state))
+            if not entry:
+                return default
+            best, best_score = None, None
+            for k, (ok, fail, total) in entry.items():
+                idx = int(k)
+                if ok and idx < max(n, 1):
+                    score = (ok / (ok + fail), -total / ok)
+                    if best_score is None or score > best_score:
+                        best, best_score = idx, score
+            if best is None:
+                best = next((i for i in range(n) if str(i) not in entry), None)
+        if best is None:
+            return default
+        self.hits += 1
+        return best
+
+    def stats(self):
+        with self._lock:
+            return {"keys": len(self._entries), "hits": self.hits}
+
+    # --- 存盘 ---
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                for k, entry in data.get("entries", {}).items():
+                    self._entries[k] = {i: list(rec) for i, rec in entry.items()}
+        except Exception:
+            pass # 文件坏了就当没有记忆，重新试
+
+    def save(self):
+        """原子写入 (先写临时文件再替换)"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {"version": 1, "saved_at": time.time(),
+                    "entries": {k: {i: [rec[0], rec[1], round(rec[2], 4)] for i, rec in entry.items()}
+                                for k, entry in self._entries.items()}}
+            self._dirty = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_cache(path=None):
+    """进程内按存盘路径共用 (同一进程里的多个 env 共享记忆，也只写一个文件)；path 含义同 ChoiceCache"""
+    with _shared_lock:
+        cache = _shared.get(path)
+        if cache is None:
+            cache = _shared[path] = ChoiceCache(path)
+        return cache
@@ -1,47 +1,64 @@
 # game_io.py
 import time
+from .wait_engine import engine_for
 
 def get_latest_state(conn, retry_limit=None):
     """
     [IO核心 - 阻塞式兜底版]
     这个函数现在承诺：**只要返回，就一定是有效数据。**
     
-    它会无限循环等待 connection 的队列里出现数据。
-    为了防止程序彻底死锁（比如游戏真挂了），我们可以在内部加一个长时间的警告机制。
+    它会阻塞在 connection 的条件变量上，读线程一送达数据就立刻返回，
+    不再 sleep 轮询。为了防止程序彻底死锁（比如游戏真挂了），内部保留长时间的报警机制。
     
     :param retry_limit: 以前是重试次数，现在这个参数被忽略，
                         或者作为'多少秒没收到数据就报警'的阈值。
     """
     
-    # 1. 快速通道：如果队列里已经有数据，立刻拿走
-    state = conn.receive_state(timeout=0.005) # 稍微阻塞 5ms 等待数据
+    # 1. 快速通道：如果缓冲区里已经有数据，立刻拿走
+    state = conn.wait_for_state(timeout=0)
     if state:
         return state
     
     # 2. 慢速通道：如果没有数据，进入死守模式
-    # 我们不返回 None，而是持续轮询
+    # 我们不返回 None，而是阻塞等待
     
     wait_start = time.time()
-    warning_triggered = False
     
     while True:
-        # 尝试阻塞读取 0.1 秒
-        state = conn.receive_state(timeout=0.1)
+        # 阻塞等待，有数据立刻被唤醒
+        state = conn.wait_for_state(timeout=0.5)
         if state:
             return state
             
-        # 如果长时间读不到数据 (比如 5秒)，说明游戏可能卡了或者指令丢了
-        # 此时我们可以主动发一个 "state" 唤醒一下
+        # 如果长时间读不到数据，说明游戏可能卡了或者指令丢了
+        # 每卡 2 秒由调度器主动催一下游戏 (Keep-Alive，已有请求在路上时不重复发)
         elapsed = time.time() - wait_start
-        
-        # 每卡 2 秒主动催一下游戏 (Keep-Alive)
-        if elapsed > 2.0:
-            if int(elapsed) % 2 == 0: # 简单的节流
-                # print(">>> [IO] 等待数据中，主动请求刷新...")
-                conn.send_command("state")
-                time.sleep(0.1) # 发完稍微等一下
+        conn.state_scheduler.keepalive(idle=2.0)
         
         # 极端情况保护：如果 60秒 还没数据，那肯定是游戏崩了
         # 这时候抛出异常比返回 None 要好，因为返回 None 会导致 AttributeError
         if elapsed > 60.0:
-            raise RuntimeError("Game IO Timeout: 游戏超过 60 秒未响应指令")
\ No newline at end of file
+            raise RuntimeError("Game IO Timeout: 游戏超过 60 秒未响应指令")
+        if conn.closed:
+            raise RuntimeError("Game IO Closed: 游戏已关闭 stdin")
+
+def refresh_state(conn, timeout=0.5):
+    """
+    [主动刷新] 请求一条新状态并等待它的响应 (而不是随便哪条旧状态)。
+    如果已有指令在等响应，调度器不会重复发 state，直接等那条响应。
+    超时后退回 get_latest_state 兜底，因此同样保证返回有效数据。
+    """
+    ticket = conn.request_state()
+    state = conn.wait_for_response(ticket, timeout=timeout)
+    return state if state else get_latest_state(conn)
+
+def wait_for(conn, predicate, timeout, ticket=None, keepalive=0.05, name="wait_for", key=None):
+    """
+    [条件等待] 等到出现满足 predicate 的状态 (返回该状态)，超时返回 None。
+    先等动作指令自己的响应；keepalive 秒没等到满足条件的状态时，交给调度器
+    补发一条 state (已有请求在路上则不发) —— 同一时间最多一条请求在路上，不再刷屏。
+    循环本身由等待引擎执行 (见 wait_engine.py)，统计记在 name 下。
+    :param ticket: 动作指令的编号 (conn.send_command 的返回值)，只接受它及之后的响应
+    :param key: (屏幕, 指令类型, id)，给出时 timeout 只是上限，实际按历史延迟推导 (见 latency.py)
+    """
+    return engine_for(conn).until(name, predicate, timeout, ticket=ticket, keepalive=keepalive, key=key)
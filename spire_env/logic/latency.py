@@ -0,0 +1,148 @@
+# latency.py
+"""
+[自适应超时] 记录每类动作从发指令到生效的实际耗时，按滚动分位数推导超时
+键是 (屏幕, 指令类型, 卡牌/药水 id)，同时累计一份 id 为 '*' 的汇总，样本不够时退到汇总，再退到默认值。
+    timeout = clamp(p95 * margin + slack, min_timeout (或这类等待自己的下限), 默认值)
+默认值 (代码里原来的常数) 是上限：开了 SuperFastMode 的真实延迟远小于它，超时随之收紧；
+如果收紧后开始超时，超时本身会作为一个 "至少这么久" 的样本记进去，分位数自然回升。
+样本按 JSON 存盘 (默认 logs/latency_stats.json，环境变量 SPIRE_LATENCY_FILE 可改，设为空串则不存盘)，
+下次启动直接带着历史延迟开跑。
+"""
+import os
+import json
+import time
+import atexit
+import threading
+import collections
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_PATH = os.path.join(_PROJECT_ROOT, "logs", "latency_stats.json")
+
+def _key(screen, cmd, item=None):
+    return f"{screen}|{cmd}|{item if item is not None else '*'}"
+
+class LatencyModel:
+    def __init__(self, path=None, window=200, min_samples=20, percentile=0.95, margin=3.0, slack=0.1,
+                 min_timeout=0.25, save_every=50):
+        """
+        :param path: 存盘文件，None = 读环境变量 SPIRE_LATENCY_FILE，再默认 logs/latency_stats.json；"" = 不存盘
+        :param window: 每个键保留最近多少个样本
+        :param min_samples: 样本数不到这个数时不用它推导 (退到汇总 / 默认值)
+        """
+        if path is None:
+            path = os.environ.get("SPIRE_LATENCY_FILE", DEFAULT_PATH)
+        self.path = path or None
+        self.window = window
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.margin = margin
+        self.slack = slack
+        self.min_timeout = min_timeout
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._samples = {}   # 键 -> deque[秒]
+        self._cache = {}     # 键 -> 分位数 (样本变了就作废)
+        self._dirty = 0
+        self.load()
+        if self.path:
+            atexit.register(self.save)
+
+    # --- 记录 ---
+    def observe(self, screen, cmd, item, seconds):
+        """记一次实际耗时 (同时记进 id='*' 的汇总)"""
+        with self._lock:
+            for k in {_key(screen, cmd, item), _key(screen, cmd)}:
+                q = self._samples.get(k)
+                if q is None:
+                    q = self._samples[k] = collections.deque(maxlen=self.window)
+                q.append(seconds)
+                self._cache.pop(k, None)
+            self._dirty += 1
+            due = self.path and self._dirty >= self.save_every
+        if due:
+            self.save()
+
+    # --- 查询 ---
+    def quantile(self, screen, cmd, item=None):
+        """(屏幕, 指令, id) 的 p-分位耗时；样本不够时看汇总，再不够返回 None"""
+        with self._lock:
+            for k in (_key(screen, cmd, item), _key(screen, cmd)):
+                q = self._cache.get(k)
+                if q is not None:
+                    return q
+                samples = self._samples.get(k)
+                if samples and len(samples) >= self.min_samples:
+                    ordered = sorted(samples)
+                    q = self._cache[k] = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+                    return q
+        return None
+
+    def timeout(self, screen, cmd, item, default, floor=None):
+        """
+        推导出的超时，不超过 default (代码里原来的常数)
+        :param floor: 这类等待自己的下限 (默认 min_timeout)；耗时波动很大的等待 (怪物回合) 用它防止被一串快样本收得太紧
+        """
+        q = self.quantile(screen, cmd, item)
+        if q is None:
+            return default
+        return min(default, max(floor or self.min_timeout, q * self.margin + self.slack))
+
+    def delay(self, screen, cmd, item, default):
+        """推导出的固定间隔 (比如 reset 里两次点击之间)，用分位数本身而不是放大后的超时，不超过 default"""
+        q = self.quantile(screen, cmd, item)
+        if q is None:
+            return default
+        return min(default, max(0.05, q + self.slack))
+
+    def stats(self):
+        """{键: (样本数, p-分位毫秒)}，日志用"""
+        out = {}
+        with self._lock:
+            keys = list(self._samples)
+        for k in keys:
+            screen, cmd, item = k.split("|")
+            q = self.quantile(screen, cmd, None if item == '*' else item)
+            out[k] = (len(self._samples[k]), None if q is None else round(1000 * q, 1))
+        return out
+
+    # --- 存盘 ---
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                for k, values in data.get("samples", {}).items():
+                    self._samples[k] = collections.deque(values[-self.window:], maxlen=self.window)
+                self._cache.clear()
+        except Exception:
+            pass # 文件坏了就当没有历史，重新学
+
+    def save(self):
+        """原子写入 (先写临时文件再替换)，多个进程同时写时后写的覆盖先写的"""
+        if not self.path:
+            return
+        with self._lock:
+            data = {"version": 1, "saved_at": time.time(),
+                    "samples": {k: [round(v, 4) for v in q] for k, q in self._samples.items()}}
+            self._dirty = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_model(path=None):
+    """进程内按存盘路径共用模型 (同一进程里的多个 env 共享样本，也只写一个文件)；path 含义同 LatencyModel"""
+    with _shared_lock:
+        model = _shared.get(path)
+        if model is None:
+            model = _shared[path] = LatencyModel(path)
+        return model
@@ -0,0 +1,73 @@
+# map_planner.py
+"""
+[地图规划] 用 CommunicationMod 给的整幅地图选路线，代替地图界面上一律 choose 0
+每幕第一次用到时把 game_state['map'] 解析成有向无环图 (节点 -> 上一层可达的子节点)，
+自顶向下做一次动态规划：best[节点] = 节点价值 + max(best[子节点])，
+按 (种子, 幕, 血量档) 缓存；之后每次地图决策只比较 next_nodes (最多 3 个) 的 best，O(1)。
+
+节点价值表可配置；血量低于 low_hp 时换用低血量表 (精英变成负分、篝火加分)：
+    planner = MapPlanner(values={'E': 3.0}, low_hp=0.4)
+地图信息缺失 (替身游戏、读不到 next_nodes) 时返回 None，由调用方退回原来的做法。
+"""
+
+# 符号: M 普通怪 / E 精英 / R 篝火 / $ 商店 / ? 未知 / T 宝箱
+DEFAULT_VALUES = {'M': 1.0, 'E': 2.5, 'R': 1.5, '$': 1.0, '?': 1.2, 'T': 2.0}
+# 血量低于 low_hp 时覆盖默认表的项
+LOW_HP_VALUES = {'M': 0.3, 'E': -3.0, 'R': 4.0, '?': 1.5}
+
+class MapPlanner:
+    def __init__(self, values=None, low_hp_values=None, low_hp=0.5):
+        """
+        :param values: 覆盖 DEFAULT_VALUES 的项
+        :param low_hp_values: 覆盖 LOW_HP_VALUES 的项
+        :param low_hp: 血量比例低于它时用低血量表
+        """
+        self.values = dict(DEFAULT_VALUES, **(values or {}))
+        self.low_values = dict(self.values, **LOW_HP_VALUES, **(low_hp_values or {}))
+        self.low_hp = low_hp
+        self._map_key = None
+        self._plans = {} # 血量档 -> {(x, y): best}
+        self.builds = 0  # 做了几次 DP (统计用)
+
+    def _plan(self, state, low):
+        key = (state.seed, state.act)
+        if key != self._map_key:
+            # 换了一幕 (或新的一局)：旧的规划作废
+            self._map_key = key
+            self._plans = {}
+        plan = self._plans.get(low)
+        if plan is None:
+            plan = self._plans[low] = self._build(state.map, self.low_values if low else self.values)
+        return plan
+
+    def _build(self, nodes, values):
+        """地图 -> {(x, y): 从这个节点出发能拿到的最大总价值}"""
+        self.builds += 1
+        best = {}
+        # 子节点都在更高一层：从最高层往下算，算到某个节点时它的子节点都已经算好
+        # 取存在的子节点里最大的 (可能是负数：低血量表里一路都是精英的路线就该是负分)；没有子节点 (顶层) 记 0
+        for node in sorted(nodes, key=lambda n: -n.get('y', 0)):
+            tail = None
+            for c in node.get('children') or ():
+                v = best.get((c.get('x'), c.get('y')))
+                if v is not None and (tail is None or v > tail):
+                    tail = v
+            best[(node.get('x'), node.get('y'))] = values.get(node.get('symbol'), 0.0) + (tail or 0.0)
+        return best
+
+    def choose(self, state):
+        """地图界面该选的 choice 下标；没有地图信息时返回 None"""
+        nexts = state.next_nodes
+        if not state.map or not nexts or len(nexts) != len(state.choices):
+            return None
+        low = state.hp < self.low_hp * max(1, state.max_hp)
+        plan = self._plan(state, low)
+        pick, pick_v = None, None
+        for i, n in enumerate(nexts):
+            v = plan.get((n.get('x'), n.get('y')))
+            if v is not None and (pick_v is None or v > pick_v):
+                pick, pick_v = i, v
+        return pick
+
+    def stats(self):
+        return {"builds": self.builds, "act": self._map_key[1] if self._map_key else None}
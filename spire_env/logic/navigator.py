@@ -1,381 +1,428 @@
+# navigator.py
+"""
+[导航核心 V18 - 表驱动版] 非战斗场景 (地图/事件/商店/篝火/奖励...) 自动操作，直到回到需要 Agent 决策的状态
+每种屏幕一个处理函数 (@screen_handler 注册)，只负责 "看状态 -> 决定做什么"：
+    返回 Act(指令, 原因, 等法, 超时) / Done(状态) / WAIT (状态还没到位) / None (没事可做)
+发指令、等生效、超时兜底、卡顿计数都由调度器 Navigator 统一处理，并按屏幕记次数和耗时统计
+(navigator_for(conn).stats())，看得出非战斗时间都花在哪。
+每次 choose 的结果 (界面变没变、花了多久) 记进选项记忆 (choice_cache.py)，卡住时先按记忆选下标，不再盲目轮换。
+地图界面按整幅地图的规划选路线 (map_planner.py)。
+
+    state = process_non_combat(conn, state)
+"""
 import time
-from .game_io import get_latest_state
+
+from .game_io import refresh_state, wait_for
 from .combat import ensure_hand_drawn
+from .choice_cache import shared_cache
+from .map_planner import MapPlanner
+from ..state import as_state
 
-def process_non_combat(conn, state):
+class Act:
     """
-    [导航核心 V17 - 篝火精灵/Grid 终极修复版]
-    针对 "篝火精灵" 等需要选牌后确认的事件进行了定力增强。
-    1. 引入"耐心选择"机制：不再每回合切换选择目标，而是连续尝试同一张牌 3 次 (idx = counter // 3)。
-       这能防止 AI 在 confirm 按钮出现前就急着换牌，导致选中状态丢失。
-    2. 保持了对 confirm 的最高优先级响应。
+    处理函数的决定：发一条指令
+    wait: 'transition' 等屏幕/指令/选项变化 (非战斗界面的默认)；'confirm' 等 confirm 消失；
+          'choose' 等指令列表变化；None 不等，直接刷新一条状态
+    timeout: 等待上限，None = 用注册时给这个屏幕的超时；实际按 (屏幕, 指令) 的历史延迟收紧 (见 latency.py)
     """
-    stuck_counter = 0
-    combat_wait_counter = 0
-    choose_stuck_counter = 0 
-    
-    same_screen_counter = 0
-    last_choice_idx = 0
-    last_screen_type = None
-    
-    while True:
-        # 1. 刷新状态
-        if not state or 'game_state' not in state:
-            time.sleep(0.05)
-            conn.send_command("state")
-            state = get_latest_state(conn, retry_limit=1)
-            stuck_counter += 1
-            if stuck_counter > 50: 
-                conn.send_command("state")
-                stuck_counter = 0
-            time.sleep(0.001)
+    __slots__ = ("cmd", "reason", "wait", "timeout")
+
+    def __init__(self, cmd, reason, wait="transition", timeout=None):
+        self.cmd = cmd
+        self.reason = reason
+        self.wait = wait
+        self.timeout = timeout
+
+class Done:
+    """处理函数的决定：导航结束，把状态交还给 Agent (settle=True 时先等抽牌稳定)"""
+    __slots__ = ("state", "settle")
+
+    def __init__(self, state, settle=False):
+        self.state = state
+        self.settle = settle
+
+WAIT = object() # 状态还没到位 (转场中 / 战斗动画中)：刷新一条状态再看
+
+class NavContext:
+    """一次导航 (一次 process_non_combat 调用) 里的计数器"""
+    __slots__ = ("conn", "choices", "planner", "stuck", "same_screen", "last_screen", "last_choice_idx",
+                 "choose_stuck", "choose_base", "combat_wait")
+
+    def __init__(self, conn, choices, planner):
+        self.conn = conn
+        self.choices = choices    # 选项记忆 (ChoiceCache)
+        self.planner = planner    # 地图规划 (MapPlanner)
+        self.stuck = 0            # 连续拿不到有效状态 / 没事可做的次数
+        self.same_screen = 0      # 停留在同一屏幕的轮数 (换路径、放弃选择用)
+        self.last_screen = None
+        self.last_choice_idx = 0  # 地图上一次选的路径
+        self.choose_stuck = 0     # 战斗中选牌连续选了几次还没生效
+        self.choose_base = 0      # 这一轮选牌从哪个下标开始轮换 (选项记忆给的)
+        self.combat_wait = 0      # 等战斗状态就绪的轮数
+
+class NavStats:
+    __slots__ = ("calls", "actions", "timeouts", "decide_s", "wait_s")
+
+    def __init__(self):
+        self.calls = self.actions = self.timeouts = 0
+        self.decide_s = self.wait_s = 0.0
+
+    def as_dict(self):
+        total = self.decide_s + self.wait_s
+        return {"calls": self.calls, "actions": self.actions, "timeouts": self.timeouts,
+                "decide_ms": round(1000 * self.decide_s, 1), "wait_ms": round(1000 * self.wait_s, 1),
+                "avg_ms": round(1000 * total / max(1, self.calls), 1)}
+
+# 全局注册表：屏幕 -> (处理函数, 默认等待超时)；'*' 是兜底
+HANDLERS = {}
+
+def screen_handler(*screens, timeout=2.0):
+    """注册屏幕处理函数 handler(state, ctx)；同一屏幕重复注册会覆盖"""
+    def deco(fn):
+        for s in screens:
+            HANDLERS[s] = (fn, timeout)
+        return fn
+    return deco
+
+# 调度器自己用的伪屏幕：战斗 (含战斗中的选牌)、结束、转场
+_COMBAT, _END, _NONE = 'COMBAT', 'END', 'NONE'
+
+def _screen_key(state):
+    screen = state.screen or 'N/A'
+    if screen in ('GAME_OVER', 'VICTORY'):
+        return _END
+    # 战斗中的 GRID/HAND_SELECT 交互也算战斗
+    if screen == 'COMBAT' or state.can_act or (state.phase == 'COMBAT' and screen in ('HAND_SELECT', 'GRID')):
+        return _COMBAT
+    return screen
+
+# ==========================================
+# 各屏幕的处理函数
+# ==========================================
+@screen_handler(_END)
+def _end(state, ctx):
+    return Done(state)
+
+@screen_handler(_NONE)
+def _transition(state, ctx):
+    # 转场过滤
+    return WAIT
+
+@screen_handler(_COMBAT)
+def _combat(state, ctx):
+    """
+    篝火精灵等需要选牌后确认的事件：
+    1. "耐心选择"：连续尝试同一张牌 3 次 (idx = counter // 3)，防止 confirm 出现前就换牌导致选中状态丢失
+    2. 看见 confirm 就点 (最高优先级)
+    """
+    cmds = state.command_set
+    screen = state.screen or 'N/A'
+    # 1. 最高优先级：看见 Confirm 就点，绝不犹豫
+    # 最多给 3 秒动画时间等 confirm 消失，防止因为动画延迟以为没点上而疯狂连点；
+    # 3 秒后 confirm 还在，下一轮会再点一次 (兜底防丢包)
+    if 'confirm' in cmds:
+        ctx.choose_stuck = 0
+        return Act("confirm", "交互确认", wait="confirm", timeout=3.0)
+    # 2. 选择逻辑 (Choose)
+    # 只有当 'choose' 存在，且不能打牌(play)时，才视为选择界面
+    if 'choose' in cmds and not state.can_act:
+        if screen in ('HAND_SELECT', 'GRID'):
+            # 停止自动导航，将状态返回给 Agent，让神经网络决定选哪张牌
+            return Done(state)
+        # 第一次选之前先问选项记忆：这个界面以前哪张选了能生效
+        if ctx.choose_stuck == 0:
+            ctx.choose_base = ctx.choices.best(state, 0)
+        # [关键修复] 降低切换频率
+        # (counter // 3) % 5 意味着：counter=0,1,2 -> 选第 base 张；counter=3,4,5 -> 选第 base+1 张
+        # 这样保证了每一张牌都有 3 次机会等待 confirm 出现
+        idx = (ctx.choose_base + ctx.choose_stuck // 3) % 5
+        # 特殊情况：如果是篝火(Rest)的卡牌奖励界面，通常只选第0个就行，不需要轮询
+        if screen == 'CARD_REWARD':
+            idx = 0
+        ctx.choose_stuck += 1
+        # 等待时间 (上限)：指令列表一变化就提前返回
+        return Act(f"choose {idx}", f"交互选择 (Screen:{screen})", wait="choose",
+                   timeout=0.5 if screen == 'GRID' else 0.15)
+    # 成功脱离了 choose 循环，重置计数
+    ctx.choose_stuck = 0
+    # --- [正常战斗逻辑] ---
+    if state.can_act:
+        return Done(state, settle=True)
+    ctx.combat_wait += 1
+    if ctx.combat_wait % 20 == 0:
+        return Act("ready", "等待战斗就绪", wait=None)
+    return WAIT
+
+@screen_handler('SHOP')
+def _shop(state, ctx):
+    for kw in ('leave', 'return', 'cancel', 'proceed'):
+        if kw in state.command_set:
+            return Act(kw, "离开商店 (禁买)")
+    return None
+
+@screen_handler('REST')
+def _rest(state, ctx):
+    cmds = state.command_set
+    # 如果还没做选择 (有 choose 指令)
+    if 'choose' in cmds:
+        # 1. 血量 (视图里已兼容不同层级：战斗中取 player，否则取 game_state 顶层)
+        hp_ratio = state.hp / max(1, state.max_hp)
+        # 2. 分析选项，典型的 choice_list 长这样: ['rest', 'smith', 'toke'...]
+        choice_list = state.choices
+        # 默认行为：找 "rest" (索引通常是 0)
+        target_action = "rest"
+        # 3. 如果血量健康 (>50%)，且可以锻造，就优先锻造
+        if hp_ratio > 0.5:
+            if 'smith' in choice_list:
+                target_action = "smith"
+            elif 'dig' in choice_list: # 如果有铲子
+                target_action = "dig"
+            elif 'lift' in choice_list: # 如果有吉拉亚
+                target_action = "lift"
+        # 4. 找到目标动作在列表里的索引
+        try:
+            idx = choice_list.index(target_action)
+            return Act(f"choose {idx}", f"篝火决策: {target_action} (HP: {int(hp_ratio*100)}%)")
+        except ValueError:
+            # 想做的做不了（比如满血不能rest，或者没牌升级不能smith）就选第一个能用的
+            return Act("choose 0", "篝火默认选择")
+    # 如果已经选完了 (有 proceed)
+    if 'proceed' in cmds:
+        return Act('proceed', "离开篝火")
+    return None
+
+@screen_handler('MAP', timeout=4.0) # 地图加载慢，给 4s
+def _map(state, ctx):
+    cmds = state.command_set
+    if 'choose' in cmds:
+        if ctx.same_screen > 5:
+            # 卡住了：先按选项记忆换，记忆里没有依据再轮换
+            idx = ctx.choices.best(state)
+            if idx is None or idx == ctx.last_choice_idx:
+                idx = (ctx.last_choice_idx + 1) % 3
+            ctx.last_choice_idx = idx
+            return Act(f"choose {idx}", f"切换路径 ({idx})")
+        idx = ctx.planner.choose(state)
+        if idx is not None:
+            ctx.last_choice_idx = idx
+            node = state.next_nodes[idx]
+            return Act(f"choose {idx}", f"路线规划: {node.get('symbol')} (x={node.get('x')})")
+        # 没有地图信息：按选项记忆，再默认 0
+        idx = ctx.last_choice_idx = ctx.choices.best(state, 0)
+        return Act(f"choose {idx}", "选择路径 (默认)" if idx == 0 else f"选择路径 (记忆 {idx})")
+    if 'return' in cmds or 'cancel' in cmds:
+        return Act('return' if 'return' in cmds else 'cancel', "关闭地图")
+    return None
+
+@screen_handler('CHEST')
+def _chest(state, ctx):
+    cmds = state.command_set
+    # 1. 还没开箱子，先开
+    if 'open' in cmds:
+        return Act('open', "开启宝箱")
+    # 2. 箱子开了，里面的东西 (遗物/金币/钥匙) 会变成 'choose' 选项
+    # 无脑拿第一个：拿完一个状态会刷新，下一轮拿第二个
+    if 'choose' in cmds:
+        return Act("choose 0", "拿取宝箱奖励")
+    # 3. 拿空了，继续
+    if 'proceed' in cmds:
+        return Act('proceed', "离开宝箱房间")
+    return None
+
+@screen_handler('COMBAT_REWARD', timeout=0.5) # 拿奖励很快，只要 0.5s 就够了，拿完立刻走
+def _combat_reward(state, ctx):
+    # 1. 检查药水是否满了 (药水栏位置视图里已做兼容)
+    potions = state.potions
+    filled_slots = state.filled_potions
+    is_potion_full = (filled_slots >= len(potions)) and (len(potions) > 0)
+    # 2. 遍历奖励列表 (例如 ['gold', 'potion', 'card'])，跳过不该拿的
+    for i, item_name in enumerate(state.choices):
+        # 核心修复：如果是药水且包满了，绝对不要选它！
+        if item_name == 'potion' and is_potion_full:
+            ctx.conn.log(f"[Nav] ⚠️ 药水已满 ({filled_slots}/{len(potions)})，自动跳过药水奖励")
             continue
+        # 找到一个能拿的就去拿，拿完状态会刷新，下一轮再拿下一个
+        return Act(f"choose {i}", f"拿取奖励: {item_name}")
+    # 3. 没有东西可拿了（或者只剩下拿不了的药水），点击继续/跳过
+    for kw in ('proceed', 'skip', 'leave', 'cancel'):
+        if kw in state.command_set:
+            return Act(kw, "离开奖励结算")
+    return None
 
-        game = state.get('game_state', {})
-        screen = game.get('screen_type', 'N/A')
-        cmds = state.get('available_commands', [])
-        phase = game.get('room_phase', '')
-
-        # 更新卡顿计数
-        if screen == last_screen_type:
-            same_screen_counter += 1
-        else:
-            same_screen_counter = 0
-            last_screen_type = screen
-
-        # ==========================================
-        # 2. 战斗与交互检测 (含 GRID/HAND_SELECT)
-        # ==========================================
-        is_combat_interaction = (phase == 'COMBAT') and (screen in ['HAND_SELECT', 'GRID'])
-        is_combat = (screen == 'COMBAT') or \
-                    ('play' in cmds) or \
-                    ('end' in cmds) or \
-                    is_combat_interaction
-                    # (screen == 'CARD_REWARD') # 有些奖励界面也需要点击
-        
-        if screen in ['GAME_OVER', 'VICTORY']: 
-            return state
-        
-        if is_combat:
-            # --- [Grid/Hand Select 专用逻辑] ---
-            
-            # 1. 最高优先级：看见 Confirm 就点，绝不犹豫
-            # 1. 最高优先级：看见 Confirm 就点
-            if 'confirm' in cmds:
-                conn.log(f"[Combat] 交互确认 -> confirm")
-                conn.send_command("confirm")
-                choose_stuck_counter = 0 
-                
-                # [关键修复] 智能等待 confirm 消失
-                # 防止因为动画延迟导致脚本以为没点上，从而疯狂连点
-                start_wait = time.time()
-                while time.time() - start_wait < 3.0: # 最多给 3 秒动画时间
-                    time.sleep(0.01) # 每次小睡 0.2s
-                    conn.send_command("state")
-                    # 使用较小的 retry 防止这里卡死
-                    new_s = get_latest_state(conn, retry_limit=2)
-                    
-                    if new_s:
-                        state = new_s # 更新这一轮的状态
-                        
-                        # 检查 confirm 是否已经消失
-                        if 'confirm' not in state.get('available_commands', []):
-                            # 消失了！说明点击生效，动画结束，跳出循环进入下一步
-                            break
-                
-                # 如果 3 秒后 confirm 还在，循环会自动结束，
-                # 外层 while True 会再次进来点一次（作为兜底防丢包），这比无限连点要安全得多。
-                time.sleep(0.001)
-                continue
-            # 2. 选择逻辑 (Choose)
-            # 只有当 'choose' 存在，且不能打牌(play)时，才视为选择界面
-            if 'choose' in cmds and 'play' not in cmds and 'end' not in cmds:
-                if screen in ['HAND_SELECT', 'GRID']:
-                    # 停止自动导航，将状态返回给 Agent，让神经网络决定选哪张牌
-                    return state
-                # [关键修复] 降低切换频率
-                # (counter // 3) % 5 意味着：
-                # counter=0,1,2 -> 选第 0 张
-                # counter=3,4,5 -> 选第 1 张
-                # 这样保证了每一张牌都有 3 次机会等待 confirm 出现
-                idx = (choose_stuck_counter // 3) % 5 
-                
-                # 特殊情况：如果是篝火(Rest)的卡牌奖励界面，通常只选第0个就行，不需要轮询
-                if screen == 'CARD_REWARD':
-                    idx = 0
-
-                conn.log(f"[Combat] 交互选择 (Screen:{screen}) -> choose {idx}")
-                conn.send_command(f"choose {idx}")
-                
-                choose_stuck_counter += 1
-                
-                # 等待时间
-                wait_time = 0.5 if screen == 'GRID' else 0.15
-                time.sleep(wait_time)
-                
-                conn.send_command("state")
-                state = get_latest_state(conn)
-                time.sleep(0.001)
+@screen_handler('BOSS_REWARD', 'GRID', 'HAND_SELECT', 'CARD_REWARD')
+def _reward(state, ctx):
+    cmds = state.command_set
+    # 同一界面停留太久就不再选，改为离开
+    if 'choose' in cmds and ctx.same_screen <= 100:
+        idx = ctx.last_choice_idx = ctx.choices.best(state, 0)
+        return Act(f"choose {idx}", "拿取奖励/选择 (默认)" if idx == 0 else f"拿取奖励/选择 (记忆 {idx})")
+    for kw in ('proceed', 'skip', 'leave', 'start', 'next', 'cancel'):
+        if kw in cmds:
+            return Act(kw, "离开奖励界面")
+    return None
+
+@screen_handler('*')
+def _other(state, ctx):
+    # 事件等其他界面
+    cmds = state.command_set
+    for kw in ('leave', 'return', 'cancel', 'proceed', 'skip', 'start', 'next'):
+        if kw in cmds:
+            return Act(kw, "离开/前进")
+    if 'choose' in cmds:
+        # 以前在这里选 0 没反应的事件，按选项记忆换一个
+        idx = ctx.choices.best(state, 0)
+        return Act(f"choose {idx}", "事件选择" if idx == 0 else f"事件选择 (记忆 {idx})")
+    if 'click' in cmds:
+        return Act('click', "点击对话")
+    return None
+
+# ==========================================
+# 调度器
+# ==========================================
+class Navigator:
+    def __init__(self, conn):
+        self.conn = conn
+        self.handlers = HANDLERS # 默认用全局注册表
+        # conn.choice_cache_path: 替身游戏 (mock_server) 设为 "" —— 替身的界面不写进真游戏的记忆
+        self.choices = shared_cache(getattr(conn, "choice_cache_path", None))
+        self.planner = MapPlanner() # 想换节点价值表时直接替换 navigator_for(conn).planner
+        self._stats = {}
+
+    def _stat(self, key):
+        st = self._stats.get(key)
+        if st is None:
+            st = self._stats[key] = NavStats()
+        return st
+
+    def _decide(self, key, state, ctx):
+        fn, timeout = self.handlers.get(key) or self.handlers['*']
+        if key != _COMBAT:
+            ctx.combat_wait = 0
+            ctx.choose_stuck = 0
+            # [T0] 非战斗界面：看见 confirm 先确认
+            if key not in (_END, _NONE) and 'confirm' in state.command_set:
+                return Act('confirm', "确认/继续"), timeout
+        return fn(state, ctx), timeout
+
+    def run(self, state):
+        """导航到需要 Agent 决策的状态 (战斗中能出手 / 战斗中的选牌 / 游戏结束) 并返回它"""
+        conn = self.conn
+        ctx = NavContext(conn, self.choices, self.planner)
+        state = as_state(state)
+        while True:
+            # 1. 刷新状态
+            if not state or not state.in_game:
+                state = refresh_state(conn, timeout=0.05)
+                ctx.stuck += 1
+                if ctx.stuck > 50:
+                    conn.request_state()
+                    ctx.stuck = 0
                 continue
-            
-            # 如果成功脱离了 choose 循环，重置计数
-            choose_stuck_counter = 0
 
-            # --- [正常战斗逻辑] ---
-            if 'play' in cmds or 'end' in cmds:
-                return ensure_hand_drawn(conn, state)
+            # 更新卡顿计数
+            screen = state.screen or 'N/A'
+            if screen == ctx.last_screen:
+                ctx.same_screen += 1
             else:
-                combat_wait_counter += 1
-                if combat_wait_counter % 20 == 0: 
-                    conn.send_command("ready")
-                time.sleep(0.01)
-                conn.send_command("state")
-                state = get_latest_state(conn)
-                time.sleep(0.001)
-                continue
-        else:
-            combat_wait_counter = 0
-            choose_stuck_counter = 0
-
-        # 3. 转场过滤
-        if screen == 'NONE':
-            time.sleep(0.01); conn.send_command("state")
-            state = get_latest_state(conn); continue
-
-        # ==========================================
-        # 4. 决策逻辑 (非战斗)
-        # ==========================================
-        action_cmd = None
-        decision_reason = "" 
-
-        # [T0] 确认
-        if 'confirm' in cmds: 
-            action_cmd = 'confirm'
-            decision_reason = "确认/继续"
-
-        if not action_cmd:
-            
-            # === A. 商店 (SHOP) ===
-            if screen == 'SHOP':
-                for kw in ['leave', 'return', 'cancel', 'proceed']:
-                    if kw in cmds: 
-                        action_cmd = kw
-                        decision_reason = "离开商店 (禁买)"
-                        break
-            # === [新增] 篝火 (REST) ===
-            elif screen == 'REST':
-                # 如果还没做选择 (有 choose 指令)
-                if 'choose' in cmds:
-                    # 1. 获取玩家血量信息
-                    player = game.get('combat_state', {}).get('player') or \
-                             game.get('player', {}) # 兼容不同层级
-                    
-                    current_hp = player.get('current_hp', 0)
-                    max_hp = player.get('max_hp', 80)
-                    hp_ratio = current_hp / max(1, max_hp)
-                    
-                    # 2. 分析选项
-                    choice_list = game.get('choice_list', [])
-                    # 典型的 choice_list 长这样: ['rest', 'smith', 'toke'...]
-                    
-                    # 默认行为：找 "rest" (索引通常是 0)
-                    target_action = "rest"
-                    
-                    # 3. 决策逻辑
-                    # 如果血量健康 (>50%)，且可以锻造，就优先锻造
-                    if hp_ratio > 0.5:
-                        if 'smith' in choice_list:
-                            target_action = "smith"
-                        elif 'dig' in choice_list: # 如果有铲子
-                            target_action = "dig"
-                        elif 'lift' in choice_list: # 如果有吉拉亚
-                            target_action = "lift"
-                            
-                    # 4. 执行选择
-                    # 找到目标动作在列表里的索引
-                    try:
-                        idx = choice_list.index(target_action)
-                        action_cmd = f"choose {idx}"
-                        decision_reason = f"篝火决策: {target_action} (HP: {int(hp_ratio*100)}%)"
-                    except ValueError:
-                        # 如果想做的做不了（比如满血不能rest，或者没牌升级不能smith）
-                        # 就选第一个能用的
-                        action_cmd = "choose 0"
-                        decision_reason = "篝火默认选择"
-                
-                # 如果已经选完了 (有 proceed)
-                elif 'proceed' in cmds:
-                    action_cmd = 'proceed'
-                    decision_reason = "离开篝火"
-            # === B. 地图 (MAP) ===
-            elif screen == 'MAP':
-                if 'choose' in cmds:
-                    if same_screen_counter > 5:
-                        idx = (last_choice_idx + 1) % 3 
-                        action_cmd = f"choose {idx}"
-                        last_choice_idx = idx
-                        decision_reason = f"切换路径 ({idx})"
-                    else:
-                        action_cmd = "choose 0"
-                        last_choice_idx = 0
-                        decision_reason = "选择路径 (默认)"
-                
-                elif 'return' in cmds or 'cancel' in cmds:
-                    action_cmd = 'return' if 'return' in cmds else 'cancel'
-                    decision_reason = "关闭地图"
-            # === [新增] 宝箱 (CHEST) ===
-            elif screen == 'CHEST':
-                # 1. 还没开箱子，先开
-                if 'open' in cmds:
-                    action_cmd = 'open'
-                    decision_reason = "开启宝箱"
-                
-                # 2. 箱子开了，里面有东西 (遗物/金币/钥匙)
-                # Communication Mod 通常会把箱子里的东西变成 'choose' 选项
-                elif 'choose' in cmds:
-                    # 这里不需要太复杂，无脑拿第一个就行
-                    # 因为拿完一个，状态会刷新，下次循环拿第二个
-                    # 除非你有 "诅咒钥匙(Cursed Key)" 遗物不想拿，但现阶段建议全拿
-                    action_cmd = "choose 0" 
-                    decision_reason = "拿取宝箱奖励"
-                    
-                # 3. 拿空了，继续
-                elif 'proceed' in cmds:
-                    action_cmd = 'proceed'
-                    decision_reason = "离开宝箱房间"
-            # === [新增/修改] C1. 战斗奖励专用逻辑 (修复药水卡死) ===
-            elif screen == 'COMBAT_REWARD':
-                # 1. 检查药水是否满了
-                combat_state = game.get('combat_state', {})
-                # 注意：有些情况下 potions 在 game_state 根目录下，有些在 combat_state 下，做个兼容
-                potions = combat_state.get('potions', []) or game.get('potions', [])
-                
-                # 计算已填充的格子 (ID 不是 "Potion Slot" 的就是有药水)
-                filled_slots = [p for p in potions if p.get('id') != 'Potion Slot']
-                is_potion_full = (len(filled_slots) >= len(potions)) and (len(potions) > 0)
-                
-                # 2. 遍历奖励列表，跳过不该拿的
-                choice_list = game.get('choice_list', []) # 例如 ['gold', 'potion', 'card']
-                target_idx = -1
-                target_name = ""
-
-                for i, item_name in enumerate(choice_list):
-                    # 核心修复：如果是药水且包满了，绝对不要选它！
-                    if item_name == 'potion' and is_potion_full:
-                        conn.log(f"[Nav] ⚠️ 药水已满 ({len(filled_slots)}/{len(potions)})，自动跳过药水奖励")
-                        continue
-                    
-                    # 只要不是(满包时的药水)，就拿第一个遇到的东西
-                    target_idx = i
-                    target_name = item_name
-                    break # 找到一个能拿的就去拿，拿完状态会刷新，下次循环再拿下一个
-                
-                # 3. 执行决策
-                if target_idx != -1:
-                    action_cmd = f"choose {target_idx}"
-                    decision_reason = f"拿取奖励: {target_name}"
-                else:
-                    # 如果没有东西可拿了（或者只剩下拿不了的药水），点击继续/跳过
-                    for kw in ['proceed', 'skip', 'leave', 'cancel']:
-                        if kw in cmds: 
-                            action_cmd = kw
-                            decision_reason = "离开奖励结算"
-                            break
-
-            # === C. 奖励与选择 ===
-            elif screen in ['BOSS_REWARD', 'REST', 'GRID', 'HAND_SELECT', 'CARD_REWARD']:
-                
-                if 'choose' in cmds:
-                    if same_screen_counter > 100: 
-                         pass 
-                    else:
-                        action_cmd = "choose 0"
-                        last_choice_idx = 0
-                        decision_reason = "拿取奖励/选择 (默认)"
-                
-                if not action_cmd:
-                    for kw in ['proceed', 'skip', 'leave', 'start', 'next', 'cancel']:
-                        if kw in cmds: 
-                            action_cmd = kw
-                            decision_reason = "离开奖励界面"
-                            break
-
-            # === D. 其他 ===
+                ctx.same_screen = 0
+                ctx.last_screen = screen
+
+            # 2. 决策
+            key = _screen_key(state)
+            st = self._stat(key)
+            st.calls += 1
+            t0 = time.monotonic()
+            decision, default_timeout = self._decide(key, state, ctx)
+            t1 = time.monotonic()
+            st.decide_s += t1 - t0
+
+            # 3. 执行与等待
+            if isinstance(decision, Done):
+                state = decision.state
+                if decision.settle:
+                    state = ensure_hand_drawn(conn, state)
+                st.wait_s += time.monotonic() - t1
+                return state
+            if decision is None:
+                ctx.stuck += 1
+                state = refresh_state(conn)
+            elif decision is WAIT:
+                state = refresh_state(conn)
             else:
-                for kw in ['leave', 'return', 'cancel', 'proceed', 'skip', 'start', 'next']:
-                    if kw in cmds: 
-                        action_cmd = kw
-                        decision_reason = "离开/前进"
-                        break
-                
-                if not action_cmd and 'choose' in cmds:
-                    action_cmd = "choose 0"
-                    decision_reason = "事件选择"
-
-                if not action_cmd and 'click' in cmds:
-                    action_cmd = 'click'
-                    decision_reason = "点击对话"
-
-        # ==========================================
-        # 5. 执行与等待
-        # ==========================================
-        if action_cmd:
-            # 日志
-            cmds_str = str(cmds) if len(cmds) < 5 else str(cmds[:5] + ['...'])
-            conn.log(f"┌─ [Nav State] Screen: {screen} | Cmds: {cmds_str}")
-            conn.log(f"└─ [Auto] 执行: {action_cmd} ({decision_reason})")
-            
-            prev_screen = screen
-            prev_cmds = cmds
-            
-            conn.send_command(action_cmd)
-            stuck_counter = 0
-            
-            wait_start = time.time()
-
-            # [优化] 动态超时时间
-            # MAP: 地图加载慢，给 8s
-            # COMBAT_REWARD: 拿奖励很快，只要 0.5s 就够了，不要傻等
-            if screen == 'MAP':
-                t_out = 4.0
-            elif screen == 'COMBAT_REWARD':
-                t_out = 0.5 # <--- 关键修改：拿完奖励立刻走
+                st.actions += 1
+                state = self._execute(decision, state, ctx, st, default_timeout)
+            st.wait_s += time.monotonic() - t1
+
+    def _execute(self, act, state, ctx, st, default_timeout):
+        """发指令并按 act.wait 等它生效，返回下一条状态"""
+        conn = self.conn
+        screen = state.screen or 'N/A'
+        cmds = state.command_set
+        timeout = act.timeout if act.timeout is not None else default_timeout
+        key = (screen, act.cmd.split()[0], None)
+
+        if act.wait != "transition":
+            conn.log(f"[Combat] {act.reason} -> {act.cmd}")
+            ticket = conn.send_command(act.cmd)
+            if act.wait is None:
+                return refresh_state(conn)
+            if act.wait == "confirm":
+                # confirm 一消失立刻被唤醒
+                pred, name = (lambda s: 'confirm' not in s.command_set), "nav_confirm"
             else:
-                t_out = 2.0
-            
-            transitioned = False
-            while time.time() - wait_start < t_out:
-                conn.send_command("state")
-                next_s = get_latest_state(conn, retry_limit=1)
-                
-                if next_s:
-                    ng = next_s.get('game_state', {})
-                    ns = ng.get('screen_type')
-                    nc = next_s.get('available_commands')
-                    np = ng.get('room_phase')
-                    
-                    if ns == 'NONE' or ns == 'COMBAT' or np == 'COMBAT':
-                        state = next_s; transitioned = True; break
-                    # [关键修改] 获取选项列表的内容摘要
-                    prev_choices = game.get('choice_list', [])
-                    next_choices = ng.get('choice_list', [])
-                    
-                    # 新逻辑：增加对选项列表变化的检测
-                    # 如果选项的数量变了，或者内容变了，也视为状态切换成功
-                    choices_changed = (len(prev_choices) != len(next_choices)) or (prev_choices != next_choices)
-
-                    if ns != prev_screen or nc != prev_cmds or choices_changed:
-                        state = next_s; transitioned = True; same_screen_counter = 0; break
-                
-                time.sleep(0.05)
-            
-            if not transitioned:
-                state = get_latest_state(conn)
-                same_screen_counter += 1
-        else:
-            stuck_counter += 1
-            time.sleep(0.01)
-            conn.send_command("state")
-            state = get_latest_state(conn)
-            
-    return state
\ No newline at end of file
+                pred, name = (lambda s: s.command_set != cmds), "nav_choose"
+            sent = time.monotonic()
+            new_s = wait_for(conn, pred, timeout=timeout, ticket=ticket, name=name, key=key)
+            self._remember(act, state, new_s, sent)
+            if not new_s:
+                st.timeouts += 1
+                return refresh_state(conn)
+            return new_s
+
+        # 日志
+        cmd_list = list(state.commands)
+        cmds_str = str(cmd_list) if len(cmd_list) < 5 else str(cmd_list[:5] + ['...'])
+        conn.log(f"┌─ [Nav State] Screen: {screen} | Cmds: {cmds_str}")
+        conn.log(f"└─ [Auto] 执行: {act.cmd} ({act.reason})")
+
+        prev_choices = state.choices
+        ticket = conn.send_command(act.cmd)
+        ctx.stuck = 0
+
+        def transitioned(next_s):
+            if next_s.screen == 'NONE' or next_s.screen == 'COMBAT' or next_s.phase == 'COMBAT':
+                return True
+            # 屏幕、指令变了，或者选项列表 (数量/内容) 变了，都视为状态切换成功
+            return next_s.screen != screen or next_s.command_set != cmds or next_s.choices != prev_choices
+
+        sent = time.monotonic()
+        next_s = wait_for(conn, transitioned, timeout=timeout, ticket=ticket, name="nav_transition", key=key)
+        self._remember(act, state, next_s, sent)
+        if next_s:
+            if not (next_s.screen in ('NONE', 'COMBAT') or next_s.phase == 'COMBAT'):
+                ctx.same_screen = 0
+            return next_s
+        st.timeouts += 1
+        ctx.same_screen += 1
+        return refresh_state(conn)
+
+    def _remember(self, act, state, result, sent):
+        """choose 的结果记进选项记忆"""
+        verb, _, arg = act.cmd.partition(" ")
+        if verb == "choose" and arg.isdigit():
+            self.choices.record(state, int(arg), result is not None, time.monotonic() - sent)
+
+    def stats(self):
+        """{屏幕: {calls, actions, timeouts, decide_ms, wait_ms, avg_ms}}"""
+        return {key: st.as_dict() for key, st in self._stats.items()}
+
+def navigator_for(conn):
+    """每个 Connection 一个调度器 (第一次用时挂到 conn.navigator 上)，统计跨调用累计"""
+    nav = getattr(conn, "navigator", None)
+    if nav is None:
+        nav = conn.navigator = Navigator(conn)
+    return nav
+
+def process_non_combat(conn, state):
+    """自动处理非战斗场景，返回需要 Agent 决策的状态"""
+    return navigator_for(conn).run(state)
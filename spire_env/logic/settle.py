@@ -0,0 +1,130 @@
+# settle.py
+"""
+[局面稳定检测] 等一串自动结算 (药水连打、抽牌动画...) 结束，局面一稳定立刻返回，代替固定 sleep / 轮询
+逐条看新状态的 "局面签名" (手牌/抽牌堆/弃牌堆/消耗堆张数、能量、怪物血量与意图、药水...)：
+- 就绪 (ready_for_command、能 play/end、该抽的牌已经抽到、怪物意图已定) 且签名连续不变，就算稳定；
+- 起点状态本身已经就绪时，它就算第一条：再来一条签名相同的状态 (一次往返) 即可返回；
+- 调用方可以给出 "预期效果" (比如抽牌堆少了 3 张)：看到预期效果后只要再确认一条不变就返回，
+  没看到时要连续 stable 条不变才返回 (兜底，防止预期效果因为洗牌等原因永远不出现)。
+等待本身交给等待引擎 (唤醒/补发 state/超时/统计)，超时按 (屏幕, 'settle', id) 的历史延迟推导：
+药水结算的 id 是药水 id，抽牌稳定的 id 是遭遇指纹 (见 encounter_key)。
+"""
+from ..diff import diff, END_SCREENS
+from .wait_engine import engine_for
+
+# 意图还没定下来 (怪物回合刚结束、新意图还没滚出来) 时 CommunicationMod 给的值
+_PENDING_INTENTS = frozenset(['DEBUG'])
+
+def board_signature(s):
+    """局面签名：自动结算过程中会变的东西"""
+    return (s.screen, len(s.hand), len(s.draw_pile), len(s.discard_pile), len(s.exhaust_pile),
+            s.energy, s.monster_hp, s.alive_count, s.intents, s.filled_potions, s.hp)
+
+def encounter_key(s):
+    """
+    遭遇指纹：活着的怪物 id (排好序) 拼起来，当延迟键的 id 用。
+    战斗里的 screen_key 永远是 'COMBAT'，不带它的话一只邪教徒和六火亡魂 / 五只史莱姆的回合共用一份延迟分布
+    """
+    return "+".join(s.monster_ids) or None
+
+def board_ready(s):
+    """
+    游戏给出的就绪信号：在等指令、轮到我方出手、
+    手牌不空 (或者牌堆里根本没牌可抽)、活着的怪物意图都已确定
+    """
+    if not (s.ready and s.can_act):
+        return False
+    if not s.hand and (s.draw_pile or s.discard_pile):
+        return False
+    for intent in s.intents:
+        if intent in _PENDING_INTENTS:
+            return False
+    return True
+
+def _spent(s):
+    return len(s.discard_pile) + len(s.exhaust_pile)
+
+# 药水 id -> (预期效果 predicate(delta)，超时上限)
+# delta = diff(用药水之前的状态, 当前状态)；按 id 而不是本地化的名字识别
+POTION_SETTLE = {
+    # 精炼混沌：打出抽牌堆顶的 3 张牌 -> 抽牌堆少 3 张、弃牌堆 (+消耗堆) 多 3 张
+    # (抽牌堆不够时会洗牌，两个都看不到，走兜底)
+    'DistilledChaos': (lambda d: len(d.curr.draw_pile) <= len(d.prev.draw_pile) - 3
+                       or _spent(d.curr) >= _spent(d.prev) + 3, 3.5),
+    # 乱酿：把空的药水槽全部填满 (有 Sozu 时不会填，走兜底)
+    'EntropicBrew': (lambda d: d.curr.filled_potions >= len(d.curr.potions), 1.5),
+}
+
+def _settled(base, expect, stable, seed=False):
+    """
+    有状态的 predicate：记住上一条的签名和连续不变的条数；最后看到的状态放在 check.last
+    :param seed: 起点状态已就绪时把它算作第一条 (起点就是结算后的状态，而不是动作之前的状态)
+    """
+    run = [board_signature(base), 1] if seed and board_ready(base) else [None, 0] # [上一条签名, 连续相同的条数]
+
+    def check(s):
+        check.last = s
+        if s.screen in END_SCREENS:
+            return True
+        sig = board_signature(s)
+        if sig == run[0]:
+            run[1] += 1
+        else:
+            run[0], run[1] = sig, 1
+        if not (s.ready and s.can_act):
+            return False # 动作队列还没清空
+        if not board_ready(s):
+            # 游戏在等指令，但手牌空着 / 意图未定：可能还在抽牌，也可能本来就是这样
+            # (回合中途把牌打光了)，多确认两条再放行
+            return run[1] >= stable + 2
+        if expect is not None and expect(diff(base, s)):
+            return run[1] >= 2
+        return run[1] >= stable
+    check.last = None
+    return check
+
+def wait_settled(conn, base, expect=None, timeout=2.0, stable=3, name="settle", key=None, seed=False,
+                 ticket=None):
+    """
+    等局面稳定，返回稳定后的状态 (超时返回 None)。
+    :param base: 自动结算开始之前的状态 (expect 收到的 delta 以它为基准)
+    :param expect: 预期效果 predicate(delta)，None 表示只看稳定
+    :param timeout: 上限；给出 key 时按历史延迟收紧
+    :param stable: 没看到预期效果时，需要连续几条签名不变
+    :param seed: 见 _settled
+    :param ticket: 只看这条指令及之后的响应
+    """
+    return engine_for(conn).until(name, _settled(base, expect, stable, seed), timeout, ticket=ticket, key=key)
+
+def wait_board_settled(conn, state, timeout=2.0):
+    """
+    [新回合 / 回到战斗] 等抽牌等自动结算完成，返回稳定后的状态 (超时返回最后拿到的状态)。
+    起点已就绪时只需要一次往返确认；没就绪时 (手牌还空着、还不能出手) 等到连续两条就绪且相同。
+    """
+    ticket = conn.request_state() # 马上要一条新状态 (最多等调度器的最小间隔)，不等 keepalive 窗口
+    check = _settled(state, None, 2, seed=True)
+    # 下限取默认上限的一半：同一遭遇里也有慢的回合 (分裂、召唤)，别被一串快样本收到 0.25 秒
+    settled = engine_for(conn).until("board_settled", check, timeout, ticket=ticket,
+                                     key=(state.screen_key, "settle", encounter_key(state)),
+                                     min_timeout=timeout / 2)
+    if settled is not None:
+        return settled
+    conn.log("[Wait] ⚠️ 等待局面稳定超时，用最后拿到的状态继续")
+    # 起点之后一条新状态都没等到时才退回起点
+    return check.last if check.last is not None else state
+
+def wait_potion_settled(conn, base, potion_id):
+    """
+    用完会自动连锁结算的药水之后，等结算完成。不需要特殊等待的药水直接返回 None。
+    :param base: 用药水之前的状态
+    """
+    rule = POTION_SETTLE.get(potion_id)
+    if rule is None:
+        return None
+    expect, limit = rule
+    conn.log(f"[Wait] 检测到 {potion_id}，等待自动结算完成 (最多 {limit}s)...")
+    state = wait_settled(conn, base, expect, timeout=limit, name=f"settle_{potion_id}",
+                         key=(base.screen_key, "settle", potion_id))
+    if state is None:
+        conn.log(f"[Wait] ⚠️ {potion_id} 结算等待超时，继续")
+    return state
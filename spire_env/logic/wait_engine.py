@@ -0,0 +1,150 @@
+# wait_engine.py
+"""
+[声明式等待引擎] 各处 "发完指令等它生效" 的循环统一交给这里
+调用方只声明 "等什么" (predicate)、"最多等多久" (timeout)、"多久没动静要重发" (retry_every)，
+唤醒 / 补发 state / 重试 / 计时由引擎统一处理，并按等待名字记统计 (次数、命中、超时、重试、耗时)。
+
+    register("card_played", lambda d: d.card_played, timeout=4.0)          # 模块导入时声明一次
+    state = engine_for(conn).wait("card_played", base=prev, ticket=ticket)  # 用的时候按名字等
+
+base 给出时 predicate 收到的是 diff(base, state) (见 diff.py)，否则收到 state 本身。
+key=(屏幕, 指令类型, 卡牌/药水 id) 给出时，超时从该键的历史延迟推导 (见 latency.py)，
+声明里的 timeout 只作为上限，min_timeout 作为下限；每次命中的耗时也记回该键。
+"""
+import time
+
+from ..diff import diff
+from .latency import shared_model
+
+class WaitSpec:
+    __slots__ = ("name", "predicate", "timeout", "keepalive", "retry_every", "min_timeout")
+
+    def __init__(self, name, predicate, timeout, keepalive=0.05, retry_every=None, min_timeout=None):
+        self.name = name
+        self.predicate = predicate       # predicate(delta 或 state, **params) -> bool
+        self.timeout = timeout           # 总超时 (秒)
+        self.keepalive = keepalive       # 多久没等到满足条件的状态就补发一条 state
+        self.retry_every = retry_every   # 多久没生效就调用一次 retry (None = 不重试)
+        self.min_timeout = min_timeout   # 按历史延迟收紧时的下限 (None = 用延迟模型的 min_timeout)
+
+class WaitStats:
+    __slots__ = ("calls", "hits", "timeouts", "retries", "total_s", "max_s")
+
+    def __init__(self):
+        self.calls = self.hits = self.timeouts = self.retries = 0
+        self.total_s = self.max_s = 0.0
+
+    def record(self, elapsed, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.timeouts += 1
+        self.total_s += elapsed
+        if elapsed > self.max_s:
+            self.max_s = elapsed
+
+    def as_dict(self):
+        return {"calls": self.calls, "hits": self.hits, "timeouts": self.timeouts, "retries": self.retries,
+                "avg_ms": round(1000 * self.total_s / max(1, self.calls), 1),
+                "max_ms": round(1000 * self.max_s, 1)}
+
+# 全局声明表：名字 -> WaitSpec (各模块导入时 register)
+SPECS = {}
+
+def register(name, predicate, timeout, keepalive=0.05, retry_every=None, min_timeout=None):
+    """声明一种等待，返回 WaitSpec；同名重复声明会覆盖"""
+    spec = SPECS[name] = WaitSpec(name, predicate, timeout, keepalive, retry_every, min_timeout)
+    return spec
+
+class WaitEngine:
+    def __init__(self, conn, latency=None):
+        self.conn = conn
+        self.specs = SPECS   # 默认用全局声明表
+        # conn.latency_path: 替身游戏 (mock_server) 设为 "" —— 它的延迟对真游戏没有参考价值，不存盘
+        self.latency = latency if latency is not None else shared_model(getattr(conn, "latency_path", None))
+        self._stats = {}
+
+    def _stat(self, name):
+        st = self._stats.get(name)
+        if st is None:
+            st = self._stats[name] = WaitStats()
+        return st
+
+    def wait(self, name, base=None, ticket=None, retry=None, timeout=None, key=None, **params):
+        """
+        按声明等待，返回满足条件的状态，超时返回 None。
+        :param base: 动作之前的状态；给出时 predicate 收到 diff(base, state)
+        :param ticket: 动作指令的编号，只接受它及之后的响应
+        :param retry: retry(第几次) -> 新指令的 ticket (或 None)；spec.retry_every 秒没生效时调用
+        :param timeout: 临时覆盖声明里的超时 (不再按 key 推导)
+        :param key: (屏幕, 指令类型, id)，按它的历史延迟推导超时并记录本次耗时
+        :param params: 透传给 predicate 的额外参数 (比如药水槽位)
+        """
+        spec = self.specs[name]
+        pred = spec.predicate
+        if base is not None:
+            check = (lambda s: pred(diff(base, s), **params)) if params else (lambda s: pred(diff(base, s)))
+        else:
+            check = (lambda s: pred(s, **params)) if params else pred
+        if timeout is None:
+            timeout = spec.timeout if key is None else self.latency.timeout(*key, spec.timeout, spec.min_timeout)
+        return self._run(name, check, timeout, ticket, spec.keepalive,
+                         spec.retry_every if retry is not None else None, retry, key)
+
+    def until(self, name, predicate, timeout, ticket=None, keepalive=0.05, key=None, min_timeout=None):
+        """
+        临时的等待 (不需要事先声明)，统计同样记在 name 下；key 的含义同 wait，timeout 是上限，
+        min_timeout 是按 key 收紧时的下限
+        """
+        if key is not None:
+            timeout = self.latency.timeout(*key, timeout, min_timeout)
+        return self._run(name, predicate, timeout, ticket, keepalive, None, None, key)
+
+    def _run(self, name, check, timeout, ticket, keepalive, retry_every, retry, key=None):
+        conn = self.conn
+        st = self._stat(name)
+        st.calls += 1
+        start = last_send = time.monotonic()
+        attempt = 0
+        while True:
+            now = time.monotonic()
+            remaining = timeout - (now - start)
+            if remaining <= 0:
+                break
+            window = min(keepalive, remaining)
+            state = conn.wait_for_state(response_to=ticket, predicate=check, timeout=window)
+            if state:
+                elapsed = time.monotonic() - start
+                st.record(elapsed, True)
+                if key is not None:
+                    self.latency.observe(*key, elapsed)
+                return state
+            if conn.closed:
+                break
+            if retry_every is not None and time.monotonic() - last_send > retry_every:
+                attempt += 1
+                st.retries += 1
+                new_ticket = retry(attempt)
+                if new_ticket is not None:
+                    ticket = new_ticket
+                last_send = time.monotonic()
+                continue
+            # 没等到：交给调度器补发一条 state (已有请求在路上则不发)
+            conn.request_state(wait=False)
+        elapsed = time.monotonic() - start
+        st.record(elapsed, False)
+        if key is not None and not conn.closed:
+            # 超时说明真实延迟至少这么久：按两倍记一个样本，收得太紧时分位数会自己涨回去
+            self.latency.observe(*key, 2 * elapsed)
+        return None
+
+    def stats(self):
+        """{名字: {calls, hits, timeouts, retries, avg_ms, max_ms}}"""
+        return {name: st.as_dict() for name, st in self._stats.items()}
+
+def engine_for(conn):
+    """每个 Connection 一个引擎 (第一次用时挂到 conn.wait_engine 上)"""
+    engine = getattr(conn, "wait_engine", None)
+    if engine is None:
+        engine = conn.wait_engine = WaitEngine(conn)
+    return engine
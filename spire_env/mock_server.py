@@ -0,0 +1,286 @@
+# mock_server.py
+"""
+本地 CommunicationMod 替身 (不用启动游戏)
+说的是同一套 stdin/stdout JSON 协议：AI 每发一行指令，替身回一行状态 (或 error)。
+游戏内容由 "替身游戏" 决定：
+  - TraceReplayGame: 回放 trace.py 录下来的真实状态流
+  - ScriptedGame:    手写的状态机 (内置 demo: 主菜单 -> 涅奥 -> 地图 -> 战斗 -> 奖励 -> ...)
+  - SimGame:         sim/combat.py 的第一幕战斗模拟器
+  - 任何实现了 handle(cmd) 的对象
+
+用法 1 - 像 CommunicationMod 一样拉起 AI 脚本:
+    python -m spire_env.mock_server --script demo --latency 0.005 -- python main.py
+    python -m spire_env.mock_server --trace logs/run.trace --latency-cmd play=0.2 -- python play.py
+用法 2 - 进程内直连 (测试 / 基准):
+    conn = connect_mock(ScriptedGame.demo())
+    env = SlayTheSpireEnv(conn=conn)
+两种用法都不会把替身的数据写进真游戏的存盘统计 (用法 1 给子进程设 SPIRE_NO_PERSIST=1)。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+from .trace import TraceReader, RECV
+
+def error_response(message):
+    return {"error": message, "ready_for_command": True}
+
+def command_verb(cmd):
+    """'play 1 0' -> 'play'"""
+    return cmd.strip().split(" ", 1)[0].lower()
+
+class TraceReplayGame:
+    """按顺序回放录制到的状态：每收到一条指令 (不管内容) 就回下一条录制的状态"""
+    def __init__(self, path, loop=False):
+        self.states = [r.data for r in TraceReader(path).records() if r.direction == RECV]
+        if not self.states:
+            raise ValueError(f"trace 里没有任何状态: {path}")
+        self.loop = loop
+        self.pos = 0
+
+    def handle(self, cmd):
+        if self.pos >= len(self.states):
+            if not self.loop:
+                return self.states[-1] # 放完了就一直停在最后一帧
+            self.pos = 0
+        line = self.states[self.pos]
+        self.pos += 1
+        return line
+
+class ScriptedGame:
+    """
+    手写状态机。
+    :param states: {状态名: 状态 dict}
+    :param transitions: {(状态名, 指令动词): 下一个状态名 或 callable(game, cmd) -> 状态名}
+    :param start: 初始状态名
+    state / ready / wait 总是回当前状态；当前状态的 available_commands 里没有的指令回 error。
+    """
+    def __init__(self, states, transitions, start):
+        self.states = states
+        self.transitions = transitions
+        self.current = start
+        self.vars = {} # 给 callable 转移用的计数器等
+
+    def handle(self, cmd):
+        verb = command_verb(cmd)
+        state = self.states[self.current]
+        if verb in ('state', 'ready', 'wait'):
+            return state
+        if verb not in state.get('available_commands', []):
+            return error_response(f"Invalid command: {cmd.strip()}")
+        nxt = self.transitions.get((self.current, verb))
+        if callable(nxt):
+            nxt = nxt(self, cmd)
+        if nxt is not None:
+            self.current = nxt
+        return self.states[self.current]
+
+    @classmethod
+    def demo(cls, combats_per_run=3, max_turns=10):
+        """
+        内置剧本：主菜单 -> 涅奥事件 -> 地图 -> 邪教徒战斗 -> 战斗奖励 -> 地图 ...
+        第 1 回合打 3 张 Strike 后怪剩 2 血，之后任意回合再打一张就赢；
+        一直不出牌拖到第 max_turns 回合结束算阵亡。
+        打完 combats_per_run 场后进入 GAME_OVER，proceed 回主菜单。
+        """
+        states = {
+            "main_menu": _screen_state("MAIN_MENU", ["start", "state"], in_game=False),
+            "neow": _screen_state("EVENT", ["choose", "state"], choice_list=["talk"]),
+            "map": _screen_state("MAP", ["choose", "state"], choice_list=["x=0"]),
+            "reward": _screen_state("COMBAT_REWARD", ["choose", "proceed", "state"], choice_list=["gold"]),
+            "reward_empty": _screen_state("COMBAT_REWARD", ["proceed", "state"]),
+            "game_over": _screen_state("GAME_OVER", ["proceed", "state"]),
+        }
+        # 战斗：每打一张 Strike 扣 1 费、怪掉 6 血
+        chain = [(1, 3, 20), (1, 2, 14), (1, 1, 8), (1, 0, 2)]
+        chain += [(turn, 3, 2) for turn in range(2, max_turns + 1)]
+        for turn, energy, hp in chain:
+            states[f"combat_t{turn}_e{energy}"] = _combat_state(turn, energy, hp)
+        transitions = {
+            ("main_menu", "start"): "neow",
+            ("neow", "choose"): "map",
+            ("map", "choose"): _enter_combat,
+            ("combat_t1_e3", "play"): "combat_t1_e2",
+            ("combat_t1_e2", "play"): "combat_t1_e1",
+            ("combat_t1_e1", "play"): "combat_t1_e0",
+            ("reward", "choose"): "reward_empty",
+            ("reward", "proceed"): lambda g, c: "game_over" if g.vars["combats"] >= combats_per_run else "map",
+            ("reward_empty", "proceed"): lambda g, c: "game_over" if g.vars["combats"] >= combats_per_run else "map",
+            ("game_over", "proceed"): _back_to_menu,
+        }
+        for turn, energy, _ in chain:
+            name = f"combat_t{turn}_e{energy}"
+            transitions[(name, "end")] = f"combat_t{turn + 1}_e3" if turn < max_turns else "game_over"
+            if turn > 1:
+                transitions[(name, "play")] = "reward"
+        game = cls(states, transitions, "main_menu")
+        game.vars["combats"] = 0
+        return game
+
+def _enter_combat(game, cmd):
+    game.vars["combats"] += 1
+    return "combat_t1_e3"
+
+def _back_to_menu(game, cmd):
+    game.vars["combats"] = 0
+    return "main_menu"
+
+def _screen_state(screen, cmds, choice_list=None, in_game=True):
+    return {
+        "available_commands": cmds,
+        "ready_for_command": True,
+        "in_game": in_game,
+        "game_state": {
+            "screen_type": screen, "room_phase": "EVENT" if screen == "EVENT" else "COMPLETE",
+            "floor": 1, "act": 1, "gold": 99, "current_hp": 80, "max_hp": 80, "class": "IRONCLAD",
+            "choice_list": choice_list or [],
+            "relics": [{"id": "Burning Blood", "name": "Burning Blood", "counter": -1}],
+            "potions": [_EMPTY_POTION] * 3,
+        },
+    }
+
+_EMPTY_POTION = {"id": "Potion Slot", "name": "Potion Slot", "can_use": False,
+                 "can_discard": False, "requires_target": False}
+
+def _combat_state(turn, energy, monster_hp):
+    hand = [{"id": "Strike_R", "name": "Strike", "uuid": f"strike-{i}", "cost": 1, "type": "ATTACK",
+             "upgrades": 0, "has_target": True, "is_playable": energy >= 1}
+            for i in range(energy + 2)]
+    state = _screen_state("NONE", ["play", "end", "state"])
+    state["game_state"]["room_phase"] = "COMBAT"
+    state["game_state"]["combat_state"] = {
+        "turn": turn,
+        "player": {"current_hp": 80, "max_hp": 80, "block": 0, "energy": energy, "powers": []},
+        "hand": hand, "draw_pile": [], "discard_pile": [], "exhaust_pile": [],
+        "monsters": [{"id": "Cultist", "name": "Cultist", "current_hp": monster_hp, "max_hp": 48,
+                      "block": 0, "intent": "BUFF" if turn == 1 else "ATTACK",
+                      "move_adjusted_damage": -1 if turn == 1 else 6,
+                      "is_gone": False, "half_dead": False, "powers": []}],
+    }
+    return state
+
+class MockServer:
+    def __init__(self, game, latency=0.0, latency_by_command=None):
+        """
+        :param latency: 每条指令的默认响应延迟 (秒)
+        :param latency_by_command: 按指令动词单独设置延迟，比如 {"play": 0.2, "end": 0.8}
+        """
+        self.game = game
+        self.latency = latency
+        self.latency_by_command = latency_by_command or {}
+        self.commands = 0
+
+    def respond(self, cmd):
+        """处理一条指令，返回要写回的一行 (bytes，带换行)"""
+        self.commands += 1
+        delay = self.latency_by_command.get(command_verb(cmd), self.latency)
+        if delay > 0:
+            time.sleep(delay)
+        state = self.game.handle(cmd)
+        if isinstance(state, dict):
+            state = json.dumps(state)
+        if isinstance(state, str):
+            state = state.encode('utf-8')
+        return state.rstrip(b"\n") + b"\n"
+
+    def serve(self, cmd_stream, state_stream):
+        """从 cmd_stream 逐行读指令，把响应写到 state_stream，直到对方关闭"""
+        while True:
+            line = cmd_stream.readline()
+            if not line:
+                break
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', 'replace')
+            if not line.strip():
+                continue
+            try:
+                state_stream.write(self.respond(line))
+                state_stream.flush()
+            except (BrokenPipeError, ValueError):
+                break
+
+    def run_process(self, argv):
+        """
+        像 CommunicationMod 一样拉起 AI 进程，用它的 stdin/stdout 通讯，返回退出码。
+        子进程带上 SPIRE_NO_PERSIST=1：替身的数据不写进真游戏的延迟统计等存盘文件 (见 interface.Connection)
+        """
+        env = dict(os.environ, SPIRE_NO_PERSIST="1")
+        proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        try:
+            self.serve(proc.stdout, proc.stdin)
+        finally:
+            try:
+                proc.stdin.close()
+            except Exception:
+                pass
+        return proc.wait()
+
+def connect_mock(game, latency=0.0, latency_by_command=None, **conn_kwargs):
+    """
+    在本进程的后台线程里起一个 MockServer，返回连到它的 Connection。
+    conn.mock_server 可以拿到服务端对象 (统计指令数等)。
+    """
+    from .interface import Connection
+    cmd_r, cmd_w = os.pipe()     # Connection 写指令 -> 替身读
+    state_r, state_w = os.pipe() # 替身写状态 -> Connection 读
+    server = MockServer(game, latency=latency, latency_by_command=latency_by_command)
+
+    def serve():
+        state_stream = os.fdopen(state_w, 'wb')
+        try:
+            server.serve(os.fdopen(cmd_r, 'rb'), state_stream)
+        finally:
+            # 指令管道被关掉 = AI 那边断开：关掉状态管道，Connection 读到 EOF (和游戏退出一样)
+            state_stream.close()
+    threading.Thread(target=serve, daemon=True).start()
+    conn = Connection(in_stream=os.fdopen(state_r, 'rb'), out_stream=os.fdopen(cmd_w, 'w'), **conn_kwargs)
+    conn.mock_server = server
+    conn.latency_path = "" # 替身的延迟不写进真游戏的延迟统计 (见 logic/latency.py)
+    conn.choice_cache_path = "" # 替身的界面也不写进真游戏的选项记忆 (见 logic/choice_cache.py)
+    return conn
+
+def _parse_latency_cmd(items):
+    table = {}
+    for item in items or []:
+        verb, _, seconds = item.partition("=")
+        table[verb.lower()] = float(seconds)
+    return table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地 CommunicationMod 替身")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--trace", help="回放这个 trace 文件")
+    src.add_argument("--script", choices=["demo", "sim"], help="使用内置剧本 (sim = 第一幕战斗模拟器)")
+    parser.add_argument("--loop", action="store_true", help="trace 放完后从头循环")
+    parser.add_argument("--seed", type=int, default=None, help="模拟器随机种子 (--script sim)")
+    parser.add_argument("--latency", type=float, default=0.0, help="默认响应延迟 (秒)")
+    parser.add_argument("--latency-cmd", action="append", metavar="VERB=SEC",
+                        help="按指令单独设置延迟，可重复，如 --latency-cmd play=0.2")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="-- 之后是要拉起的 AI 进程命令")
+    args = parser.parse_args(argv)
+
+    cmd = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not cmd:
+        parser.error("缺少要拉起的 AI 进程命令 (写在 -- 之后)")
+
+    if args.trace:
+        game = TraceReplayGame(args.trace, loop=args.loop)
+    elif args.script == "sim":
+        from .sim.combat import SimGame
+        game = SimGame(seed=args.seed)
+    else:
+        game = ScriptedGame.demo()
+    server = MockServer(game, latency=args.latency, latency_by_command=_parse_latency_cmd(args.latency_cmd))
+    start = time.time()
+    code = server.run_process(cmd)
+    elapsed = max(time.time() - start, 1e-9)
+    print(f"[mock] 处理指令 {server.commands} 条，用时 {elapsed:.1f}s ({server.commands / elapsed:.1f} 条/秒)",
+          file=sys.stderr)
+    return code
+
+if __name__ == '__main__':
+    sys.exit(main())
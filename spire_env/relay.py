@@ -0,0 +1,92 @@
+# relay.py
+"""
+多实例训练用的 "传话筒"
+CommunicationMod 拉起的不再是训练脚本本身，而是这个 relay：
+它先替训练脚本回 CommunicationMod 一句 ready，然后连上训练进程里的 SocketBroker (broker.py)，
+之后把 stdin (游戏状态) 原样转发到 socket、把 socket 里的指令原样写回 stdout，直到任一端关闭。
+
+CommunicationMod 的 config.properties 里这样配 (只依赖标准库，可以直接按文件路径运行):
+    command=python C:/path/to/spire_env/relay.py --address /tmp/spire_broker.sock --name game1
+地址写 host:port 时走 TCP (没有 Unix socket 的系统用这个)。
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+
+DEFAULT_ADDRESS = os.environ.get("SPIRE_BROKER_ADDRESS") or \
+    ("/tmp/spire_broker.sock" if hasattr(socket, "AF_UNIX") else "127.0.0.1:47000")
+
+def parse_address(address):
+    """'/tmp/x.sock' -> (AF_UNIX, path)；'127.0.0.1:47000' -> (AF_INET, (host, port))"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+def connect(address, timeout=60.0):
+    """连接 broker；训练进程可能还没起来，在 timeout 内反复重试"""
+    family, addr = parse_address(address)
+    deadline = time.monotonic() + timeout
+    while True:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(addr)
+            return sock
+        except OSError:
+            sock.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+def _pump(src, dst):
+    """逐行搬运，src 读到 EOF 就返回"""
+    try:
+        for line in iter(src.readline, b""):
+            dst.write(line)
+            dst.flush()
+    except (OSError, ValueError):
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CommunicationMod <-> 训练进程 转发器")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="broker 地址 (Unix socket 路径或 host:port)")
+    parser.add_argument("--name", default=None, help="实例名 (出现在训练端日志里)")
+    parser.add_argument("--connect-timeout", type=float, default=60.0)
+    args = parser.parse_args(argv)
+
+    stdin = os.fdopen(sys.stdin.fileno(), "rb", closefd=False)
+    stdout = os.fdopen(sys.stdout.fileno(), "wb", closefd=False)
+
+    # CommunicationMod 的握手：进程启动后先说 ready，游戏才会开始推状态
+    stdout.write(b"ready\n")
+    stdout.flush()
+
+    sock = connect(args.address, timeout=args.connect_timeout)
+    sock_r = sock.makefile("rb")
+    sock_w = sock.makefile("wb")
+    hello = {"relay": args.name or f"pid{os.getpid()}", "pid": os.getpid()}
+    sock_w.write(json.dumps(hello).encode("utf-8") + b"\n")
+    sock_w.flush()
+
+    # 游戏 -> 训练端 在后台线程，训练端 -> 游戏 在主线程
+    def upstream():
+        _pump(stdin, sock_w)
+        try:
+            sock.shutdown(socket.SHUT_WR) # 游戏退出了，让训练端读到 EOF
+        except OSError:
+            pass
+    threading.Thread(target=upstream, daemon=True).start()
+    _pump(sock_r, stdout)
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,627 @@
+# batched.py
+"""
+[模拟器] 批量 NumPy 战斗引擎 (struct-of-arrays)
+一次推进 N 场战斗：所有数值都是 (N,) / (N, 槽位) 的整数数组，
+手牌存卡牌词表下标 (vocabulary.CARD_TO_INDEX)，抽牌堆/弃牌堆存 "每种卡几张" 的计数数组，
+观察直接按 ObservationConfig 的布局写成 (N, SIZE) 的 float32 矩阵，不经过状态 dict。
+
+和 combat.py 的 CombatSim 共用 cards.py / monsters.py 数据表，但只建模表格化的效果：
+  - 卡牌: 伤害/段数/AOE/格挡/易伤/虚弱/抽牌/回能/力量/自损/塞牌/消耗/虚无，
+          外加 X 费、全身撞击、重刃、随机目标
+  - 怪物: 开场招 + 循环/按权重随机，攻击/格挡/力量/仪式/负面状态/塞状态牌/逃跑
+  - 忽略: 能力牌的持续效果、升级、药水、史莱姆分裂、乐加维林被打醒等 special 机制
+需要逐条对照真实数值时用 CombatSim；这里追求的是单核每秒数万步的吞吐。
+
+state_dict(i) 可以把第 i 场还原成 CommunicationMod 格式，用来和 encode_state / get_mask 对拍。
+"""
+import zlib
+import numpy as np
+
+from spire_env.definitions import ObservationConfig, ActionConfig
+from spire_env.vocabulary import (IRONCLAD_CARDS, CARD_TO_INDEX, VOCAB_SIZE, INTENT_TYPES,
+                                  VOCAB_INTENT_SIZE, VOCAB_MONSTER_SIZE, get_monster_index, get_intent_index)
+from .cards import CARD_DB, CARD_NAMES, STARTER_DECK, REWARD_POOL, ATTACK, SKILL, POWER, STATUS, CURSE, UNPLAYABLE, X_COST
+from .monsters import MONSTER_DB, WEAK_ENCOUNTERS, STRONG_ENCOUNTERS, ELITE_ENCOUNTERS, BOSS_ENCOUNTERS
+
+H = ActionConfig.MAX_HAND_CARDS # 手牌槽
+M = ActionConfig.MAX_MONSTERS   # 怪物槽
+PAD = VOCAB_SIZE                # 空手牌槽的卡牌下标 (所有卡牌表在这一行都是 0)
+NV = VOCAB_SIZE + 1
+BASE_ENERGY = 3
+HAND_DRAW = 5
+
+_TYPES = (ATTACK, SKILL, POWER, STATUS, CURSE)
+_PILES = {"hand": 0, "draw": 1, "discard": 2}
+
+# ==============================================================================
+# 卡牌表 (按词表下标)
+# ==============================================================================
+def _card_table(fn, dtype=np.int32):
+    arr = np.zeros(NV, dtype=dtype)
+    for cid in IRONCLAD_CARDS:
+        arr[CARD_TO_INDEX[cid]] = fn(CARD_DB[cid])
+    return arr
+
+C_COST = _card_table(lambda s: s["cost"])
+C_TYPE = _card_table(lambda s: _TYPES.index(s["type"]))
+C_TYPE[PAD] = -1
+C_TARGET = _card_table(lambda s: s["has_target"], bool)
+C_PLAYABLE = _card_table(lambda s: s["cost"] != UNPLAYABLE and s["type"] != CURSE, bool)
+C_X = _card_table(lambda s: s["cost"] == X_COST, bool)
+C_BODY_SLAM = _card_table(lambda s: s.get("special") == "body_slam", bool)
+C_RANDOM = _card_table(lambda s: s.get("special") == "random_target", bool)
+C_ATTACKS = _card_table(lambda s: s.get("damage", 0) > 0 or s.get("special") == "body_slam", bool)
+C_DMG = _card_table(lambda s: s.get("damage", 0))
+C_HITS = np.where(C_ATTACKS, _card_table(lambda s: s.get("hits", 1)), 0)
+C_STR_MULT = _card_table(lambda s: 3 if s.get("special") == "heavy_blade" else 1)
+C_AOE = _card_table(lambda s: bool(s.get("aoe")), bool)
+C_BLOCK = _card_table(lambda s: s.get("block", 0))
+C_VULN = _card_table(lambda s: s.get("vuln", 0))
+C_WEAK = _card_table(lambda s: s.get("weak", 0))
+C_DRAW = _card_table(lambda s: s.get("draw", 0))
+C_ENERGY = _card_table(lambda s: s.get("energy", 0))
+C_STRENGTH = _card_table(lambda s: s.get("strength", 0))
+C_LOSE_HP = _card_table(lambda s: s.get("lose_hp", 0))
+C_EXHAUST = _card_table(lambda s: bool(s.get("exhaust")), bool)
+C_ETHEREAL = _card_table(lambda s: bool(s.get("ethereal")), bool)
+C_BURN = _card_table(lambda s: s.get("special") == "burn", bool)
+C_ADD_CARD = _card_table(lambda s: CARD_TO_INDEX[s["add"][0]] if s.get("add") else PAD)
+C_ADD_N = _card_table(lambda s: s["add"][1] if s.get("add") else 0)
+C_ADD_PILE = _card_table(lambda s: _PILES[s["add"][2]] if s.get("add") else 0)
+C_CLASH = np.zeros(NV, dtype=bool)
+C_CLASH[CARD_TO_INDEX["Clash"]] = True
+
+# 牌堆统计用: (NV, 3) 攻击/技能/能力 one-hot
+C_TYPE_ONEHOT = np.stack([C_TYPE == 0, C_TYPE == 1, C_TYPE == 2], axis=1).astype(np.float32)
+
+# 手牌观察特征: 每种卡一行，直接整块拷进 obs
+CARD_FEAT = np.zeros((NV, ObservationConfig.HAND_FEATURE_SIZE), dtype=np.float32)
+CARD_FEAT[:, 0] = C_COST / 3.0
+CARD_FEAT[:, 1:4] = C_TYPE_ONEHOT
+CARD_FEAT[np.arange(VOCAB_SIZE), 5 + np.arange(VOCAB_SIZE)] = 1.0
+CARD_FEAT[PAD] = 0.0
+
+# ==============================================================================
+# 怪物表 (按怪物词表下标；招式摊平成全局编号)
+# ==============================================================================
+MOVES = [(mid, name) for mid, spec in MONSTER_DB.items() for name in spec["moves"]]
+MOVE_INDEX = {key: i for i, key in enumerate(MOVES)}
+
+def _move_table(fn, dtype=np.int32):
+    return np.array([fn(MONSTER_DB[mid]["moves"][name]) for mid, name in MOVES], dtype=dtype)
+
+MV_INTENT = _move_table(lambda mv: get_intent_index(mv["intent"]))
+MV_DMG = _move_table(lambda mv: mv["damage"])
+MV_HITS = np.where(MV_DMG > 0, _move_table(lambda mv: mv["hits"]), 0)
+MV_DIVIDER = _move_table(lambda mv: mv.get("special") == "divider", bool)
+MV_BLOCK = _move_table(lambda mv: mv.get("block", 0))
+MV_STR = _move_table(lambda mv: mv.get("strength", 0))
+MV_RITUAL = _move_table(lambda mv: mv.get("ritual", 0))
+MV_WEAK = _move_table(lambda mv: mv.get("weak", 0))
+MV_VULN = _move_table(lambda mv: mv.get("vuln", 0))
+MV_FRAIL = _move_table(lambda mv: mv.get("frail", 0))
+MV_LOSE_STR = _move_table(lambda mv: mv.get("lose_str", 0))
+MV_LOSE_DEX = _move_table(lambda mv: mv.get("lose_dex", 0))
+MV_ESCAPE = _move_table(lambda mv: bool(mv.get("escape")), bool)
+MV_ADD_CARD = _move_table(lambda mv: CARD_TO_INDEX[mv["add"][0]] if mv.get("add") else PAD)
+MV_ADD_N = _move_table(lambda mv: mv["add"][1] if mv.get("add") else 0)
+
+def _pattern_tables():
+    width = max(max(len(s["opening"]), len(s["cycle"]), len(s["weights"] or ())) for s in MONSTER_DB.values())
+    opening = np.zeros((VOCAB_MONSTER_SIZE, width), dtype=np.int32)
+    open_len = np.zeros(VOCAB_MONSTER_SIZE, dtype=np.int32)
+    cycle = np.zeros((VOCAB_MONSTER_SIZE, width), dtype=np.int32)
+    cycle_len = np.zeros(VOCAB_MONSTER_SIZE, dtype=np.int32)
+    w_move = np.zeros((VOCAB_MONSTER_SIZE, width), dtype=np.int32)
+    w_cum = np.ones((VOCAB_MONSTER_SIZE, width), dtype=np.float64)
+    hp_lo = np.zeros(VOCAB_MONSTER_SIZE, dtype=np.int32)
+    hp_hi = np.zeros(VOCAB_MONSTER_SIZE, dtype=np.int32)
+    for mid, spec in MONSTER_DB.items():
+        t = get_monster_index(mid)
+        hp_lo[t], hp_hi[t] = spec["hp"]
+        open_len[t] = len(spec["opening"])
+        opening[t, :open_len[t]] = [MOVE_INDEX[(mid, n)] for n in spec["opening"]]
+        cycle_len[t] = len(spec["cycle"])
+        cycle[t, :cycle_len[t]] = [MOVE_INDEX[(mid, n)] for n in spec["cycle"]]
+        if spec["weights"]:
+            names = list(spec["weights"])
+            w = np.array([spec["weights"][n] for n in names], dtype=np.float64)
+            w_move[t, :len(names)] = [MOVE_INDEX[(mid, n)] for n in names]
+            w_cum[t, :len(names)] = np.cumsum(w) / w.sum()
+    return opening, open_len, cycle, cycle_len, w_move, w_cum, hp_lo, hp_hi
+
+P_OPEN, P_OPEN_LEN, P_CYCLE, P_CYCLE_LEN, P_WMOVE, P_WCUM, M_HP_LO, M_HP_HI = _pattern_tables()
+MONSTER_ID_OF = {get_monster_index(mid): mid for mid in MONSTER_DB}
+INTENT_OF = {i: name for i, name in enumerate(INTENT_TYPES)}
+
+def encounter_table(encounters):
+    """遭遇列表 -> (E, M) 怪物下标矩阵，空位 -1"""
+    table = np.full((len(encounters), M), -1, dtype=np.int32)
+    for e, group in enumerate(encounters):
+        table[e, :len(group)] = [get_monster_index(mid) for mid in group]
+    return table
+
+DEFAULT_ENCOUNTERS = WEAK_ENCOUNTERS + STRONG_ENCOUNTERS + ELITE_ENCOUNTERS
+BURNING_BLOOD = (zlib.crc32("Burning Blood".encode('utf-8')) % 100) / 100.0
+
+# ObservationConfig 各段的起始位置
+_O_HAND = ObservationConfig.PLAYER_SIZE
+_O_MONSTER = _O_HAND + ObservationConfig.HAND_SIZE
+_O_RELIC = _O_MONSTER + ObservationConfig.MONSTER_SIZE
+_O_PILE = _O_RELIC + ObservationConfig.RELIC_SIZE
+_O_GLOBAL = _O_PILE + ObservationConfig.PILE_SIZE
+_O_POTION = _O_GLOBAL + ObservationConfig.GLOBAL_SIZE
+_O_SCREEN = _O_POTION + ObservationConfig.POTION_SIZE
+_SCREEN_COMBAT = 1 # encode_state 的屏幕列表里 'COMBAT' 的位置
+
+class BatchedCombat:
+    """
+    N 场并行战斗。
+    :param encounters: 遭遇列表 (每项是怪物 id 列表)，默认第一幕普通+精英
+    :param deck: 初始牌组 (卡牌 id 列表)，默认铁甲初始牌组
+    :param extra_cards: 每场开局再随机塞几张奖励池里的牌，增加多样性
+    :param hp_range: 开局血量范围 (闭区间)
+    :param max_turns: 超过这么多回合算截断
+    """
+    def __init__(self, n, encounters=None, deck=None, extra_cards=0, hp_range=(80, 80), max_hp=80,
+                 max_turns=50, gold=99, floor=1, seed=None):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.encounters = encounter_table(encounters or DEFAULT_ENCOUNTERS)
+        self.deck = np.zeros(NV, dtype=np.int32)
+        for cid in deck or STARTER_DECK:
+            self.deck[CARD_TO_INDEX[cid]] += 1
+        self.reward_pool = np.array([CARD_TO_INDEX[c] for c in REWARD_POOL], dtype=np.int32)
+        self.extra_cards = extra_cards
+        self.hp_range = hp_range
+        self.max_turns = max_turns
+
+        i32 = lambda *shape: np.zeros(shape, dtype=np.int32)
+        # 玩家
+        self.hp, self.max_hp = i32(n), np.full(n, max_hp, dtype=np.int32)
+        self.block, self.energy = i32(n), i32(n)
+        self.strength, self.dexterity = i32(n), i32(n)
+        self.vuln, self.weak, self.frail = i32(n), i32(n), i32(n)
+        self.turn = i32(n)
+        self.gold = np.full(n, gold, dtype=np.int32)
+        self.floor = np.full(n, floor, dtype=np.int32)
+        # 牌堆
+        self.hand = np.full((n, H), PAD, dtype=np.int32)
+        self.hand_size = i32(n)
+        self.draw_pile = i32(n, NV)
+        self.discard_pile = i32(n, NV)
+        self.exhaust_pile = i32(n, NV)
+        # 怪物
+        self.m_type = np.full((n, M), -1, dtype=np.int32)
+        self.m_alive = np.zeros((n, M), dtype=bool)
+        self.m_hp, self.m_max_hp, self.m_block = i32(n, M), i32(n, M), i32(n, M)
+        self.m_str, self.m_ritual = i32(n, M), i32(n, M)
+        self.m_vuln, self.m_weak = i32(n, M), i32(n, M)
+        self.m_move, self.m_step, self.m_offset = i32(n, M), i32(n, M), i32(n, M)
+
+        self._rows = np.arange(n)
+        self.reset_where(np.ones(n, dtype=bool))
+
+    # ==================================================
+    # 重置
+    # ==================================================
+    def reset_where(self, which):
+        """重开 which (bool 掩码) 这些场次"""
+        rows = np.flatnonzero(which)
+        k = len(rows)
+        if k == 0:
+            return
+        lo, hi = self.hp_range
+        self.hp[rows] = self.rng.integers(lo, hi + 1, size=k)
+        for arr in (self.block, self.energy, self.strength, self.dexterity, self.vuln, self.weak,
+                    self.frail, self.turn, self.hand_size):
+            arr[rows] = 0
+        self.hand[rows] = PAD
+        self.draw_pile[rows] = self.deck
+        if self.extra_cards:
+            extra = self.rng.choice(self.reward_pool, size=(k, self.extra_cards))
+            np.add.at(self.draw_pile, (np.repeat(rows, self.extra_cards), extra.ravel()), 1)
+        self.discard_pile[rows] = 0
+        self.exhaust_pile[rows] = 0
+
+        types = self.encounters[self.rng.integers(len(self.encounters), size=k)]
+        present = types >= 0
+        t = np.where(present, types, 0)
+        hp = M_HP_LO[t] + (self.rng.random((k, M)) * (M_HP_HI[t] - M_HP_LO[t] + 1)).astype(np.int32)
+        self.m_type[rows] = types
+        self.m_alive[rows] = present
+        self.m_hp[rows] = np.where(present, hp, 0)
+        self.m_max_hp[rows] = self.m_hp[rows]
+        for arr in (self.m_block, self.m_str, self.m_ritual, self.m_vuln, self.m_weak):
+            arr[rows] = 0
+        # 同名怪错开循环 (三哨卫交替)
+        same = (types[:, :, None] == types[:, None, :]) & np.tri(M, k=-1, dtype=bool)[None]
+        self.m_offset[rows] = same.sum(axis=2)
+        self.m_step[rows] = 0
+        self.m_move[rows] = 0
+        self._roll_moves(rows)
+        self._start_turn(which)
+
+    # ==================================================
+    # 对外接口
+    # ==================================================
+    def action_masks(self):
+        """(N, 67) bool，和 ActionMapper.get_mask 对战斗状态的结果一致"""
+        masks = np.zeros((self.n, ActionConfig.TOTAL_ACTIONS), dtype=bool)
+        card = self.hand
+        cost = C_COST[card]
+        ok = C_PLAYABLE[card] & (np.maximum(cost, 0) <= self.energy[:, None])
+        has_non_attack = ((C_TYPE[card] != 0) & (card != PAD)).any(axis=1)
+        ok &= ~(C_CLASH[card] & has_non_attack[:, None])
+        targeted = ok[:, :, None] & C_TARGET[card][:, :, None] & self.m_alive[:, None, :]
+        untargeted = ok & ~C_TARGET[card]
+        cards = masks[:, :ActionConfig.CARD_ACTION_SIZE].reshape(self.n, H, M)
+        cards[:] = targeted
+        cards[:, :, 0] |= untargeted
+        masks[:, ActionConfig.END_TURN_IDX] = True
+        return masks
+
+    def step(self, actions):
+        """
+        :param actions: (N,) 动作编号 (ActionConfig 布局)；不合法的动作当作空操作
+        :return: rewards (N,) float32, terminated (N,) bool, truncated (N,) bool, won (N,) bool
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        valid = self.action_masks()[self._rows, actions]
+        prev_hp = self.hp.copy()
+        prev_mon = (self.m_hp * self.m_alive).sum(axis=1)
+        prev_alive = self.m_alive.sum(axis=1)
+
+        play = valid & (actions < ActionConfig.CARD_ACTION_SIZE)
+        end = valid & (actions == ActionConfig.END_TURN_IDX)
+        if play.any():
+            self._play(play, actions // M, actions % M)
+        if end.any():
+            self._end_turn(end)
+
+        won = ~self.m_alive.any(axis=1)
+        lost = self.hp <= 0
+        terminated = won | lost
+        truncated = ~terminated & (self.turn > self.max_turns)
+        rewards = self._reward(prev_hp, prev_mon, prev_alive)
+        rewards[lost] -= 10.0 # 和 env.step 的 GAME_OVER 惩罚一致
+        return rewards, terminated, truncated, won
+
+    def observe(self, out=None):
+        """按 ObservationConfig 布局编码全部场次，返回 (N, SIZE) float32"""
+        obs = out if out is not None else np.empty((self.n, ObservationConfig.SIZE), dtype=np.float32)
+        obs.fill(0.0)
+        rows = self._rows
+
+        # 1. 玩家
+        ratio = self.hp / np.maximum(1, self.max_hp)
+        obs[:, 0] = ratio
+        obs[:, 1] = ratio < 0.15
+        obs[rows, 2 + np.clip(self.energy, 0, 5)] = 1.0
+        obs[:, 8] = self.block / 50.0
+        obs[:, 9] = self.strength / 10.0
+        obs[:, 10] = self.dexterity / 10.0
+        obs[:, 11] = self.vuln > 0
+        obs[:, 12] = self.weak > 0
+        obs[:, 13] = self.frail > 0
+
+        # 2. 手牌: 查表整块拷贝
+        obs[:, _O_HAND:_O_MONSTER] = CARD_FEAT[self.hand].reshape(self.n, -1)
+
+        # 3. 怪物
+        mon = obs[:, _O_MONSTER:_O_RELIC].reshape(self.n, M, ObservationConfig.MONSTER_FEATURE_SIZE)
+        alive = self.m_alive
+        mon[:, :, 0] = np.where(alive, self.m_hp / 100.0, 0.0)
+        mon[:, :, 1] = np.where(alive, self.m_block / 50.0, 0.0)
+        mon[:, :, 2] = np.where(alive, self._adjusted_damage() / 50.0, 0.0)
+        r, c = np.nonzero(alive)
+        mon[r, c, 3 + MV_INTENT[self.m_move[r, c]]] = 1.0
+        mon[r, c, 3 + VOCAB_INTENT_SIZE + self.m_type[r, c]] = 1.0
+
+        # 4. 遗物 (燃烧之血)
+        obs[:, _O_RELIC] = BURNING_BLOOD
+
+        # 5. 牌堆统计
+        obs[:, _O_PILE] = self.draw_pile.sum(axis=1) / 30.0
+        obs[:, _O_PILE + 1] = self.discard_pile.sum(axis=1) / 30.0
+        obs[:, _O_PILE + 2:_O_PILE + 5] = (self.draw_pile @ C_TYPE_ONEHOT) / 20.0
+        obs[:, _O_PILE + 7:_O_PILE + 10] = (self.discard_pile @ C_TYPE_ONEHOT) / 20.0
+
+        # 6. 全局
+        obs[:, _O_GLOBAL] = np.log10(self.gold + 1) / 4.0
+        obs[:, _O_GLOBAL + 1] = self.floor / 50.0
+
+        # 8. 屏幕: 战斗
+        obs[:, _O_SCREEN + _SCREEN_COMBAT] = 1.0
+        return obs
+
+    # ==================================================
+    # 出牌
+    # ==================================================
+    def _play(self, play, slot, tgt):
+        rows = np.flatnonzero(play)
+        slot, tgt = slot[rows], tgt[rows]
+        card = self.hand[rows, slot]
+
+        # 扣费 (X 费吃掉全部能量)
+        x = np.where(C_X[card], self.energy[rows], 0)
+        self.energy[rows] -= np.where(C_X[card], x, np.maximum(C_COST[card], 0))
+
+        # 从手牌移除 (后面的牌左移)
+        cols = np.arange(H)
+        src = np.minimum(cols[None, :] + (cols[None, :] >= slot[:, None]), H - 1)
+        hand = np.take_along_axis(self.hand[rows], src, axis=1)
+        hand[:, H - 1] = PAD
+        self.hand[rows] = hand
+        self.hand_size[rows] -= 1
+
+        # 伤害
+        attacks = C_ATTACKS[card]
+        if attacks.any():
+            base = np.where(C_BODY_SLAM[card], self.block[rows], C_DMG[card])
+            dmg = (base + self.strength[rows] * C_STR_MULT[card]).astype(np.float64)
+            dmg *= np.where(self.weak[rows] > 0, 0.75, 1.0)
+            hits = np.where(C_X[card], x, C_HITS[card])
+            single = np.zeros((len(rows), M), dtype=bool)
+            single[np.arange(len(rows)), tgt] = True
+            for h in range(int(hits.max(initial=0))):
+                hitting = attacks & (hits > h)
+                alive = self.m_alive[rows]
+                if C_RANDOM[card].any():
+                    pick = np.argmax(self.rng.random((len(rows), M)) * alive, axis=1)
+                    rand_t = np.zeros_like(single)
+                    rand_t[np.arange(len(rows)), pick] = True
+                else:
+                    rand_t = single
+                where = np.where(C_AOE[card][:, None], alive,
+                                 np.where(C_RANDOM[card][:, None], rand_t, single)) & alive & hitting[:, None]
+                per = dmg[:, None] * np.where(self.m_vuln[rows] > 0, 1.5, 1.0)
+                self._hit_monsters(rows, where, np.maximum(per, 0).astype(np.int32))
+
+        # 格挡
+        blk = C_BLOCK[card]
+        gain = blk + self.dexterity[rows]
+        gain = np.where(self.frail[rows] > 0, (gain * 0.75).astype(np.int32), gain)
+        self.block[rows] += np.where(blk > 0, np.maximum(gain, 0), 0)
+
+        # 负面状态 (单体给目标，AOE 给全体)
+        alive = self.m_alive[rows]
+        aim = np.where(C_AOE[card][:, None], alive, np.eye(M, dtype=bool)[tgt] & C_TARGET[card][:, None]) & alive
+        self.m_vuln[rows] += aim * C_VULN[card][:, None]
+        self.m_weak[rows] += aim * C_WEAK[card][:, None]
+
+        # 资源
+        self.energy[rows] += C_ENERGY[card]
+        self.strength[rows] += C_STRENGTH[card]
+        self.hp[rows] = np.maximum(0, self.hp[rows] - C_LOSE_HP[card])
+
+        # 卡牌去向 (能力牌打出后直接消失)
+        exhaust = C_EXHAUST[card]
+        discard = ~exhaust & (C_TYPE[card] != _TYPES.index(POWER))
+        np.add.at(self.exhaust_pile, (rows[exhaust], card[exhaust]), 1)
+        np.add.at(self.discard_pile, (rows[discard], card[discard]), 1)
+
+        # 塞牌 / 抽牌
+        adding = C_ADD_N[card] > 0
+        if adding.any():
+            self._add_cards(rows[adding], C_ADD_CARD[card][adding], C_ADD_N[card][adding], C_ADD_PILE[card][adding])
+        draws = np.zeros(self.n, dtype=np.int32)
+        draws[rows] = C_DRAW[card]
+        self._draw(draws)
+
+    def _hit_monsters(self, rows, where, dmg):
+        """对 rows 场次里 where (k, M) 标出的怪各造成 dmg (k, M) 点伤害"""
+        dmg = np.where(where, dmg, 0)
+        block = self.m_block[rows]
+        blocked = np.minimum(block, dmg)
+        self.m_block[rows] = block - blocked
+        hp = np.maximum(0, self.m_hp[rows] - (dmg - blocked))
+        self.m_hp[rows] = hp
+        self.m_alive[rows] &= hp > 0
+
+    # ==================================================
+    # 回合结束 / 怪物行动
+    # ==================================================
+    def _end_turn(self, end):
+        rows = np.flatnonzero(end)
+        hand = self.hand[rows]
+        # 灼伤
+        burns = C_BURN[hand].sum(axis=1)
+        self._damage_player(rows, burns * 2)
+        # 手牌进弃牌堆 (虚无的消耗)
+        real = hand != PAD
+        ether = real & C_ETHEREAL[hand]
+        keep = real & ~ether
+        r = np.repeat(rows, H).reshape(-1, H)
+        np.add.at(self.discard_pile, (r[keep], hand[keep]), 1)
+        np.add.at(self.exhaust_pile, (r[ether], hand[ether]), 1)
+        self.hand[rows] = PAD
+        self.hand_size[rows] = 0
+
+        # 怪物依次行动
+        for j in range(M):
+            act = end & self.m_alive[:, j] & (self.hp > 0)
+            if not act.any():
+                continue
+            ar = np.flatnonzero(act)
+            move = self.m_move[ar, j]
+            self.m_block[ar, j] = 0
+            base = np.where(MV_DIVIDER[move], self.hp[ar] // 12 + 1, MV_DMG[move])
+            per = (base + self.m_str[ar, j]).astype(np.float64)
+            per *= np.where(self.m_weak[ar, j] > 0, 0.75, 1.0)
+            per *= np.where(self.vuln[ar] > 0, 1.5, 1.0)
+            per = np.maximum(per, 0).astype(np.int32)
+            hits = MV_HITS[move]
+            for h in range(int(hits.max(initial=0))):
+                self._damage_player(ar, np.where(hits > h, per, 0))
+            self.m_block[ar, j] += MV_BLOCK[move]
+            self.m_str[ar, j] += MV_STR[move]
+            self.m_ritual[ar, j] += MV_RITUAL[move]
+            self.weak[ar] += MV_WEAK[move]
+            self.vuln[ar] += MV_VULN[move]
+            self.frail[ar] += MV_FRAIL[move]
+            self.strength[ar] -= MV_LOSE_STR[move]
+            self.dexterity[ar] -= MV_LOSE_DEX[move]
+            self.m_alive[ar, j] &= ~MV_ESCAPE[move]
+            adding = MV_ADD_N[move] > 0
+            if adding.any():
+                self._add_cards(ar[adding], MV_ADD_CARD[move][adding], MV_ADD_N[move][adding],
+                                np.full(adding.sum(), _PILES["discard"]))
+            # 仪式从下一回合开始生效
+            self.m_str[ar, j] += np.where(MV_RITUAL[move] > 0, 0, self.m_ritual[ar, j])
+
+        # 回合末: 负面状态衰减，怪物换招，玩家新回合
+        for arr in (self.vuln, self.weak, self.frail):
+            arr[rows] = np.maximum(0, arr[rows] - 1)
+        for arr in (self.m_vuln, self.m_weak):
+            arr[rows] = np.maximum(0, arr[rows] - 1)
+        self.m_step[rows] += 1
+        self._roll_moves(rows)
+        self._start_turn(end & (self.hp > 0) & self.m_alive.any(axis=1))
+
+    def _damage_player(self, rows, dmg):
+        blocked = np.minimum(self.block[rows], dmg)
+        self.block[rows] -= blocked
+        self.hp[rows] = np.maximum(0, self.hp[rows] - (dmg - blocked))
+
+    def _roll_moves(self, rows):
+        """按 m_step 给 rows 场次的所有怪定下一招"""
+        types = np.maximum(self.m_type[rows], 0)
+        step = self.m_step[rows]
+        open_len = P_OPEN_LEN[types]
+        cyc_len = P_CYCLE_LEN[types]
+        in_open = step < open_len
+        opening = np.take_along_axis(P_OPEN[types], np.minimum(step, P_OPEN.shape[1] - 1)[..., None], axis=2)[..., 0]
+        cpos = (step - open_len + self.m_offset[rows]) % np.maximum(cyc_len, 1)
+        cycle = np.take_along_axis(P_CYCLE[types], cpos[..., None], axis=2)[..., 0]
+        u = self.rng.random(types.shape)
+        widx = (P_WCUM[types] <= u[..., None]).sum(axis=2)
+        weighted = np.take_along_axis(P_WMOVE[types], np.minimum(widx, P_WMOVE.shape[1] - 1)[..., None], axis=2)[..., 0]
+        move = np.where(in_open, opening, np.where(cyc_len > 0, cycle, weighted))
+        self.m_move[rows] = np.where(self.m_type[rows] >= 0, move, 0)
+
+    def _adjusted_damage(self):
+        """(N, M) 怪物意图伤害 (move_adjusted_damage)，非攻击招为 -1"""
+        move = self.m_move
+        base = np.where(MV_DIVIDER[move], self.hp[:, None] // 12 + 1, MV_DMG[move])
+        dmg = (base + self.m_str).astype(np.float64)
+        dmg *= np.where(self.m_weak > 0, 0.75, 1.0)
+        dmg *= np.where(self.vuln[:, None] > 0, 1.5, 1.0)
+        return np.where(MV_DMG[move] > 0, np.maximum(dmg, 0).astype(np.int32), -1)
+
+    # ==================================================
+    # 牌堆
+    # ==================================================
+    def _start_turn(self, which):
+        rows = np.flatnonzero(which)
+        self.turn[rows] += 1
+        self.block[rows] = 0
+        self.energy[rows] = BASE_ENERGY
+        draws = np.zeros(self.n, dtype=np.int32)
+        draws[rows] = HAND_DRAW
+        self._draw(draws)
+
+    def _draw(self, counts):
+        """第 i 场抽 counts[i] 张 (抽牌堆空了就洗弃牌堆)"""
+        for k in range(int(counts.max(initial=0))):
+            need = (counts > k) & (self.hand_size < H)
+            empty = need & (self.draw_pile.sum(axis=1) == 0)
+            if empty.any():
+                self.draw_pile[empty] += self.discard_pile[empty]
+                self.discard_pile[empty] = 0
+            rows = np.flatnonzero(need)
+            if len(rows) == 0:
+                return
+            pile = self.draw_pile[rows]
+            total = pile.sum(axis=1)
+            ok = total > 0
+            rows, pile, total = rows[ok], pile[ok], total[ok]
+            # 按剩余张数加权随机抽一张 (等价于从洗好的牌堆顶摸)
+            r = (self.rng.random(len(rows)) * total).astype(np.int64)
+            card = (np.cumsum(pile, axis=1) > r[:, None]).argmax(axis=1)
+            self.draw_pile[rows, card] -= 1
+            self.hand[rows, self.hand_size[rows]] = card
+            self.hand_size[rows] += 1
+
+    def _add_cards(self, rows, card, count, pile):
+        for k in range(int(count.max(initial=0))):
+            sel = count > k
+            for code, arr in ((_PILES["draw"], self.draw_pile), (_PILES["discard"], self.discard_pile)):
+                m = sel & (pile == code)
+                np.add.at(arr, (rows[m], card[m]), 1)
+            m = sel & (pile == _PILES["hand"])
+            r, c = rows[m], card[m]
+            room = self.hand_size[r] < H
+            r, c = r[room], c[room]
+            self.hand[r, self.hand_size[r]] = c
+            self.hand_size[r] += 1
+
+    # ==================================================
+    # 奖励 (和 reward.calculate_reward 的战斗部分同一套公式)
+    # ==================================================
+    def _reward(self, prev_hp, prev_mon, prev_alive):
+        rew = np.zeros(self.n, dtype=np.float32)
+        loss = prev_hp - self.hp
+        ratio = self.hp / np.maximum(1, self.max_hp)
+        fear = 1.0 + 2.0 * (1.0 - ratio) ** 2
+        rew -= np.where(loss > 0, loss * fear, 0.0)
+        dealt = prev_mon - (self.m_hp * self.m_alive).sum(axis=1)
+        rew += np.where(dealt > 0, dealt * 0.1, 0.0)
+        rew += np.where(self.m_alive.sum(axis=1) < prev_alive, 15.0, 0.0)
+        return rew
+
+    # ==================================================
+    # 调试 / 对拍
+    # ==================================================
+    def state_dict(self, i):
+        """第 i 场还原成 CommunicationMod 格式 (只用于调试和对拍，别在热路径里调)"""
+        masks = self.action_masks()[i]
+        def card_dict(c, k, slot=None):
+            cid = IRONCLAD_CARDS[c]
+            playable = slot is not None and bool(masks[slot * M:(slot + 1) * M].any())
+            return {"id": cid, "name": CARD_NAMES.get(cid, cid), "uuid": f"b{i}-{k}", "cost": int(C_COST[c]),
+                    "type": _TYPES[C_TYPE[c]], "upgrades": 0, "has_target": bool(C_TARGET[c]),
+                    "is_playable": playable}
+        def pile(counts):
+            return [card_dict(c, f"{c}-{k}") for c in np.flatnonzero(counts) for k in range(counts[c])]
+        adj = self._adjusted_damage()[i]
+        monsters = []
+        for j in range(M):
+            t = self.m_type[i, j]
+            if t < 0:
+                continue
+            mid = MONSTER_ID_OF[t]
+            monsters.append({
+                "id": mid, "name": mid, "current_hp": int(self.m_hp[i, j]), "max_hp": int(self.m_max_hp[i, j]),
+                "block": int(self.m_block[i, j]), "intent": INTENT_OF.get(int(MV_INTENT[self.m_move[i, j]]), "UNKNOWN"),
+                "move_adjusted_damage": int(adj[j]), "move_hits": int(MV_HITS[self.m_move[i, j]]),
+                "is_gone": not self.m_alive[i, j], "half_dead": False,
+                "powers": [{"id": p, "name": p, "amount": int(v)} for p, v in
+                           (("Strength", self.m_str[i, j]), ("Vulnerable", self.m_vuln[i, j]),
+                            ("Weak", self.m_weak[i, j]), ("Ritual", self.m_ritual[i, j])) if v],
+            })
+        powers = [{"id": p, "name": p, "amount": int(v)} for p, v in
+                  (("Strength", self.strength[i]), ("Dexterity", self.dexterity[i]), ("Vulnerable", self.vuln[i]),
+                   ("Weak", self.weak[i]), ("Frail", self.frail[i])) if v]
+        hand = [card_dict(c, k, slot=k) for k, c in enumerate(self.hand[i]) if c != PAD]
+        empty = {"id": "Potion Slot", "name": "Potion Slot", "can_use": False, "can_discard": False,
+                 "requires_target": False}
+        return {
+            "available_commands": ["play", "end", "key", "click", "wait", "state"],
+            "ready_for_command": True,
+            "in_game": True,
+            "game_state": {
+                "screen_type": "NONE", "room_phase": "COMBAT", "floor": int(self.floor[i]), "act": 1,
+                "gold": int(self.gold[i]), "current_hp": int(self.hp[i]), "max_hp": int(self.max_hp[i]),
+                "class": "IRONCLAD", "choice_list": [],
+                "relics": [{"id": "Burning Blood", "name": "Burning Blood", "counter": -1}],
+                "potions": [dict(empty) for _ in range(3)],
+                "combat_state": {
+                    "turn": int(self.turn[i]),
+                    "player": {"current_hp": int(self.hp[i]), "max_hp": int(self.max_hp[i]),
+                               "block": int(self.block[i]), "energy": int(self.energy[i]), "powers": powers},
+                    "hand": hand, "draw_pile": pile(self.draw_pile[i]), "discard_pile": pile(self.discard_pile[i]),
+                    "exhaust_pile": pile(self.exhaust_pile[i]), "monsters": monsters,
+                },
+            },
+        }
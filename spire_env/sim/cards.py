@@ -0,0 +1,140 @@
+# cards.py
+"""
+[模拟器] 铁甲战士卡牌数据表
+覆盖 vocabulary.IRONCLAD_CARDS 里的全部卡牌 (未升级数值)。
+常规效果用字段描述，少数特殊机制用 special 标记，由 combat.py 统一结算。
+升级 (upgrades > 0) 统一按 "伤害 +3 / 格挡 +3" 近似处理。
+"""
+from spire_env.vocabulary import IRONCLAD_CARDS
+
+ATTACK = "ATTACK"
+SKILL = "SKILL"
+POWER = "POWER"
+STATUS = "STATUS"
+CURSE = "CURSE"
+
+UNPLAYABLE = -2 # CommunicationMod 对不可打出的牌报告 cost = -2
+X_COST = -1     # X 费 (旋风斩)
+
+def _c(cost, ctype, target=False, **effects):
+    """
+    字段说明:
+      damage/hits: 对目标 (或 aoe=True 时对所有敌人) 造成 damage x hits
+      block: 获得格挡
+      vuln/weak: 给目标 (aoe 时给全体) 上易伤/虚弱
+      draw/energy/lose_hp: 抽牌/回能量/自损
+      strength: 获得力量 (能力牌)
+      power: (能力名, 层数) 给自己挂能力
+      add: (卡牌id, 数量, 牌堆) 往 hand/draw/discard 塞牌
+      exhaust/ethereal: 消耗/虚无
+      special: combat.py 里的特殊结算
+    """
+    spec = {"cost": cost, "type": ctype, "has_target": target}
+    spec.update(effects)
+    return spec
+
+CARD_DB = {
+    # --- 基础 (Starter) ---
+    "Strike_R": _c(1, ATTACK, True, damage=6),
+    "Defend_R": _c(1, SKILL, block=5),
+    "Bash": _c(2, ATTACK, True, damage=8, vuln=2),
+
+    # --- 普通 (Common) ---
+    "Sword Boomerang": _c(1, ATTACK, damage=3, hits=3, special="random_target"),
+    "Clothesline": _c(2, ATTACK, True, damage=12, weak=2),
+    "Headbutt": _c(1, ATTACK, True, damage=9, special="headbutt"),
+    "Anger": _c(0, ATTACK, True, damage=6, add=("Anger", 1, "discard")),
+    "Warcry": _c(0, SKILL, draw=1, exhaust=True),
+    "Cleave": _c(1, ATTACK, damage=8, aoe=True),
+    "Pommel Strike": _c(1, ATTACK, True, damage=9, draw=1),
+    "Twin Strike": _c(1, ATTACK, True, damage=5, hits=2),
+    "Iron Wave": _c(1, ATTACK, True, damage=5, block=5),
+    "Thunderclap": _c(1, ATTACK, damage=4, vuln=1, aoe=True),
+    "Perfected Strike": _c(2, ATTACK, True, damage=6, special="perfected_strike"),
+    "Shrug It Off": _c(1, SKILL, block=8, draw=1),
+    "True Grit": _c(1, SKILL, block=7, special="exhaust_random"),
+    "Body Slam": _c(1, ATTACK, True, damage=0, special="body_slam"),
+    "Clash": _c(0, ATTACK, True, damage=14),
+    "Heavy Blade": _c(2, ATTACK, True, damage=14, special="heavy_blade"),
+    "Armaments": _c(1, SKILL, block=5, special="upgrade_random"),
+    "Wild Strike": _c(1, ATTACK, True, damage=12, add=("Wound", 1, "draw")),
+
+    # --- 罕见 (Uncommon) ---
+    "Dropkick": _c(1, ATTACK, True, damage=5, special="dropkick"),
+    "Hemokinesis": _c(1, ATTACK, True, damage=15, lose_hp=2),
+    "Uppercut": _c(2, ATTACK, True, damage=13, weak=1, vuln=1),
+    "Flame Barrier": _c(2, SKILL, block=12, power=("Flame Barrier", 4)),
+    "Disarm": _c(1, SKILL, True, special="disarm", exhaust=True),
+    "Inflame": _c(1, POWER, strength=2),
+    "Pummel": _c(1, ATTACK, True, damage=2, hits=4, exhaust=True),
+    "Rampage": _c(1, ATTACK, True, damage=8),
+    "Ghostly Armor": _c(1, SKILL, block=10, ethereal=True),
+    "Fire Breathing": _c(1, POWER, power=("Fire Breathing", 6)),
+    "Infernal Blade": _c(1, SKILL, special="infernal_blade", exhaust=True),
+    "Metallicize": _c(1, POWER, power=("Metallicize", 3)),
+    "Spot Weakness": _c(1, SKILL, True, special="spot_weakness"),
+    "Shockwave": _c(2, SKILL, weak=3, vuln=3, aoe=True, exhaust=True),
+    "Sever Soul": _c(2, ATTACK, True, damage=16, special="exhaust_non_attacks"),
+    "Whirlwind": _c(X_COST, ATTACK, damage=5, aoe=True, special="x_hits"),
+    "Searing Blow": _c(2, ATTACK, True, damage=12),
+    "Entrench": _c(2, SKILL, special="double_block"),
+    "Blood for Blood": _c(4, ATTACK, True, damage=18),
+    "Combust": _c(1, POWER, power=("Combust", 5)),
+    "Evolve": _c(1, POWER, power=("Evolve", 1)),
+    "Dual Wield": _c(1, SKILL),
+    "Power Through": _c(1, SKILL, block=15, add=("Wound", 2, "hand")),
+    "Seeing Red": _c(1, SKILL, energy=2, exhaust=True),
+    "Second Wind": _c(1, SKILL, special="second_wind"),
+    "Sentinel": _c(1, SKILL, block=5),
+    "Feel No Pain": _c(1, POWER, power=("Feel No Pain", 3)),
+    "Intimidate": _c(0, SKILL, weak=1, aoe=True, exhaust=True),
+    "Carnage": _c(2, ATTACK, True, damage=20, ethereal=True),
+    "Battle Trance": _c(0, SKILL, draw=3),
+    "Rage": _c(0, SKILL, power=("Rage", 3)),
+    "Bloodletting": _c(0, SKILL, lose_hp=3, energy=2),
+    "Rupture": _c(1, POWER, power=("Rupture", 1)),
+    "Burning Pact": _c(1, SKILL, draw=2, special="exhaust_random"),
+
+    # --- 稀有 (Rare) ---
+    "Demon Form": _c(3, POWER, power=("Demon Form", 2)),
+    "Double Tap": _c(1, SKILL, power=("Double Tap", 1)),
+    "Exhume": _c(1, SKILL, special="exhume", exhaust=True),
+    "Feed": _c(1, ATTACK, True, damage=10, special="feed", exhaust=True),
+    "Limit Break": _c(1, SKILL, special="limit_break", exhaust=True),
+    "Offering": _c(0, SKILL, lose_hp=6, energy=2, draw=3, exhaust=True),
+    "Reaper": _c(2, ATTACK, damage=4, aoe=True, special="reaper", exhaust=True),
+    "Immolate": _c(2, ATTACK, damage=21, aoe=True, add=("Burn", 1, "discard")),
+    "Impervious": _c(2, SKILL, block=30, exhaust=True),
+    "Juggernaut": _c(2, POWER, power=("Juggernaut", 5)),
+    "Barricade": _c(3, POWER, power=("Barricade", 1)),
+    "Berserk": _c(0, POWER, power=("Berserk", 1), special="berserk"),
+    "Bludgeon": _c(3, ATTACK, True, damage=32),
+    "Brutality": _c(0, POWER, power=("Brutality", 1)),
+    "Corruption": _c(3, POWER, power=("Corruption", 1)),
+    "Dark Embrace": _c(2, POWER, power=("Dark Embrace", 1)),
+    "Fiend Fire": _c(2, ATTACK, True, damage=7, special="fiend_fire", exhaust=True),
+
+    # --- 诅咒/状态 (Curse/Status) ---
+    "Dazed": _c(UNPLAYABLE, STATUS, ethereal=True),
+    "Wound": _c(UNPLAYABLE, STATUS),
+    "Slimed": _c(1, STATUS, exhaust=True),
+    "Burn": _c(UNPLAYABLE, STATUS, special="burn"),
+    "Void": _c(UNPLAYABLE, STATUS, ethereal=True, special="void"),
+    "Ascender's Bane": _c(UNPLAYABLE, CURSE, ethereal=True),
+    "Clumsy": _c(UNPLAYABLE, CURSE, ethereal=True),
+    "Pain": _c(UNPLAYABLE, CURSE, special="pain"),
+    "Necronomicurse": _c(UNPLAYABLE, CURSE),
+    "CurseOfTheBell": _c(UNPLAYABLE, CURSE),
+}
+
+# 模拟器展示用的卡名 (CommunicationMod 的 name 字段)
+CARD_NAMES = {"Strike_R": "Strike", "Defend_R": "Defend", "CurseOfTheBell": "Curse of the Bell"}
+
+STARTER_DECK = ["Strike_R"] * 5 + ["Defend_R"] * 4 + ["Bash"]
+
+# 可以作为奖励/随机生成的卡 (排除基础牌与诅咒/状态)
+REWARD_POOL = [cid for cid in IRONCLAD_CARDS
+               if CARD_DB[cid]["type"] in (ATTACK, SKILL, POWER) and cid not in ("Strike_R", "Defend_R", "Bash")]
+ATTACK_POOL = [cid for cid in REWARD_POOL if CARD_DB[cid]["type"] == ATTACK]
+
+assert all(cid in CARD_DB for cid in IRONCLAD_CARDS), "CARD_DB 缺少 vocabulary 里的卡牌"
@@ -0,0 +1,972 @@
+# combat.py
+"""
+[模拟器] 纯 Python 的铁甲战士第一幕战斗模拟
+不依赖游戏本体，输出和 CommunicationMod 同形状的状态 dict，
+encode_state / ActionMapper.get_mask / reward.calculate_reward 可以原样使用。
+
+两层对象：
+  - CombatSim: 一场战斗 (出牌/药水/结束回合 -> 怪物行动 -> 新回合)
+  - SimGame:   一局游戏 (主菜单 -> 地图 -> 战斗 -> 奖励 -> ... -> Boss)，
+               实现了 handle(cmd)，可以直接塞给 mock_server.connect_mock / MockServer
+
+简化说明：
+  - 需要二次选牌的卡 (Headbutt / Burning Pact / True Grit+ / Armaments 等) 不弹 HAND_SELECT/GRID，
+    直接按固定规则选 (随机或第一张)
+  - 怪物没有分段模式切换 (守护者变形等)，只保留招式循环、分裂、睡眠/苏醒、逃跑
+  - 升级统一按 "伤害 +3 / 格挡 +3" 处理
+"""
+import random
+
+from .cards import (CARD_DB, CARD_NAMES, STARTER_DECK, REWARD_POOL, ATTACK_POOL,
+                    ATTACK, SKILL, POWER, STATUS, CURSE, UNPLAYABLE, X_COST)
+from .monsters import (MONSTER_DB, WEAK_ENCOUNTERS, STRONG_ENCOUNTERS,
+                       ELITE_ENCOUNTERS, BOSS_ENCOUNTERS)
+
+MAX_HAND = 10
+MAX_MONSTERS = 5
+HAND_DRAW = 5
+BASE_ENERGY = 3
+
+# 回合结束时层数减一的负面状态
+_TURN_DEBUFFS = ("Vulnerable", "Weak", "Frail")
+
+# --- 药水 ---
+POTION_DB = {
+    "Fire Potion":      {"name": "Fire Potion", "target": True, "damage": 20},
+    "Explosive Potion": {"name": "Explosive Potion", "target": False, "aoe_damage": 10},
+    "Weak Potion":      {"name": "Weak Potion", "target": True, "weak": 3},
+    "FearPotion":       {"name": "Fear Potion", "target": True, "vuln": 3},
+    "Block Potion":     {"name": "Block Potion", "target": False, "block": 12},
+    "Strength Potion":  {"name": "Strength Potion", "target": False, "strength": 2},
+    "Dexterity Potion": {"name": "Dexterity Potion", "target": False, "dexterity": 2},
+    "Energy Potion":    {"name": "Energy Potion", "target": False, "energy": 2},
+    "Swift Potion":     {"name": "Swift Potion", "target": False, "draw": 3},
+    "BloodPotion":      {"name": "Blood Potion", "target": False, "heal_pct": 20},
+}
+POTION_SLOT = {"id": "Potion Slot", "name": "Potion Slot", "can_use": False,
+               "can_discard": False, "requires_target": False}
+
+def _error(message):
+    return {"error": message, "ready_for_command": True}
+
+class SimCard:
+    __slots__ = ("id", "uuid", "upgrades", "spec", "free", "misc")
+
+    def __init__(self, cid, uuid, upgrades=0):
+        self.id = cid
+        self.uuid = uuid
+        self.upgrades = upgrades
+        self.spec = CARD_DB[cid]
+        self.free = False # 本回合 0 费 (地狱之刃生成的牌)
+        self.misc = 0     # 暴走 (Rampage) 的累计加成
+
+class SimMonster:
+    __slots__ = ("id", "hp", "max_hp", "block", "powers", "move", "history",
+                 "gone", "spec", "cycle_pos", "split_done")
+
+    def __init__(self, mid, hp):
+        self.id = mid
+        self.hp = hp
+        self.max_hp = hp
+        self.block = 0
+        self.spec = MONSTER_DB[mid]
+        self.powers = dict(self.spec["powers"])
+        self.move = None
+        self.history = []
+        self.gone = False
+        self.cycle_pos = 0
+        self.split_done = False
+
+    @property
+    def alive(self):
+        return not self.gone
+
+class CombatSim:
+    """
+    一场战斗。
+    :param deck: 卡牌 id 列表 (或 (id, upgrades) 元组)
+    :param monsters: 怪物 id 列表
+    :param potions: 长度 3 的药水 id 列表 (None 表示空槽)
+    """
+    def __init__(self, deck, monsters, hp=80, max_hp=80, potions=None, relics=None,
+                 rng=None, floor=1, gold=99):
+        self.rng = rng or random.Random()
+        self.floor = floor
+        self.gold = gold
+        self.relics = relics if relics is not None else ["Burning Blood"]
+        self.potions = list(potions) if potions is not None else [None, None, None]
+        self._uuid = 0
+
+        self.hp = hp
+        self.max_hp = max_hp
+        self.block = 0
+        self.energy = 0
+        self.powers = {}
+        self.turn = 0
+        self.hp_loss_times = 0 # 血债 (Blood for Blood) 减费
+        self.over = False
+        self.won = False
+
+        cards = [self._new_card(c) for c in deck]
+        self.rng.shuffle(cards)
+        self.draw_pile = cards
+        self.hand = []
+        self.discard_pile = []
+        self.exhaust_pile = []
+
+        self.monsters = []
+        for i, mid in enumerate(monsters):
+            lo, hi = MONSTER_DB[mid]["hp"]
+            m = SimMonster(mid, self.rng.randint(lo, hi))
+            # 同名怪错开循环 (三哨卫交替放电/激光)
+            m.cycle_pos = list(monsters[:i]).count(mid)
+            self.monsters.append(m)
+        for m in self.monsters:
+            self._roll_move(m)
+        self._start_player_turn()
+
+    # ==================================================
+    # 对外接口
+    # ==================================================
+    def handle(self, cmd):
+        """执行一条 CommunicationMod 指令，返回新状态 (或 error dict)"""
+        parts = cmd.strip().split()
+        if not parts:
+            return _error("Empty command")
+        verb = parts[0].lower()
+        if verb in ("state", "wait", "ready"):
+            return self.to_state()
+        if self.over:
+            return _error(f"Invalid command: {cmd.strip()}")
+        try:
+            if verb == "play":
+                err = self.play(int(parts[1]) - 1, int(parts[2]) if len(parts) > 2 else None)
+            elif verb == "end":
+                err = self.end_turn()
+            elif verb == "potion":
+                err = self._potion_command(parts[1:])
+            else:
+                err = f"Invalid command: {cmd.strip()}"
+        except (IndexError, ValueError):
+            err = f"Invalid command: {cmd.strip()}"
+        return _error(err) if err else self.to_state()
+
+    def play(self, hand_idx, target_idx=None):
+        """打出第 hand_idx 张手牌 (0 起)。返回错误信息，成功返回 None"""
+        if not 0 <= hand_idx < len(self.hand):
+            return f"Invalid card index: {hand_idx + 1}"
+        card = self.hand[hand_idx]
+        if not self._is_playable(card):
+            return f"Card {card.id} is not playable"
+        spec = card.spec
+        target = None
+        if spec["has_target"]:
+            if target_idx is None or not 0 <= target_idx < len(self.monsters) or self.monsters[target_idx].gone:
+                return "Selected card requires a valid target"
+            target = self.monsters[target_idx]
+
+        cost = self._card_cost(card)
+        x = self.energy if cost == X_COST else 0
+        self.energy -= x if cost == X_COST else cost
+        self.hand.pop(hand_idx)
+
+        repeats = 1
+        if spec["type"] == ATTACK and self.powers.get("Double Tap", 0) > 0:
+            repeats = 2
+            self._add_power("Double Tap", -1)
+        for _ in range(repeats):
+            self._resolve_card(card, target, x)
+            if target is not None and target.gone:
+                target = self._random_alive()
+                if target is None:
+                    break
+
+        # 卡牌去向
+        exhaust = spec.get("exhaust") or (spec["type"] == SKILL and "Corruption" in self.powers)
+        if spec["type"] == POWER:
+            pass
+        elif exhaust:
+            self._exhaust(card)
+        else:
+            self.discard_pile.append(card)
+
+        self._after_card_played(card)
+        self._check_end()
+        return None
+
+    def end_turn(self):
+        # 1. 玩家回合结束
+        for card in list(self.hand):
+            if card.spec.get("special") == "burn":
+                self._damage_player(2 + 2 * card.upgrades)
+        if "Metallicize" in self.powers:
+            self._gain_block(self.powers["Metallicize"], raw=True)
+        if "Combust" in self.powers:
+            self._lose_hp(1)
+            for m in self._alive():
+                self._damage_monster(m, self.powers["Combust"], attack=False)
+        self.powers.pop("Rage", None)
+        self.powers.pop("Double Tap", None)
+        for card in self.hand:
+            card.free = False
+            if card.spec.get("ethereal"):
+                self._exhaust(card)
+            else:
+                self.discard_pile.append(card)
+        self.hand = []
+        if self._check_end():
+            return None
+
+        # 2. 怪物回合
+        for m in self.monsters:
+            if m.gone:
+                continue
+            m.block = 0
+            self._monster_act(m)
+            if self.hp <= 0:
+                break
+        if self._check_end():
+            return None
+
+        # 3. 回合末结算 (仪式 / 负面状态衰减)
+        for m in self._alive():
+            if "Ritual" in m.powers and m.history and m.history[-1] != "Incantation":
+                m.powers["Strength"] = m.powers.get("Strength", 0) + m.powers["Ritual"]
+            if "Metallicize" in m.powers and "Asleep" in m.powers:
+                m.block += m.powers["Metallicize"]
+            _tick_debuffs(m.powers)
+            self._roll_move(m)
+        _tick_debuffs(self.powers)
+        self.powers.pop("Flame Barrier", None)
+        self._start_player_turn()
+        return None
+
+    # ==================================================
+    # 状态输出 (CommunicationMod 格式)
+    # ==================================================
+    def to_state(self):
+        in_combat = not self.over
+        cmds = ["play", "end", "key", "click", "wait", "state"] if in_combat else ["proceed", "state"]
+        if in_combat and any(self.potions):
+            cmds.insert(2, "potion")
+        screen = "NONE" if in_combat else ("COMBAT_REWARD" if self.won else "GAME_OVER")
+        state = {
+            "available_commands": cmds,
+            "ready_for_command": True,
+            "in_game": True,
+            "game_state": self._game_state(screen),
+        }
+        if in_combat:
+            state["game_state"]["combat_state"] = self.combat_state()
+        return state
+
+    def _game_state(self, screen):
+        return {
+            "screen_type": screen, "screen_name": screen, "room_phase": "COMBAT" if not self.over else "COMPLETE",
+            "room_type": "MonsterRoom", "action_phase": "WAITING_ON_USER",
+            "floor": self.floor, "act": 1, "ascension_level": 0, "class": "IRONCLAD", "seed": 0,
+            "gold": self.gold, "current_hp": self.hp, "max_hp": self.max_hp,
+            "choice_list": [], "screen_state": {},
+            "relics": [{"id": r, "name": r, "counter": -1} for r in self.relics],
+            "potions": _potion_dicts(self.potions, in_combat=not self.over),
+            "deck": [],
+        }
+
+    def combat_state(self):
+        return {
+            "turn": self.turn,
+            "cards_discarded_this_turn": 0,
+            "player": {
+                "current_hp": self.hp, "max_hp": self.max_hp, "block": self.block,
+                "energy": self.energy, "powers": _power_list(self.powers), "orbs": [],
+            },
+            "hand": [self._card_dict(c) for c in self.hand],
+            "draw_pile": [self._card_dict(c) for c in self.draw_pile],
+            "discard_pile": [self._card_dict(c) for c in self.discard_pile],
+            "exhaust_pile": [self._card_dict(c) for c in self.exhaust_pile],
+            "monsters": [self._monster_dict(m) for m in self.monsters],
+        }
+
+    def _card_dict(self, card):
+        spec = card.spec
+        name = CARD_NAMES.get(card.id, card.id)
+        return {
+            "id": card.id, "name": name + "+" * min(card.upgrades, 1), "uuid": card.uuid,
+            "cost": self._card_cost(card), "type": spec["type"], "upgrades": card.upgrades,
+            "has_target": spec["has_target"], "is_playable": self._is_playable(card),
+            "exhausts": bool(spec.get("exhaust")), "ethereal": bool(spec.get("ethereal")),
+        }
+
+    def _monster_dict(self, m):
+        move = m.spec["moves"][m.move]
+        base, hits = self._move_damage(m, move)
+        attacking = move["damage"] > 0 and not m.gone
+        return {
+            "id": m.id, "name": m.id, "current_hp": max(0, m.hp), "max_hp": m.max_hp, "block": m.block,
+            "intent": move["intent"] if not m.gone else "NONE", "move_id": list(m.spec["moves"]).index(m.move),
+            "move_base_damage": base if attacking else -1,
+            "move_adjusted_damage": self._monster_hit(m, base) if attacking else -1,
+            "move_hits": hits if attacking else 0,
+            "last_move_id": None, "second_last_move_id": None,
+            "is_gone": m.gone, "half_dead": False, "powers": _power_list(m.powers),
+        }
+
+    # ==================================================
+    # 卡牌结算
+    # ==================================================
+    def _new_card(self, c):
+        cid, upgrades = (c, 0) if isinstance(c, str) else c
+        self._uuid += 1
+        return SimCard(cid, f"sim-{self._uuid}", upgrades)
+
+    def _card_cost(self, card):
+        cost = card.spec["cost"]
+        if cost in (UNPLAYABLE, X_COST):
+            return cost
+        if card.free or (card.spec["type"] == SKILL and "Corruption" in self.powers):
+            return 0
+        if card.id == "Blood for Blood":
+            return max(0, cost - self.hp_loss_times)
+        return cost
+
+    def _is_playable(self, card):
+        cost = self._card_cost(card)
+        if cost == UNPLAYABLE:
+            return False
+        if cost > self.energy:
+            return False
+        ctype = card.spec["type"]
+        if ctype == ATTACK and "Entangled" in self.powers:
+            return False
+        if card.id == "Clash" and any(c.spec["type"] != ATTACK for c in self.hand):
+            return False
+        return ctype != CURSE
+
+    def _resolve_card(self, card, target, x):
+        spec = card.spec
+        up = card.upgrades
+        special = spec.get("special")
+        damage = spec.get("damage", 0)
+        if damage or special in ("body_slam", "fiend_fire"):
+            damage += 3 * up + card.misc
+        hits = spec.get("hits", 1)
+
+        if special == "perfected_strike":
+            damage += (2 + up) * sum(1 for c in self._all_cards() if "Strike" in c.id)
+        elif special == "body_slam":
+            damage = self.block
+        elif special == "x_hits":
+            hits = x
+        elif special == "fiend_fire":
+            burned = [c for c in self.hand]
+            for c in burned:
+                self.hand.remove(c)
+                self._exhaust(c)
+            hits = len(burned)
+        elif special == "dropkick" and target is not None and target.powers.get("Vulnerable", 0) > 0:
+            self.energy += 1
+            self._draw(1)
+
+        # 伤害
+        if damage > 0 or special in ("body_slam", "fiend_fire"):
+            for _ in range(hits):
+                if spec.get("aoe"):
+                    for m in self._alive():
+                        self._attack_monster(m, damage, card)
+                else:
+                    t = target if special != "random_target" else self._random_alive()
+                    if t is None or t.gone:
+                        break
+                    self._attack_monster(t, damage, card)
+            if card.id == "Rampage":
+                card.misc += 5 + 3 * up
+
+        # 格挡
+        block = spec.get("block", 0)
+        if block:
+            self._gain_block(block + 3 * up)
+        if special == "double_block":
+            self._gain_block(self.block, raw=True)
+
+        # 负面状态
+        for key, power in (("vuln", "Vulnerable"), ("weak", "Weak")):
+            amount = spec.get(key, 0)
+            if amount:
+                for m in (self._alive() if spec.get("aoe") else [target] if target else []):
+                    self._debuff_monster(m, power, amount + (1 if up and key == "vuln" else 0))
+
+        # 资源
+        if spec.get("lose_hp"):
+            self._lose_hp(spec["lose_hp"], from_card=True)
+        if spec.get("energy"):
+            self.energy += spec["energy"] + up
+        if spec.get("draw"):
+            self._draw(spec["draw"] + (1 if up and card.id in ("Shrug It Off", "Pommel Strike", "Battle Trance") else 0))
+        if spec.get("strength"):
+            self._add_power("Strength", spec["strength"] + up)
+        if spec.get("power"):
+            pid, amount = spec["power"]
+            self._add_power(pid, amount + up)
+        if spec.get("add"):
+            cid, n, pile = spec["add"]
+            self._add_cards(cid, n, pile)
+
+        # 特殊
+        if special == "headbutt" and self.discard_pile:
+            self.draw_pile.append(self.discard_pile.pop())
+        elif special == "exhaust_random" and self.hand:
+            c = self.hand.pop(self.rng.randrange(len(self.hand)))
+            self._exhaust(c)
+        elif special == "upgrade_random":
+            for c in (self.hand if up else [c for c in self.hand if c.upgrades == 0][:1]):
+                c.upgrades = max(c.upgrades, 1)
+        elif special == "disarm" and target is not None:
+            target.powers["Strength"] = target.powers.get("Strength", 0) - (2 + up)
+        elif special == "infernal_blade" and len(self.hand) < MAX_HAND:
+            c = self._new_card(self.rng.choice(ATTACK_POOL))
+            c.free = True
+            self.hand.append(c)
+        elif special == "spot_weakness" and target is not None:
+            if target.spec["moves"][target.move]["damage"] > 0:
+                self._add_power("Strength", 3 + up)
+        elif special == "exhaust_non_attacks":
+            for c in [c for c in self.hand if c.spec["type"] != ATTACK]:
+                self.hand.remove(c)
+                self._exhaust(c)
+        elif special == "second_wind":
+            for c in [c for c in self.hand if c.spec["type"] != ATTACK]:
+                self.hand.remove(c)
+                self._exhaust(c)
+                self._gain_block(5 + 2 * up)
+        elif special == "exhume":
+            pool = [c for c in self.exhaust_pile if c.id != "Exhume"]
+            if pool and len(self.hand) < MAX_HAND:
+                c = self.rng.choice(pool)
+                self.exhaust_pile.remove(c)
+                self.hand.append(c)
+        elif special == "limit_break":
+            if self.powers.get("Strength", 0) > 0:
+                self.powers["Strength"] *= 2
+        elif special == "berserk":
+            self._add_power("Vulnerable", 2 - up)
+        elif card.id == "Dual Wield":
+            pool = [c for c in self.hand if c.spec["type"] in (ATTACK, POWER)]
+            for _ in range(1 + up):
+                if pool and len(self.hand) < MAX_HAND:
+                    self.hand.append(self._new_card((pool[0].id, pool[0].upgrades)))
+
+    def _after_card_played(self, card):
+        # 地精首领的激怒：玩家打技能牌时加力量
+        if card.spec["type"] == SKILL:
+            for m in self._alive():
+                if "Anger" in m.powers:
+                    m.powers["Strength"] = m.powers.get("Strength", 0) + m.powers["Anger"]
+        if card.spec["type"] == ATTACK and "Rage" in self.powers:
+            self._gain_block(self.powers["Rage"], raw=True)
+        # 疼痛 (Pain) 诅咒：每打一张其他牌掉 1 血
+        for c in self.hand:
+            if c.spec.get("special") == "pain":
+                self._lose_hp(1)
+
+    # ==================================================
+    # 伤害与格挡
+    # ==================================================
+    def _attack_monster(self, m, base, card):
+        dmg = base + self.powers.get("Strength", 0) * (3 + 2 * card.upgrades if card.spec.get("special") == "heavy_blade" else 1)
+        if self.powers.get("Weak", 0) > 0:
+            dmg *= 0.75
+        if m.powers.get("Vulnerable", 0) > 0:
+            dmg *= 1.5
+        unblocked = self._damage_monster(m, max(0, int(dmg)), attack=True)
+        special = card.spec.get("special")
+        if special == "reaper" and unblocked > 0:
+            self.hp = min(self.max_hp, self.hp + unblocked)
+        if special == "feed" and m.gone:
+            self.max_hp += 3 + card.upgrades
+            self.hp += 3 + card.upgrades
+
+    def _damage_monster(self, m, dmg, attack=True):
+        """怪物受到伤害，返回实际掉的血量"""
+        if m.gone:
+            return 0
+        blocked = min(m.block, dmg)
+        m.block -= blocked
+        loss = min(m.hp, dmg - blocked)
+        m.hp -= loss
+        if loss > 0:
+            if attack and "Curl Up" in m.powers:
+                m.block += m.powers.pop("Curl Up")
+            if "Asleep" in m.powers:
+                # 乐加维林被打醒：下一招直接攻击
+                m.powers.pop("Asleep")
+                m.powers.pop("Metallicize", None)
+                m.history = m.history + ["Sleep"] * (len(m.spec["opening"]) - len(m.history))
+                m.move = "Attack"
+                m.cycle_pos = 1
+            if "Angry" in m.powers and attack:
+                m.powers["Strength"] = m.powers.get("Strength", 0) + m.powers["Angry"]
+        if m.hp <= 0:
+            self._kill(m)
+        elif m.spec["split"] and not m.split_done and m.hp <= m.max_hp // 2:
+            self._split(m)
+        return loss
+
+    def _kill(self, m):
+        m.hp = 0
+        m.gone = True
+        m.block = 0
+        if "Spore Cloud" in m.powers:
+            self._add_power("Vulnerable", m.powers["Spore Cloud"])
+        m.powers = {}
+
+    def _split(self, m):
+        """史莱姆分裂：原体消失，按当前血量生成两只"""
+        m.split_done = True
+        children = m.spec["split"]
+        if isinstance(children, str):
+            children = (children, children)
+        hp = m.hp
+        m.hp = 0
+        m.gone = True
+        m.powers = {}
+        for cid in children:
+            child = SimMonster(cid, hp)
+            child.max_hp = hp
+            self._roll_move(child)
+            free = [i for i, x in enumerate(self.monsters) if x.gone and x is not m]
+            if free:
+                self.monsters[free[0]] = child
+            elif len(self.monsters) < MAX_MONSTERS:
+                self.monsters.append(child)
+
+    def _gain_block(self, amount, raw=False):
+        if not raw:
+            amount += self.powers.get("Dexterity", 0)
+            if self.powers.get("Frail", 0) > 0:
+                amount = int(amount * 0.75)
+        amount = max(0, amount)
+        if amount <= 0:
+            return
+        self.block += amount
+        if "Juggernaut" in self.powers:
+            t = self._random_alive()
+            if t is not None:
+                self._damage_monster(t, self.powers["Juggernaut"], attack=False)
+
+    def _damage_player(self, dmg):
+        blocked = min(self.block, dmg)
+        self.block -= blocked
+        self._lose_hp(dmg - blocked)
+
+    def _lose_hp(self, amount, from_card=False):
+        amount = min(self.hp, amount)
+        if amount <= 0:
+            return
+        self.hp -= amount
+        self.hp_loss_times += 1
+        if from_card and "Rupture" in self.powers:
+            self._add_power("Strength", self.powers["Rupture"])
+
+    def _monster_hit(self, m, base):
+        dmg = base + m.powers.get("Strength", 0)
+        if m.powers.get("Weak", 0) > 0:
+            dmg *= 0.75
+        if self.powers.get("Vulnerable", 0) > 0:
+            dmg *= 1.5
+        return max(0, int(dmg))
+
+    def _move_damage(self, m, move):
+        if move.get("special") == "divider":
+            return self.hp // 12 + 1, move["hits"]
+        return move["damage"], move["hits"]
+
+    def _debuff_monster(self, m, power, amount):
+        if m.powers.get("Artifact", 0) > 0:
+            m.powers["Artifact"] -= 1
+            if m.powers["Artifact"] <= 0:
+                m.powers.pop("Artifact")
+            return
+        m.powers[power] = m.powers.get(power, 0) + amount
+
+    # ==================================================
+    # 怪物
+    # ==================================================
+    def _roll_move(self, m):
+        spec = m.spec
+        n = len(m.history)
+        if n < len(spec["opening"]):
+            m.move = spec["opening"][n]
+            return
+        if "Asleep" in m.powers:
+            # 睡满了自然醒
+            m.powers.pop("Asleep")
+            m.powers.pop("Metallicize", None)
+        if spec["cycle"]:
+            m.move = spec["cycle"][m.cycle_pos % len(spec["cycle"])]
+            m.cycle_pos += 1
+        else:
+            weights = dict(spec["weights"])
+            last = m.history[-spec["max_repeat"]:]
+            if len(last) == spec["max_repeat"] and len(set(last)) == 1 and len(weights) > 1:
+                weights.pop(last[0], None)
+            m.move = self.rng.choices(list(weights), weights=list(weights.values()))[0]
+
+    def _monster_act(self, m):
+        move = m.spec["moves"][m.move]
+        m.history.append(m.move)
+        if move["intent"] == "SLEEP":
+            return
+        if move.get("escape"):
+            m.gone = True
+            return
+        if move["damage"] > 0:
+            base, hits = self._move_damage(m, move)
+            for _ in range(hits):
+                self._damage_player(self._monster_hit(m, base))
+                if "Flame Barrier" in self.powers:
+                    self._damage_monster(m, self.powers["Flame Barrier"], attack=False)
+                if self.hp <= 0 or m.gone:
+                    return
+        if move.get("block"):
+            receiver = m
+            if move.get("ally_block"):
+                allies = [x for x in self._alive() if x is not m]
+                receiver = self.rng.choice(allies) if allies else m
+            receiver.block += move["block"]
+        if move.get("strength"):
+            m.powers["Strength"] = m.powers.get("Strength", 0) + move["strength"]
+        if move.get("ritual"):
+            m.powers["Ritual"] = m.powers.get("Ritual", 0) + move["ritual"]
+        if move.get("enrage"):
+            m.powers["Anger"] = move["enrage"]
+        for key, power in (("weak", "Weak"), ("vuln", "Vulnerable"), ("frail", "Frail")):
+            if move.get(key):
+                self._add_power(power, move[key])
+        if move.get("lose_str"):
+            self._add_power("Strength", -move["lose_str"])
+        if move.get("lose_dex"):
+            self._add_power("Dexterity", -move["lose_dex"])
+        if move.get("add"):
+            self._add_cards(*move["add"])
+
+    # ==================================================
+    # 牌堆
+    # ==================================================
+    def _start_player_turn(self):
+        self.turn += 1
+        if "Barricade" not in self.powers:
+            self.block = 0
+        self.energy = BASE_ENERGY + (1 if "Berserk" in self.powers else 0)
+        if "Demon Form" in self.powers:
+            self._add_power("Strength", self.powers["Demon Form"])
+        extra = 0
+        if "Brutality" in self.powers:
+            self._lose_hp(1)
+            extra += 1
+        self._draw(HAND_DRAW + extra)
+        self._check_end()
+
+    def _draw(self, n):
+        for _ in range(n):
+            if len(self.hand) >= MAX_HAND:
+                return
+            if not self.draw_pile:
+                if not self.discard_pile:
+                    return
+                self.draw_pile = self.discard_pile
+                self.discard_pile = []
+                self.rng.shuffle(self.draw_pile)
+            card = self.draw_pile.pop()
+            self.hand.append(card)
+            ctype = card.spec["type"]
+            if card.spec.get("special") == "void":
+                self.energy = max(0, self.energy - 1)
+            if ctype in (STATUS, CURSE):
+                if "Fire Breathing" in self.powers:
+                    for m in self._alive():
+                        self._damage_monster(m, self.powers["Fire Breathing"], attack=False)
+                if "Evolve" in self.powers and ctype == STATUS:
+                    self._draw(1)
+
+    def _add_cards(self, cid, n, pile):
+        for _ in range(n):
+            card = self._new_card(cid)
+            if pile == "hand" and len(self.hand) < MAX_HAND:
+                self.hand.append(card)
+            elif pile == "draw":
+                self.draw_pile.insert(self.rng.randint(0, len(self.draw_pile)), card)
+            else:
+                self.discard_pile.append(card)
+
+    def _exhaust(self, card):
+        self.exhaust_pile.append(card)
+        if "Feel No Pain" in self.powers:
+            self._gain_block(self.powers["Feel No Pain"], raw=True)
+        if "Dark Embrace" in self.powers:
+            self._draw(1)
+
+    def _all_cards(self):
+        return self.hand + self.draw_pile + self.discard_pile + self.exhaust_pile
+
+    # ==================================================
+    # 杂项
+    # ==================================================
+    def _potion_command(self, args):
+        if not args:
+            return "Invalid potion command"
+        action = args[0].lower()
+        slot = int(args[1])
+        if not 0 <= slot < len(self.potions) or self.potions[slot] is None:
+            return f"Invalid potion slot: {slot}"
+        pid = self.potions[slot]
+        if action == "discard":
+            self.potions[slot] = None
+            return None
+        if action != "use":
+            return f"Invalid potion command: {action}"
+        p = POTION_DB[pid]
+        target = None
+        if p["target"]:
+            t = int(args[2]) if len(args) > 2 else -1
+            if not 0 <= t < len(self.monsters) or self.monsters[t].gone:
+                return "Selected potion requires a valid target"
+            target = self.monsters[t]
+        self.potions[slot] = None
+        if p.get("damage"):
+            self._damage_monster(target, p["damage"], attack=False)
+        if p.get("aoe_damage"):
+            for m in self._alive():
+                self._damage_monster(m, p["aoe_damage"], attack=False)
+        if p.get("weak"):
+            self._debuff_monster(target, "Weak", p["weak"])
+        if p.get("vuln"):
+            self._debuff_monster(target, "Vulnerable", p["vuln"])
+        if p.get("block"):
+            self._gain_block(p["block"], raw=True)
+        if p.get("strength"):
+            self._add_power("Strength", p["strength"])
+        if p.get("dexterity"):
+            self._add_power("Dexterity", p["dexterity"])
+        if p.get("energy"):
+            self.energy += p["energy"]
+        if p.get("draw"):
+            self._draw(p["draw"])
+        if p.get("heal_pct"):
+            self.hp = min(self.max_hp, self.hp + self.max_hp * p["heal_pct"] // 100)
+        self._check_end()
+        return None
+
+    def _add_power(self, pid, amount):
+        value = self.powers.get(pid, 0) + amount
+        if value == 0 or (value < 0 and pid in _TURN_DEBUFFS):
+            self.powers.pop(pid, None)
+        else:
+            self.powers[pid] = value
+
+    def _alive(self):
+        return [m for m in self.monsters if not m.gone]
+
+    def _random_alive(self):
+        alive = self._alive()
+        return self.rng.choice(alive) if alive else None
+
+    def _check_end(self):
+        """战斗是否结束 (阵亡或怪全灭)"""
+        if self.over:
+            return True
+        if self.hp <= 0:
+            self.hp = 0
+            self.over = True
+            self.won = False
+        elif not self._alive():
+            self.over = True
+            self.won = True
+            if "Burning Blood" in self.relics:
+                self.hp = min(self.max_hp, self.hp + 6)
+        return self.over
+
+def _tick_debuffs(powers):
+    for pid in _TURN_DEBUFFS:
+        if pid in powers:
+            powers[pid] -= 1
+            if powers[pid] <= 0:
+                del powers[pid]
+
+def _potion_dicts(potions, in_combat=True):
+    out = []
+    for pid in potions:
+        if pid is None:
+            out.append(dict(POTION_SLOT))
+        else:
+            p = POTION_DB[pid]
+            out.append({"id": pid, "name": p["name"], "can_use": in_combat, "can_discard": True,
+                        "requires_target": p["target"]})
+    return out
+
+def _power_list(powers):
+    return [{"id": pid, "name": pid, "amount": amount} for pid, amount in powers.items()]
+
+# ======================================================================
+# 整局游戏
+# ======================================================================
+# 第一幕楼层安排 (A0 的简化版：只有战斗房，没有事件/商店/篝火)
+ACT1_ROOMS = ["weak"] * 3 + ["strong"] * 2 + ["elite"] + ["strong"] * 3 + ["elite"] + \
+             ["strong"] * 3 + ["elite"] + ["strong"] * 2 + ["boss"]
+_ENCOUNTERS = {"weak": WEAK_ENCOUNTERS, "strong": STRONG_ENCOUNTERS,
+               "elite": ELITE_ENCOUNTERS, "boss": BOSS_ENCOUNTERS}
+_GOLD = {"weak": (10, 20), "strong": (10, 20), "elite": (25, 35), "boss": (95, 105)}
+
+class SimGame:
+    """
+    一局第一幕。实现 handle(cmd)，接口和 mock_server 的替身游戏一致：
+      MAIN_MENU --start--> MAP --choose--> 战斗 --胜利--> COMBAT_REWARD (gold/potion/card)
+        --choose card--> CARD_REWARD --choose/skip--> COMBAT_REWARD --proceed--> MAP ...
+      阵亡或打完 Boss --> GAME_OVER --proceed--> MAIN_MENU
+    """
+    def __init__(self, seed=None, rooms=None, potion_chance=0.4):
+        self.rng = random.Random(seed)
+        self.rooms = rooms or ACT1_ROOMS
+        self.potion_chance = potion_chance
+        self.screen = "MAIN_MENU"
+        self.stats = {"runs": 0, "combats": 0, "wins": 0, "victories": 0}
+        self._new_run()
+
+    def _new_run(self):
+        self.deck = list(STARTER_DECK)
+        self.hp = 80
+        self.max_hp = 80
+        self.gold = 99
+        self.floor = 0
+        self.potions = [None, None, None]
+        self.relics = ["Burning Blood"]
+        self.combat = None
+        self.room_kind = None
+        self.rewards = []
+        self.card_choices = []
+        self.victory = False
+
+    def handle(self, cmd):
+        parts = cmd.strip().split()
+        verb = parts[0].lower() if parts else ""
+        if verb in ("state", "wait", "ready"):
+            return self.to_state()
+        if self.screen == "COMBAT":
+            return self._handle_combat(cmd)
+        handler = getattr(self, f"_on_{self.screen.lower()}")
+        err = handler(verb, parts[1:])
+        return _error(err) if err else self.to_state()
+
+    # --- 各界面 ---
+    def _on_main_menu(self, verb, args):
+        if verb != "start":
+            return f"Invalid command: {verb}"
+        self.stats["runs"] += 1
+        self._new_run()
+        self.screen = "MAP"
+        return None
+
+    def _on_map(self, verb, args):
+        if verb != "choose":
+            return f"Invalid command: {verb}"
+        self.floor += 1
+        kind = self.rooms[min(self.floor, len(self.rooms)) - 1]
+        self.room_kind = kind
+        monsters = self.rng.choice(_ENCOUNTERS[kind])
+        self.combat = CombatSim(self.deck, monsters, hp=self.hp, max_hp=self.max_hp, potions=self.potions,
+                                relics=self.relics, rng=self.rng, floor=self.floor, gold=self.gold)
+        self.stats["combats"] += 1
+        self.screen = "COMBAT"
+        return None
+
+    def _handle_combat(self, cmd):
+        state = self.combat.handle(cmd)
+        if "error" in state or not self.combat.over:
+            return state
+        # 战斗结束：把血量/药水带回整局
+        self.hp, self.max_hp = self.combat.hp, self.combat.max_hp
+        self.potions = self.combat.potions
+        if not self.combat.won:
+            self.screen = "GAME_OVER"
+            return self.to_state()
+        self.stats["wins"] += 1
+        lo, hi = _GOLD[self.room_kind]
+        self.rewards = [("gold", self.rng.randint(lo, hi))]
+        if self.rng.random() < self.potion_chance:
+            self.rewards.append(("potion", self.rng.choice(list(POTION_DB))))
+        self.rewards.append(("card", None))
+        self.screen = "COMBAT_REWARD"
+        return self.to_state()
+
+    def _on_combat_reward(self, verb, args):
+        if verb == "proceed":
+            if self.floor >= len(self.rooms):
+                self.victory = True
+                self.stats["victories"] += 1
+                self.screen = "GAME_OVER"
+            else:
+                self.screen = "MAP"
+            return None
+        if verb != "choose" or not args:
+            return f"Invalid command: {verb}"
+        idx = int(args[0])
+        if not 0 <= idx < len(self.rewards):
+            return f"Invalid choice: {idx}"
+        kind, value = self.rewards[idx]
+        if kind == "potion":
+            if None not in self.potions:
+                return "Potion slots are full"
+            self.potions[self.potions.index(None)] = value
+        self.rewards.pop(idx)
+        if kind == "gold":
+            self.gold += value
+        elif kind == "card":
+            self.card_choices = self.rng.sample(REWARD_POOL, 3)
+            self.screen = "CARD_REWARD"
+        return None
+
+    def _on_card_reward(self, verb, args):
+        if verb == "choose" and args:
+            idx = int(args[0])
+            if not 0 <= idx < len(self.card_choices):
+                return f"Invalid choice: {idx}"
+            self.deck.append(self.card_choices[idx])
+        elif verb != "skip":
+            return f"Invalid command: {verb}"
+        self.card_choices = []
+        self.screen = "COMBAT_REWARD"
+        return None
+
+    def _on_game_over(self, verb, args):
+        if verb != "proceed":
+            return f"Invalid command: {verb}"
+        self.screen = "MAIN_MENU"
+        return None
+
+    # --- 状态输出 ---
+    def to_state(self):
+        if self.screen == "COMBAT":
+            return self.combat.to_state()
+        if self.screen == "MAIN_MENU":
+            return {"available_commands": ["start", "state"], "ready_for_command": True, "in_game": False}
+        cmds, choices = {
+            "MAP": (["choose", "state"], ["x=0"]),
+            "COMBAT_REWARD": (["choose", "proceed", "state"] if self.rewards else ["proceed", "state"],
+                              [kind for kind, _ in self.rewards]),
+            "CARD_REWARD": (["choose", "skip", "state"], [CARD_NAMES.get(c, c) for c in self.card_choices]),
+            "GAME_OVER": (["proceed", "state"], []),
+        }[self.screen]
+        screen = "VICTORY" if self.screen == "GAME_OVER" and self.victory else self.screen
+        return {
+            "available_commands": cmds,
+            "ready_for_command": True,
+            "in_game": True,
+            "game_state": {
+                "screen_type": screen, "screen_name": screen, "room_phase": "COMPLETE",
+                "floor": self.floor, "act": 1, "ascension_level": 0, "class": "IRONCLAD", "seed": 0,
+                "gold": self.gold, "current_hp": self.hp, "max_hp": self.max_hp,
+                "choice_list": choices, "screen_state": {},
+                "relics": [{"id": r, "name": r, "counter": -1} for r in self.relics],
+                "potions": _potion_dicts(self.potions, in_combat=False),
+                "deck": [],
+            },
+        }
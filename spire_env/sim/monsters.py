@@ -0,0 +1,196 @@
+# monsters.py
+"""
+[模拟器] 第一幕怪物数据表
+覆盖 vocabulary.MONSTER_IDS 里的 Act 1 怪物 (含地精家族)。
+招式数值取 A0 的原版数值；行动模式做了简化：
+  - opening: 开场固定按顺序出的招
+  - cycle:   之后按顺序循环
+  - weights: 之后按权重随机 (同一招最多连出 max_repeat 次)
+"""
+
+def mv(intent, damage=0, hits=1, **effects):
+    """
+    招式。effects 可选:
+      block: 自己获得格挡 (ally_block=True 时给随机队友)
+      strength / ritual: 自己加力量 / 仪式
+      weak / vuln / frail / entangle: 给玩家上负面状态
+      add: (卡牌id, 数量, 牌堆) 往玩家牌堆塞牌
+      lose_str / lose_dex: 玩家减力量/敏捷 (吸魂)
+      escape: 逃跑
+      special: combat.py 里的特殊结算
+    """
+    move = {"intent": intent, "damage": damage, "hits": hits}
+    move.update(effects)
+    return move
+
+def _m(hp, moves, opening=(), cycle=(), weights=None, max_repeat=2, powers=None, split=None):
+    return {"hp": hp, "moves": moves, "opening": list(opening), "cycle": list(cycle),
+            "weights": weights, "max_repeat": max_repeat, "powers": powers or {}, "split": split}
+
+MONSTER_DB = {
+    # --- 普通怪 ---
+    "Cultist": _m((48, 54), {
+        "Incantation": mv("BUFF", ritual=3),
+        "Dark Strike": mv("ATTACK", 6),
+    }, opening=["Incantation"], cycle=["Dark Strike"]),
+
+    "JawWorm": _m((40, 44), {
+        "Chomp": mv("ATTACK", 11),
+        "Thrash": mv("ATTACK_DEFEND", 7, block=5),
+        "Bellow": mv("DEFEND_BUFF", strength=3, block=6),
+    }, opening=["Chomp"], weights={"Chomp": 25, "Thrash": 30, "Bellow": 45}, max_repeat=1),
+
+    "FungiBeast": _m((22, 28), {
+        "Bite": mv("ATTACK", 6),
+        "Grow": mv("BUFF", strength=3),
+    }, weights={"Bite": 60, "Grow": 40}, powers={"Spore Cloud": 2}),
+
+    "FuzzyLouseNormal": _m((10, 15), {
+        "Bite": mv("ATTACK", 6),
+        "Grow": mv("BUFF", strength=3),
+    }, weights={"Bite": 75, "Grow": 25}, powers={"Curl Up": 5}),
+
+    "FuzzyLouseDefensive": _m((11, 17), {
+        "Bite": mv("ATTACK", 6),
+        "Spit Web": mv("DEBUFF", weak=2),
+    }, weights={"Bite": 75, "Spit Web": 25}, powers={"Curl Up": 5}),
+
+    "AcidSlime_L": _m((65, 69), {
+        "Corrosive Spit": mv("ATTACK_DEBUFF", 11, add=("Slimed", 2, "discard")),
+        "Tackle": mv("ATTACK", 16),
+        "Lick": mv("DEBUFF", weak=2),
+    }, weights={"Corrosive Spit": 30, "Tackle": 40, "Lick": 30}, split="AcidSlime_M"),
+
+    "SpikeSlime_L": _m((64, 70), {
+        "Flame Tackle": mv("ATTACK_DEBUFF", 16, add=("Slimed", 2, "discard")),
+        "Lick": mv("DEBUFF", frail=2),
+    }, weights={"Flame Tackle": 30, "Lick": 70}, split="SpikeSlime_M"),
+
+    "AcidSlime_M": _m((28, 32), {
+        "Corrosive Spit": mv("ATTACK_DEBUFF", 7, add=("Slimed", 1, "discard")),
+        "Tackle": mv("ATTACK", 10),
+        "Lick": mv("DEBUFF", weak=1),
+    }, weights={"Corrosive Spit": 30, "Tackle": 40, "Lick": 30}),
+
+    "SpikeSlime_M": _m((28, 32), {
+        "Flame Tackle": mv("ATTACK_DEBUFF", 8, add=("Slimed", 1, "discard")),
+        "Lick": mv("DEBUFF", frail=1),
+    }, weights={"Flame Tackle": 30, "Lick": 70}),
+
+    "AcidSlime_S": _m((8, 12), {
+        "Tackle": mv("ATTACK", 3),
+        "Lick": mv("DEBUFF", weak=1),
+    }, cycle=["Lick", "Tackle"]),
+
+    "SpikeSlime_S": _m((10, 14), {
+        "Tackle": mv("ATTACK", 5),
+    }, cycle=["Tackle"]),
+
+    "Looter": _m((44, 48), {
+        "Mug": mv("ATTACK", 10),
+        "Lunge": mv("ATTACK", 12),
+        "Smoke Bomb": mv("DEFEND", block=6),
+        "Escape": mv("ESCAPE", escape=True),
+    }, opening=["Mug", "Mug", "Lunge", "Smoke Bomb"], cycle=["Escape"]),
+
+    "BlueSlaver": _m((46, 50), {
+        "Stab": mv("ATTACK", 12),
+        "Rake": mv("ATTACK_DEBUFF", 7, weak=1),
+    }, weights={"Stab": 60, "Rake": 40}),
+
+    # --- 地精家族 ---
+    "GremlinFat": _m((13, 17), {
+        "Smash": mv("ATTACK_DEBUFF", 4, weak=1),
+    }, cycle=["Smash"]),
+
+    "GremlinTsundere": _m((12, 15), {
+        "Protect": mv("DEFEND", block=7, ally_block=True),
+        "Shield Bash": mv("ATTACK", 6),
+    }, cycle=["Protect", "Protect", "Shield Bash"]),
+
+    "GremlinWarrior": _m((20, 24), {
+        "Scratch": mv("ATTACK", 4),
+    }, cycle=["Scratch"], powers={"Angry": 1}),
+
+    "GremlinThief": _m((10, 14), {
+        "Puncture": mv("ATTACK", 9),
+    }, cycle=["Puncture"]),
+
+    "GremlinWizard": _m((21, 25), {
+        "Charging": mv("UNKNOWN"),
+        "Ultimate Blast": mv("ATTACK", 25),
+    }, opening=["Charging", "Charging"], cycle=["Ultimate Blast", "Charging", "Charging", "Charging"]),
+
+    # --- 精英 ---
+    "GremlinNob": _m((82, 86), {
+        "Bellow": mv("BUFF", enrage=2),
+        "Rush": mv("ATTACK", 14),
+        "Skull Bash": mv("ATTACK_DEBUFF", 6, vuln=2),
+    }, opening=["Bellow"], cycle=["Skull Bash", "Rush", "Rush"]),
+
+    "Sentry": _m((38, 42), {
+        "Bolt": mv("DEBUFF", add=("Dazed", 2, "discard")),
+        "Beam": mv("ATTACK", 9),
+    }, cycle=["Bolt", "Beam"], powers={"Artifact": 1}),
+
+    "Lagavulin": _m((109, 111), {
+        "Sleep": mv("SLEEP"),
+        "Attack": mv("ATTACK", 18),
+        "Siphon Soul": mv("STRONG_DEBUFF", lose_str=1, lose_dex=1),
+    }, opening=["Sleep", "Sleep", "Sleep"], cycle=["Attack", "Attack", "Siphon Soul"],
+       powers={"Metallicize": 8, "Asleep": 1}),
+
+    # --- Boss ---
+    "TheGuardian": _m((240, 240), {
+        "Charging Up": mv("DEFEND", block=9),
+        "Fierce Bash": mv("ATTACK", 32),
+        "Vent Steam": mv("STRONG_DEBUFF", weak=2, vuln=2),
+        "Whirlwind": mv("ATTACK", 5, hits=4),
+    }, cycle=["Charging Up", "Fierce Bash", "Vent Steam", "Whirlwind"]),
+
+    "Hexaghost": _m((250, 250), {
+        "Activate": mv("UNKNOWN"),
+        "Divider": mv("ATTACK", 1, hits=6, special="divider"),
+        "Sear": mv("ATTACK_DEBUFF", 6, add=("Burn", 1, "discard")),
+        "Tackle": mv("ATTACK", 5, hits=2),
+        "Inflame": mv("DEFEND_BUFF", block=12, strength=2),
+        "Inferno": mv("ATTACK_DEBUFF", 2, hits=6, add=("Burn", 3, "discard")),
+    }, opening=["Activate", "Divider"], cycle=["Sear", "Tackle", "Sear", "Inflame", "Tackle", "Sear", "Inferno"]),
+
+    "SlimeBoss": _m((140, 140), {
+        "Goop Spray": mv("STRONG_DEBUFF", add=("Slimed", 3, "discard")),
+        "Preparing": mv("UNKNOWN"),
+        "Slam": mv("ATTACK", 35),
+    }, cycle=["Goop Spray", "Preparing", "Slam"], split=("AcidSlime_L", "SpikeSlime_L")),
+}
+
+# 遭遇表 (A0 第一幕)
+WEAK_ENCOUNTERS = [
+    ["Cultist"],
+    ["JawWorm"],
+    ["FuzzyLouseNormal", "FuzzyLouseDefensive"],
+    ["SpikeSlime_S", "AcidSlime_M"],
+    ["AcidSlime_S", "SpikeSlime_M"],
+]
+STRONG_ENCOUNTERS = [
+    ["GremlinFat", "GremlinWarrior", "GremlinThief", "GremlinTsundere"],
+    ["GremlinWizard", "GremlinWarrior", "GremlinFat"],
+    ["Looter"],
+    ["FungiBeast", "FungiBeast"],
+    ["BlueSlaver"],
+    ["AcidSlime_L"],
+    ["SpikeSlime_L"],
+    ["FuzzyLouseNormal", "FuzzyLouseDefensive", "FuzzyLouseNormal"],
+    ["JawWorm", "Cultist"],
+    ["SpikeSlime_S", "AcidSlime_S", "SpikeSlime_S", "AcidSlime_S", "SpikeSlime_S"],
+]
+ELITE_ENCOUNTERS = [
+    ["GremlinNob"],
+    ["Lagavulin"],
+    ["Sentry", "Sentry", "Sentry"],
+]
+BOSS_ENCOUNTERS = [
+    ["TheGuardian"],
+    ["Hexaghost"],
+    ["SlimeBoss"],
+]
@@ -0,0 +1,97 @@
+# vec_env.py
+"""
+[模拟器] BatchedCombat 的 SB3 VecEnv 包装
+N 场战斗共用一个 BatchedCombat，step 一次就是 N 个 env 各走一步，可以直接交给 MaskablePPO：
+
+    from sb3_contrib import MaskablePPO
+    from spire_env.sim.vec_env import BatchedSimVecEnv
+    env = BatchedSimVecEnv(256, seed=0)
+    model = MaskablePPO("MlpPolicy", env, n_steps=128)
+
+观察/动作空间和 SlayTheSpireEnv 完全一样，模型可以先在这里预训练，再换到真实游戏上接着练。
+打完一场 (胜/负/超回合) 自动重开，终局观察放在 info["terminal_observation"]。
+"""
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from spire_env.definitions import ObservationConfig, ActionConfig
+from .batched import BatchedCombat
+
+class BatchedSimVecEnv(VecEnv):
+    def __init__(self, num_envs, seed=None, **combat_kwargs):
+        """
+        :param combat_kwargs: 透传给 BatchedCombat (encounters / deck / extra_cards / hp_range / max_turns ...)
+        """
+        observation_space = spaces.Box(low=-5.0, high=1000.0, shape=(ObservationConfig.SIZE,), dtype=np.float32)
+        action_space = spaces.Discrete(ActionConfig.TOTAL_ACTIONS)
+        self.render_mode = None
+        super().__init__(num_envs, observation_space, action_space)
+        self.combat_kwargs = combat_kwargs
+        self.sim = BatchedCombat(num_envs, seed=seed, **combat_kwargs)
+        self._obs = np.empty((num_envs, ObservationConfig.SIZE), dtype=np.float32)
+        self._actions = None
+        self._ep_return = np.zeros(num_envs, dtype=np.float32)
+        self._ep_len = np.zeros(num_envs, dtype=np.int32)
+        self.stats = {"episodes": 0, "wins": 0}
+
+    # --- VecEnv 接口 ---
+    def reset(self):
+        seed = self._seeds[0] if self._seeds and self._seeds[0] is not None else None
+        if seed is not None:
+            self.sim = BatchedCombat(self.num_envs, seed=seed, **self.combat_kwargs)
+        else:
+            self.sim.reset_where(np.ones(self.num_envs, dtype=bool))
+        self._reset_seeds()
+        self._reset_options()
+        self._ep_return[:] = 0
+        self._ep_len[:] = 0
+        return self.sim.observe(self._obs).copy()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self):
+        rewards, terminated, truncated, won = self.sim.step(self._actions)
+        dones = terminated | truncated
+        self._ep_return += rewards
+        self._ep_len += 1
+        infos = [{} for _ in range(self.num_envs)]
+        if dones.any():
+            # 终局观察要在重开之前取
+            terminal = self.sim.observe()
+            for i in np.flatnonzero(dones):
+                infos[i]["terminal_observation"] = terminal[i]
+                infos[i]["TimeLimit.truncated"] = bool(truncated[i] and not terminated[i])
+                infos[i]["episode"] = {"r": float(self._ep_return[i]), "l": int(self._ep_len[i])}
+                infos[i]["is_success"] = bool(won[i])
+            self.stats["episodes"] += int(dones.sum())
+            self.stats["wins"] += int((dones & won).sum())
+            self._ep_return[dones] = 0
+            self._ep_len[dones] = 0
+            self.sim.reset_where(dones)
+        obs = self.sim.observe(self._obs).copy()
+        return obs, rewards, dones, infos
+
+    def action_masks(self):
+        """(N, 67) 合法动作掩码 (MaskablePPO 通过 env_method("action_masks") 取)"""
+        return self.sim.action_masks()
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        idx = list(self._get_indices(indices))
+        if method_name == "action_masks":
+            return list(self.action_masks()[idx])
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in idx]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -0,0 +1,159 @@
+# state.py
+"""
+GameState：CommunicationMod 一条状态的紧凑视图，每收到一行只建一次 (Connection 的解码线程里)
+只保留本项目用到的字段，常用的派生值 (活着的怪、已装药水的槽、手牌 id...) 建的时候一次算好，
+编码器 / 动作掩码 / 奖励 / 战斗等待 / 导航都直接读属性，不再各自沿着原始 dict 一路 .get 下去。
+卡牌、怪物、遗物、地图等列表仍是原始 dict 的引用 (不拷贝)；牌库等用不到的部分不保留，
+所以 env 里存的上一步状态也小得多。
+
+    view = GameState.parse(raw)   # 原始 dict -> 视图
+    view = as_state(state)        # dict / GameState / None 都接受 (给仍然传 dict 的调用方用)
+"""
+
+_EMPTY = ()
+_EMPTY_DICT = {}
+
+class GameState:
+    __slots__ = (
+        # 顶层
+        'commands',       # available_commands 原样 (有序，打日志/比较用)
+        'command_set',    # 同上的 frozenset，成员判断用
+        'error',          # 游戏回的 error 文本 (指令被拒绝)，否则 None
+        'in_game',        # 是否带 game_state
+        'ready',          # ready_for_command (游戏在等指令，动作队列已空)；没有这个字段时视为 True
+        # game_state
+        'screen',         # screen_type (没有 game_state 时为 None)
+        'screen_key',     # 编码用的屏幕：能 play/end 时视为 'COMBAT'
+        'phase',          # room_phase
+        'floor', 'gold', 'act',
+        'seed',           # 本局种子 (地图规划按它 + act 缓存)
+        'hp', 'max_hp',   # 战斗中取 player 的，否则取 game_state 顶层的
+        'relics', 'choices',
+        'event',          # 事件界面的 event_id (没有时取 event_name)，否则 None
+        'map',            # 本幕地图节点列表 (原样)
+        'next_nodes',     # 地图界面可走的下一个节点 (与 choice_list 中的坐标选项同序)
+        'potions',        # 药水槽 dict 列表 (含空槽 'Potion Slot')
+        'potion_names',   # 各槽的 name
+        'filled_potions', # 已装药水的槽数
+        # combat_state
+        'in_combat',
+        'turn',
+        'player',         # player dict (不在战斗中为 {})
+        'energy',
+        'powers',
+        'entangled',      # 是否被缠身 (不能打攻击牌)
+        'hand', 'hand_ids',
+        'monsters',
+        'targets',        # 可以被选为目标的怪物下标 (前 5 只里 not is_gone and not half_dead)
+        'alive_count',    # not is_gone 的怪物数
+        'monster_hp',     # not is_gone 的怪物血量和
+        'monster_ids',    # not is_gone 的怪物 id (排好序，遭遇指纹用)
+        'intents',        # not is_gone 的怪物意图 (按位置)
+        'draw_pile', 'discard_pile', 'exhaust_pile',
+    )
+
+    @classmethod
+    def parse(cls, raw):
+        """原始状态 dict -> GameState"""
+        self = cls.__new__(cls)
+        cmds = raw.get('available_commands') or _EMPTY
+        self.commands = cmds
+        self.command_set = frozenset(cmds)
+        self.error = raw.get('error')
+        self.ready = raw.get('ready_for_command', True)
+
+        game = raw.get('game_state')
+        self.in_game = game is not None
+        if game is None:
+            game = _EMPTY_DICT
+        screen = game.get('screen_type')
+        self.screen = screen
+        self.screen_key = 'COMBAT' if ('play' in self.command_set or 'end' in self.command_set) else (screen or 'NONE')
+        self.phase = game.get('room_phase', '')
+        self.floor = game.get('floor', 0)
+        self.gold = game.get('gold', 0)
+        self.act = game.get('act', 0)
+        self.seed = game.get('seed')
+        self.map = game.get('map') or _EMPTY
+        self.relics = game.get('relics') or _EMPTY
+        self.choices = game.get('choice_list') or _EMPTY
+        screen_state = game.get('screen_state') or _EMPTY_DICT
+        self.event = screen_state.get('event_id') or screen_state.get('event_name')
+        self.next_nodes = screen_state.get('next_nodes') or _EMPTY
+
+        combat = game.get('combat_state')
+        self.in_combat = combat is not None
+        if combat is None:
+            combat = _EMPTY_DICT
+
+        potions = game.get('potions') or combat.get('potions') or _EMPTY
+        self.potions = potions
+        self.potion_names = tuple([p.get('name', 'N/A') for p in potions])
+        self.filled_potions = sum(1 for p in potions if p.get('id') != 'Potion Slot')
+
+        player = combat.get('player') or _EMPTY_DICT
+        self.player = player
+        self.turn = combat.get('turn', 0)
+        if player:
+            self.hp = player.get('current_hp', 0)
+            self.max_hp = player.get('max_hp', 0)
+        else:
+            self.hp = game.get('current_hp', 0)
+            self.max_hp = game.get('max_hp', 0)
+        self.energy = player.get('energy', 0)
+        powers = player.get('powers') or _EMPTY
+        self.powers = powers
+        self.entangled = any(p.get('id') == 'Entangled' for p in powers)
+
+        hand = combat.get('hand') or _EMPTY
+        self.hand = hand
+        self.hand_ids = tuple([c.get('id', '') for c in hand])
+
+        monsters = combat.get('monsters') or _EMPTY
+        self.monsters = monsters
+        targets = []
+        alive_ids = []
+        intents = []
+        hp_sum = 0
+        for i, m in enumerate(monsters):
+            if m.get('is_gone'):
+                continue
+            alive_ids.append(m.get('id', 'Unknown'))
+            intents.append(m.get('intent'))
+            hp_sum += m.get('current_hp', 0)
+            if i < 5 and not m.get('half_dead'):
+                targets.append(i)
+        self.targets = tuple(targets)
+        self.alive_count = len(alive_ids)
+        self.monster_hp = hp_sum
+        alive_ids.sort()
+        self.monster_ids = tuple(alive_ids)
+        self.intents = tuple(intents)
+
+        self.draw_pile = combat.get('draw_pile') or _EMPTY
+        self.discard_pile = combat.get('discard_pile') or _EMPTY
+        self.exhaust_pile = combat.get('exhaust_pile') or _EMPTY
+        return self
+
+    def has(self, *cmds):
+        """available_commands 里是否有其中任意一个"""
+        s = self.command_set
+        for c in cmds:
+            if c in s:
+                return True
+        return False
+
+    @property
+    def can_act(self):
+        """轮到我方出手 (能 play 或 end)"""
+        return 'play' in self.command_set or 'end' in self.command_set
+
+    def __repr__(self):
+        return (f"GameState(screen={self.screen}, floor={self.floor}, turn={self.turn}, "
+                f"hp={self.hp}/{self.max_hp}, hand={len(self.hand)}, monsters={self.alive_count})")
+
+def as_state(state):
+    """dict / GameState / None -> GameState / None"""
+    if state is None or isinstance(state, GameState):
+        return state
+    return GameState.parse(state)
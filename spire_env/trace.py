@@ -0,0 +1,225 @@
+# trace.py
+"""
+CommunicationMod 原始数据流录制 / 读取
+把每一条收到的状态行和每一条发出的指令，连同单调时钟时间戳，写进一个只追加的压缩 trace 文件。
+
+文件格式 (全部小端):
+    文件头:  b"SPTR" + 版本号(1B)
+    若干块:  块头 <4sIIqq> = b"CHNK", 压缩后长度, 记录条数, 首条时间戳ns, 末条时间戳ns
+             + zlib 压缩的记录流
+    记录:    <BqI> = 方向(0=收到 1=发出), 时间戳ns, 数据长度 + 数据(bytes)
+块之间互相独立，可以边写边读 (流式)，也可以只扫块头建索引后按时间 seek。
+进程崩溃时最后一个没写完的块会被读取端忽略。
+"""
+import os
+import sys
+import time
+import zlib
+import atexit
+import struct
+import threading
+import collections
+
+MAGIC = b"SPTR"
+VERSION = 1
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sIIqq")
+RECORD_HEADER = struct.Struct("<BqI")
+
+RECV = 0
+SEND = 1
+
+TraceRecord = collections.namedtuple("TraceRecord", ["direction", "t_ns", "data"])
+
+class TraceRecorder:
+    def __init__(self, path, chunk_records=512, chunk_interval=1.0, max_pending=20000, level=6):
+        """
+        :param chunk_records: 攒够多少条记录压缩成一块
+        :param chunk_interval: 最多攒多少秒就强制落一块 (保证崩溃时丢得不多)
+        :param max_pending: 待写队列上限，写盘跟不上时丢弃最老的记录 (计入 dropped)，绝不阻塞主线程
+        :param level: zlib 压缩级别
+        """
+        self.path = path
+        self.chunk_records = chunk_records
+        self.chunk_interval = chunk_interval
+        self.level = level
+        self.recorded = 0
+        self.dropped = 0
+        self.chunks = 0
+        
+        self._queue = collections.deque(maxlen=max_pending)
+        self._wakeup = threading.Event()
+        self._stopped = False
+        
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab")
+        if new_file:
+            self._file.write(MAGIC + bytes([VERSION]))
+            self._file.flush()
+        
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, direction, data):
+        """[任意线程调用] 只打时间戳并入队"""
+        if self._stopped:
+            return
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append((direction, time.monotonic_ns(), data))
+        if len(self._queue) >= self.chunk_records:
+            self._wakeup.set()
+
+    def record_recv(self, line):
+        self.record(RECV, line.rstrip(b"\n") if isinstance(line, bytes) else line.rstrip("\n"))
+
+    def record_send(self, cmd):
+        self.record(SEND, cmd)
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.chunk_interval)
+            self._wakeup.clear()
+            self._write_chunks()
+        self._write_chunks()
+
+    def _write_chunks(self):
+        while self._queue:
+            n = min(len(self._queue), self.chunk_records)
+            records = [self._queue.popleft() for _ in range(n)]
+            parts = []
+            for direction, t_ns, data in records:
+                parts.append(RECORD_HEADER.pack(direction, t_ns, len(data)))
+                parts.append(data)
+            payload = zlib.compress(b"".join(parts), self.level)
+            header = CHUNK_HEADER.pack(CHUNK_MAGIC, len(payload), n, records[0][1], records[-1][1])
+            try:
+                self._file.write(header + payload)
+                self._file.flush()
+            except Exception:
+                return
+            self.recorded += n
+            self.chunks += 1
+
+    def close(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join(timeout=5.0)
+        try:
+            self._file.close()
+        except Exception:
+            pass
+
+class TraceReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(len(MAGIC) + 1)
+        if head[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"不是 trace 文件: {path}")
+        self.version = head[len(MAGIC)]
+
+    def index(self):
+        """只扫块头，返回 [(文件偏移, 记录条数, 首条ns, 末条ns), ...]"""
+        entries = []
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            f.seek(len(MAGIC) + 1)
+            while True:
+                offset = f.tell()
+                head = f.read(CHUNK_HEADER.size)
+                if len(head) < CHUNK_HEADER.size:
+                    break
+                magic, comp_len, n, t_first, t_last = CHUNK_HEADER.unpack(head)
+                if magic != CHUNK_MAGIC:
+                    break
+                f.seek(comp_len, os.SEEK_CUR)
+                if f.tell() > size: # 最后一块没写完
+                    break
+                entries.append((offset, n, t_first, t_last))
+        return entries
+
+    def _read_chunk(self, f):
+        head = f.read(CHUNK_HEADER.size)
+        if len(head) < CHUNK_HEADER.size:
+            return None
+        magic, comp_len, n, _, _ = CHUNK_HEADER.unpack(head)
+        if magic != CHUNK_MAGIC:
+            return None
+        payload = f.read(comp_len)
+        if len(payload) < comp_len:
+            return None
+        try:
+            raw = zlib.decompress(payload)
+        except zlib.error:
+            return None
+        records = []
+        pos = 0
+        for _ in range(n):
+            direction, t_ns, length = RECORD_HEADER.unpack_from(raw, pos)
+            pos += RECORD_HEADER.size
+            records.append(TraceRecord(direction, t_ns, raw[pos:pos + length]))
+            pos += length
+        return records
+
+    def records(self, start_ns=None):
+        """
+        按顺序逐条产出 TraceRecord。
+        :param start_ns: 从这个时间戳开始 (借助块索引直接 seek，跳过前面的块)
+        """
+        offset = len(MAGIC) + 1
+        if start_ns is not None:
+            for chunk_offset, _, _, t_last in self.index():
+                offset = chunk_offset
+                if t_last >= start_ns:
+                    break
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                records = self._read_chunk(f)
+                if records is None:
+                    return
+                for r in records:
+                    if start_ns is None or r.t_ns >= start_ns:
+                        yield r
+
+def summarize(path):
+    """统计条数，以及 指令 -> 下一条状态 的延迟 (按指令类型)"""
+    counts = {RECV: 0, SEND: 0}
+    latencies = collections.defaultdict(list)
+    pending = collections.deque()
+    for r in TraceReader(path).records():
+        counts[r.direction] += 1
+        if r.direction == SEND:
+            pending.append(r)
+        elif pending:
+            cmd = pending.popleft()
+            kind = cmd.data.split(b" ", 1)[0].decode('utf-8', 'replace')
+            latencies[kind].append((r.t_ns - cmd.t_ns) / 1e6)
+    return counts, latencies
+
+def main(argv):
+    if len(argv) < 2:
+        print("用法: python -m spire_env.trace <trace文件> [dump]")
+        return
+    path = argv[1]
+    if len(argv) > 2 and argv[2] == "dump":
+        for r in TraceReader(path).records():
+            tag = "<<" if r.direction == RECV else ">>"
+            print(f"{r.t_ns / 1e9:.6f} {tag} {r.data[:200].decode('utf-8', 'replace')}")
+        return
+    counts, latencies = summarize(path)
+    print(f"收到 {counts[RECV]} 条, 发出 {counts[SEND]} 条, 共 {len(TraceReader(path).index())} 块")
+    for kind, vals in sorted(latencies.items()):
+        vals.sort()
+        p50 = vals[len(vals) // 2]
+        p95 = vals[min(len(vals) - 1, int(len(vals) * 0.95))]
+        print(f"  {kind:<10} n={len(vals):<6} p50={p50:8.1f}ms p95={p95:8.1f}ms")
+
+if __name__ == '__main__':
+    main(sys.argv)
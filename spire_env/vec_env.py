@@ -0,0 +1,82 @@
+# vec_env.py
+"""
+多个 SlayTheSpireEnv 组成的 SB3 VecEnv
+每个子 env 的 step/reset 大部分时间都在等游戏响应 (不占 GIL)，
+所以用线程池让它们并发执行：N 个游戏实例 ≈ N 倍采样速度。
+子 env 之间互不影响，各自的 Connection 连着各自的游戏 (见 broker.py)。
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+def stack_obs(obs_list):
+    """把 N 个单步观察叠成一批；Dict 观察 (obs_mode="tokens") 按 key 分别叠"""
+    if isinstance(obs_list[0], dict):
+        return {key: np.stack([o[key] for o in obs_list]) for key in obs_list[0]}
+    return np.stack(obs_list)
+
+class SpireVecEnv(VecEnv):
+    def __init__(self, envs):
+        self.envs = list(envs)
+        self.render_mode = None
+        super().__init__(len(self.envs), self.envs[0].observation_space, self.envs[0].action_space)
+        self.pool = ThreadPoolExecutor(max_workers=len(self.envs), thread_name_prefix="spire-env")
+        self._futures = None
+
+    # --- 单个子 env 的一步 (在线程池里跑) ---
+    @staticmethod
+    def _step_one(env, action):
+        obs, reward, done, truncated, info = env.step(action)
+        info = dict(info)
+        if done or truncated:
+            info["terminal_observation"] = obs
+            info["TimeLimit.truncated"] = bool(truncated and not done)
+            obs, _ = env.reset()
+        return obs, reward, done or truncated, info
+
+    # --- VecEnv 接口 ---
+    def reset(self):
+        seeds = self._seeds or [None] * self.num_envs
+        futures = [self.pool.submit(env.reset, seed=seed) for env, seed in zip(self.envs, seeds)]
+        obs = [f.result()[0] for f in futures]
+        self._reset_seeds()
+        self._reset_options()
+        return stack_obs(obs)
+
+    def step_async(self, actions):
+        self._futures = [self.pool.submit(self._step_one, env, int(a)) for env, a in zip(self.envs, actions)]
+
+    def step_wait(self):
+        results = [f.result() for f in self._futures]
+        self._futures = None
+        obs, rewards, dones, infos = zip(*results)
+        return stack_obs(obs), np.array(rewards, dtype=np.float32), np.array(dones, dtype=bool), list(infos)
+
+    def action_masks(self):
+        """(N, 67) 每个子 env 当前的合法动作掩码"""
+        return np.array([env.action_masks() for env in self.envs], dtype=bool)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        for env in self.envs:
+            try:
+                env.conn.close()
+            except Exception:
+                pass
+        broker = getattr(self, "broker", None)
+        if broker is not None:
+            broker.close()
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.envs[i], attr_name) for i in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        for i in self._get_indices(indices):
+            setattr(self.envs[i], attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [getattr(self.envs[i], method_name)(*method_args, **method_kwargs) for i in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [isinstance(self.envs[i], wrapper_class) for i in self._get_indices(indices)]
@@ -0,0 +1,113 @@
+import copy
+
+from spire_env.diff import diff
+from spire_env.state import GameState
+
+SLOT = {"id": "Potion Slot", "name": "Potion Slot", "can_use": False}
+FIRE = {"id": "Fire Potion", "name": "Fire Potion", "can_use": True, "requires_target": True}
+
+def _card(cid):
+    return {"id": cid, "name": cid, "cost": 1, "type": "ATTACK", "is_playable": True}
+
+def _monster(hp, gone=False):
+    return {"id": "JawWorm", "name": "Jaw Worm", "current_hp": hp, "max_hp": 44, "block": 0,
+            "intent": "ATTACK", "is_gone": gone, "powers": []}
+
+def _combat(hp=80, block=0, energy=3, hand=("Strike_R", "Defend_R"), monsters=(40,), gone=(), turn=1,
+            powers=(), potions=(FIRE, SLOT, SLOT), gold=99, floor=1, screen="NONE", cmds=("play", "end", "state")):
+    return {
+        "available_commands": list(cmds), "ready_for_command": True, "in_game": True,
+        "game_state": {
+            "screen_type": screen, "room_phase": "COMBAT", "floor": floor, "gold": gold,
+            "current_hp": hp, "max_hp": 80, "potions": [dict(p) for p in potions],
+            "combat_state": {
+                "turn": turn,
+                "player": {"current_hp": hp, "max_hp": 80, "block": block, "energy": energy,
+                           "powers": [{"id": p, "name": p, "amount": 1} for p in powers]},
+                "hand": [_card(c) for c in hand],
+                "monsters": [_monster(h, gone=i in gone) for i, h in enumerate(monsters)],
+            },
+        },
+    }
+
+def _screen(screen, hp=80, gold=99, floor=1):
+    return {"available_commands": ["proceed", "state"], "in_game": True, "game_state": {
+        "screen_type": screen, "floor": floor, "gold": gold, "current_hp": hp, "max_hp": 80,
+        "potions": [dict(FIRE), dict(SLOT), dict(SLOT)]}}
+
+def test_identical_states_give_empty_delta():
+    raw = _combat()
+    for prev, curr in ((raw, raw), (raw, copy.deepcopy(raw)), (GameState.parse(raw), GameState.parse(raw))):
+        d = diff(prev, curr)
+        assert d.summary() == "无变化"
+        assert (d.hp_delta, d.hp_loss, d.damage_dealt, d.monsters_died, d.potions_used) == (0, 0, 0, 0, 0)
+        assert (d.floor_delta, d.gold_delta) == (0, 0)
+        assert d.potion_slots == ()
+        assert d.cards_moved() == ([], [])
+        assert not (d.screen_changed or d.combat_over or d.card_played or d.new_turn)
+        assert d.both_combat
+
+def test_identical_copies_have_no_sections():
+    raw = _combat()
+    assert diff(raw, copy.deepcopy(raw)).sections == frozenset()
+
+def test_cards_added_and_removed():
+    d = diff(_combat(hand=("Strike_R", "Strike_R", "Defend_R")), _combat(hand=("Strike_R", "Bash", "Anger")))
+    added, removed = d.cards_moved()
+    assert sorted(added) == ["Anger", "Bash"]
+    assert sorted(removed) == ["Defend_R", "Strike_R"]
+    assert d.hand_changed and d.card_played
+    assert "hand" in d.sections
+
+def test_reordered_hand_is_not_a_change():
+    d = diff(_combat(hand=("Strike_R", "Defend_R")), _combat(hand=("Defend_R", "Strike_R")))
+    assert not d.hand_changed
+    assert d.cards_moved() == ([], [])
+
+def test_hp_loss_and_gain():
+    d = diff(_combat(hp=50), _combat(hp=38))
+    assert d.hp_delta == -12 and d.hp_loss == 12
+    assert "HP -12" in d.summary()
+    d = diff(_combat(hp=38), _combat(hp=44))
+    assert d.hp_delta == 6 and d.hp_loss == 0
+
+def test_block_change_only_touches_player_section():
+    d = diff(_combat(block=0), _combat(block=8))
+    assert d.hp_delta == 0
+    assert d.sections == frozenset({"player"})
+    assert d.summary() == "无变化"
+
+def test_damage_and_kills():
+    d = diff(_combat(monsters=(20, 15)), _combat(monsters=(12, 0), gone=(1,)))
+    assert d.damage_dealt == 8 + 15
+    assert d.monsters_died == 1
+    assert {"monster0", "monster1"} <= d.sections
+    assert "伤害 23" in d.summary() and "击杀 1" in d.summary()
+
+def test_potion_used():
+    d = diff(_combat(potions=(FIRE, FIRE, SLOT)), _combat(potions=(FIRE, SLOT, SLOT)))
+    assert d.potion_slots == (1,)
+    assert d.potions_used == 1
+    assert d.potion_used(1) and not d.potion_used(0)
+
+def test_card_played_on_energy_change():
+    d = diff(_combat(energy=3), _combat(energy=2))
+    assert d.energy_changed and d.card_played
+
+def test_new_turn_needs_turn_advance_and_can_act():
+    assert diff(_combat(turn=1), _combat(turn=2)).new_turn
+    # 回合数变了但还不能出手 (敌方回合动画)
+    assert not diff(_combat(turn=1), _combat(turn=2, cmds=("state",))).new_turn
+
+def test_combat_over_screens():
+    d = diff(_combat(hp=30, gold=99), _screen("COMBAT_REWARD", hp=30, gold=99))
+    assert d.combat_over and d.screen_changed and d.screen_left
+    assert d.card_played and d.new_turn and d.potion_used(0)
+    assert not d.both_combat
+    assert "屏幕 NONE->COMBAT_REWARD" in d.summary()
+
+def test_floor_and_gold():
+    d = diff(_screen("MAP", gold=99, floor=3), _screen("MAP", gold=124, floor=4))
+    assert (d.floor_delta, d.gold_delta) == (1, 25)
+    assert "global" in d.sections
+    assert d.summary() == "楼层 +1 | 金币 +25"
@@ -0,0 +1,127 @@
+import time
+
+from spire_env.mock_server import connect_mock
+
+class EchoGame:
+    """每条指令回一条状态：floor = 第几条指令，choice_list = [指令本身]"""
+    def __init__(self):
+        self.count = 0
+
+    def handle(self, cmd):
+        self.count += 1
+        return {"available_commands": ["state"], "ready_for_command": True, "in_game": True,
+                "game_state": {"screen_type": "NONE", "floor": self.count, "choice_list": [cmd.strip()]}}
+
+def _connect(**kwargs):
+    return connect_mock(EchoGame(), log_filename="test_interface.txt", **kwargs)
+
+def _wait_until(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.005)
+
+def test_responses_are_tagged_in_order():
+    conn = _connect()
+    try:
+        tickets = [conn.send_command(f"cmd{i}") for i in range(5)]
+        assert tickets == sorted(tickets)
+        for i, ticket in enumerate(tickets):
+            state = conn.wait_for_state(timeout=2.0)
+            assert (conn.consumed_ticket, conn.consumed_command) == (ticket, f"cmd{i}")
+            assert state.choices == [f"cmd{i}"]
+        assert conn.latest_pending_ticket() is None
+    finally:
+        conn.close()
+
+def test_wait_for_response_skips_older_replies():
+    conn = _connect()
+    try:
+        conn.send_command("old")
+        ticket = conn.send_command("new")
+        state = conn.wait_for_response(ticket, timeout=2.0)
+        assert state.choices == ["new"] and conn.consumed_ticket == ticket
+    finally:
+        conn.close()
+
+def test_expired_response_does_not_shift_later_tickets():
+    conn = _connect()
+    conn.response_timeout = 0.1
+    try:
+        # 空指令替身不回应 (和游戏吞掉一条指令一样)：它的登记只能靠超时清掉
+        lost = conn.send_command(" ")
+        assert conn.latest_pending_ticket() == lost
+        time.sleep(0.2)
+        a, b = conn.send_command("a"), conn.send_command("b")
+        assert conn.wait_for_response(a, timeout=2.0).choices == ["a"]
+        assert conn.consumed_ticket == a
+        assert conn.wait_for_response(b, timeout=2.0).choices == ["b"]
+        assert conn.consumed_ticket == b
+        assert conn.lost_responses == 1
+    finally:
+        conn.close()
+
+def test_failed_send_leaves_nothing_pending():
+    conn = _connect()
+    try:
+        first = conn.send_command("first")
+        conn.wait_for_response(first, timeout=2.0)
+        conn._out.close()
+        assert conn.send_command("broken") is None
+        assert conn.latest_pending_ticket() is None
+    finally:
+        conn.close()
+
+def test_mailbox_drops_superseded_lines():
+    conn = _connect(mailbox=True)
+    try:
+        for i in range(3):
+            conn.send_command(f"cmd{i}")
+        _wait_until(lambda: conn.state_seq == 3)
+        state = conn.wait_for_state(timeout=2.0)
+        assert state.choices == ["cmd2"]
+        assert conn.dropped_states == 2
+        assert conn.receive_state() is None
+    finally:
+        conn.close()
+
+def test_queue_mode_keeps_every_line():
+    conn = _connect()
+    try:
+        for i in range(3):
+            conn.send_command(f"cmd{i}")
+        _wait_until(lambda: conn.state_seq == 3)
+        assert [conn.wait_for_state(timeout=2.0).choices[0] for _ in range(3)] == ["cmd0", "cmd1", "cmd2"]
+        assert conn.dropped_states == 0
+    finally:
+        conn.close()
+
+def test_request_state_dedupes_while_in_flight():
+    conn = _connect(latency_by_command={"slow": 0.2}, max_state_rate=2.0)
+    try:
+        ticket = conn.send_command("slow")
+        assert conn.request_state() == ticket
+        assert conn.request_state(wait=False) == ticket
+        assert conn.state_stats()["deduped"] == 2 and conn.state_stats()["sent"] == 0
+        conn.wait_for_response(ticket, timeout=2.0)
+        assert conn.mock_server.commands == 1
+
+        # 没有在路上的指令了：真的发一条，紧接着的第二条超出频率预算 (2 次/秒)
+        sent = conn.request_state()
+        assert sent is not None and sent != ticket
+        conn.wait_for_response(sent, timeout=2.0)
+        assert conn.request_state(wait=False) is None
+        assert conn.state_stats()["sent"] == 1 and conn.state_stats()["throttled"] == 1
+    finally:
+        conn.close()
+
+def test_closed_on_eof():
+    conn = _connect()
+    try:
+        conn.send_command("last")
+        conn._out.close() # 替身读到 EOF 后关掉状态管道
+        assert conn.wait_for_state(timeout=2.0).choices == ["last"]
+        assert conn.wait_for_state(timeout=2.0) is None
+        assert conn.closed
+    finally:
+        conn.close()
@@ -0,0 +1,73 @@
+import random
+
+from spire_env.state import GameState
+from spire_env.logic.map_planner import MapPlanner
+
+def _node(x, y, symbol, children=()):
+    return {"x": x, "y": y, "symbol": symbol, "children": [{"x": cx, "y": cy} for cx, cy in children], "parents": []}
+
+def _map_state(nodes, next_xy, hp=80, max_hp=80, act=1, seed=7):
+    at = {(n["x"], n["y"]): n for n in nodes}
+    nexts = [at[xy] for xy in next_xy]
+    return GameState.parse({"available_commands": ["choose", "state"], "game_state": {
+        "screen_type": "MAP", "act": act, "seed": seed, "current_hp": hp, "max_hp": max_hp, "map": nodes,
+        "choice_list": [f"x={n['x']}" for n in nexts], "screen_state": {"next_nodes": nexts}}})
+
+def _two_columns():
+    # 第 0 列 R -> E -> E，第 1 列 M -> M -> M
+    return [
+        _node(0, 0, 'R', [(0, 1)]), _node(0, 1, 'E', [(0, 2)]), _node(0, 2, 'E'),
+        _node(1, 0, 'M', [(1, 1)]), _node(1, 1, 'M', [(1, 2)]), _node(1, 2, 'M'),
+    ]
+
+def test_negative_paths_are_not_clamped():
+    nodes = _two_columns()
+    planner = MapPlanner()
+    low = _map_state(nodes, [(0, 0), (1, 0)], hp=20)
+    plan = planner._plan(low, True)
+    # 低血量表：R=4, E=-3, M=0.3
+    assert plan[(0, 0)] == 4.0 - 3.0 - 3.0
+    assert abs(plan[(1, 0)] - 0.9) < 1e-9
+    assert planner.choose(low) == 1
+
+def test_hp_band_switches_route():
+    nodes = _two_columns()
+    planner = MapPlanner()
+    # 满血：R + 两个精英 (1.5 + 2.5 + 2.5) 比三个普通怪好
+    assert planner.choose(_map_state(nodes, [(0, 0), (1, 0)], hp=80)) == 0
+    assert planner.choose(_map_state(nodes, [(0, 0), (1, 0)], hp=20)) == 1
+
+def test_all_negative_children_pick_least_bad():
+    # 两条路都只能撞精英：取负得少的那条，而不是把两条都当成 0
+    nodes = [
+        _node(0, 0, 'M', [(0, 1)]), _node(0, 1, 'E', [(0, 2)]), _node(0, 2, 'E'),
+        _node(1, 0, 'M', [(1, 1)]), _node(1, 1, 'E', [(1, 2)]), _node(1, 2, 'R'),
+    ]
+    planner = MapPlanner()
+    assert planner.choose(_map_state(nodes, [(0, 0), (1, 0)], hp=10)) == 1
+
+def test_dp_matches_brute_force_with_negative_values():
+    rng = random.Random(0)
+    nodes = [_node(x, y, rng.choice("MME?R$T")) for y in range(8) for x in range(5)]
+    at = {(n["x"], n["y"]): n for n in nodes}
+    for n in nodes:
+        if n["y"] < 7:
+            for dx in (-1, 0, 1):
+                if (n["x"] + dx, n["y"] + 1) in at and rng.random() < 0.5:
+                    n["children"].append({"x": n["x"] + dx, "y": n["y"] + 1})
+    planner = MapPlanner()
+    values = planner.low_values
+    assert min(values.values()) < 0
+
+    def brute(n):
+        kids = [brute(at[(c["x"], c["y"])]) for c in n["children"]]
+        return values.get(n["symbol"], 0.0) + (max(kids) if kids else 0.0)
+
+    plan = planner._build(nodes, values)
+    for n in nodes:
+        assert abs(plan[(n["x"], n["y"])] - brute(n)) < 1e-9
+
+def test_no_map_returns_none():
+    state = GameState.parse({"available_commands": ["choose"], "game_state": {
+        "screen_type": "MAP", "choice_list": ["x=0"], "screen_state": {}}})
+    assert MapPlanner().choose(state) is None
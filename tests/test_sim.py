@@ -0,0 +1,60 @@
+import math
+import random
+
+import numpy as np
+
+from spire_env.definitions import ActionConfig, ObservationConfig
+from spire_env.logic.reward import calculate_reward
+from spire_env.sim.combat import SimGame
+from utils.action_mapper import ActionMapper
+from utils.state_encoder import encode_state
+
+def _run(seed, steps):
+    """SimGame 随机对局：每步从掩码里随机挑一个合法动作，产出 (上一个状态, 命令, 回复)"""
+    rng = random.Random(seed)
+    mapper = ActionMapper()
+    game = SimGame(seed=seed)
+    state = game.handle("start")
+    for _ in range(steps):
+        valid = [i for i, ok in enumerate(mapper.get_mask(state)) if ok]
+        assert valid, f"没有合法动作: {state}"
+        cmd = mapper.decode_action(rng.choice(valid), state)
+        reply = game.handle(cmd or "state")
+        yield state, cmd, reply
+        if "error" not in reply:
+            state = reply
+
+def test_observation_shape_and_finite():
+    for state, _, _ in _run(0, 1500):
+        obs = encode_state(state)
+        assert obs.shape == (ObservationConfig.SIZE,)
+        assert obs.dtype == np.float32
+        assert np.isfinite(obs).all()
+
+def test_mask_always_has_a_valid_action():
+    for state, _, _ in _run(1, 1500):
+        mask = ActionMapper().get_mask(state)
+        assert len(mask) == ActionConfig.TOTAL_ACTIONS
+        assert any(mask)
+
+def test_masked_actions_are_accepted():
+    errors = []
+    for state, cmd, reply in _run(2, 1500):
+        assert cmd is not None, f"掩码放行的动作解码不出命令: {state}"
+        if "error" in reply:
+            errors.append((state.get("game_state", {}).get("screen_type"), cmd, reply["error"]))
+    # 唯一允许的拒绝：药水栏满了还去领药水 (真游戏也会拒绝，掩码看不到药水栏)
+    assert all(screen == "COMBAT_REWARD" and err == "Potion slots are full" for screen, _, err in errors), errors
+
+def test_reward_is_finite():
+    for state, _, reply in _run(3, 1500):
+        if "error" in reply:
+            continue
+        r = calculate_reward(state, reply)
+        assert isinstance(r, float) and math.isfinite(r)
+
+def test_hp_stays_in_range():
+    for state, _, _ in _run(4, 1500):
+        gs = state.get("game_state")
+        if gs:
+            assert 0 <= gs["current_hp"] <= gs["max_hp"]
@@ -0,0 +1,47 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from spire_env.definitions import ObservationConfig
+from spire_env.state import GameState
+from utils.state_encoder import encode_state, encode_states, encode_tokens, tokens_to_dense, IncrementalEncoder
+
+# 每条: 录下来的状态 (SimGame 各界面 / BatchedCombat.state_dict / 后期大牌堆) + 改写前的编码器 (b972c41~1) 输出的非零项
+with open(os.path.join(os.path.dirname(__file__), "data", "encoder_golden.json"), encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+def _expected(case):
+    obs = np.zeros(ObservationConfig.SIZE, dtype=np.float32)
+    for i, v in case["nonzero"]:
+        obs[i] = v
+    return obs
+
+@pytest.mark.parametrize("case", GOLDEN, ids=[c["name"] for c in GOLDEN])
+def test_encode_state_matches_golden(case):
+    np.testing.assert_array_equal(encode_state(case["state"]), _expected(case))
+    # 建好的视图和原始 dict 编码结果一样
+    np.testing.assert_array_equal(encode_state(GameState.parse(case["state"])), _expected(case))
+
+def test_encode_state_reuses_out():
+    out = np.full(ObservationConfig.SIZE, 7.0, dtype=np.float32)
+    for case in GOLDEN:
+        assert encode_state(case["state"], out=out) is out
+        np.testing.assert_array_equal(out, _expected(case))
+
+def test_encode_states_matches_per_state():
+    states = [c["state"] for c in GOLDEN] + [None, {"available_commands": ["start"]}]
+    expected = np.stack([encode_state(s) for s in states])
+    np.testing.assert_array_equal(encode_states(states), expected)
+    np.testing.assert_array_equal(expected[:len(GOLDEN)], np.stack([_expected(c) for c in GOLDEN]))
+    assert not expected[len(GOLDEN):].any()
+
+def test_incremental_encoder_matches_golden():
+    enc = IncrementalEncoder()
+    for case in GOLDEN + GOLDEN[::-1]:
+        np.testing.assert_array_equal(enc.encode(case["state"]), _expected(case))
+
+@pytest.mark.parametrize("case", GOLDEN, ids=[c["name"] for c in GOLDEN])
+def test_tokens_round_trip(case):
+    np.testing.assert_array_equal(tokens_to_dense(encode_tokens(case["state"])), _expected(case))
@@ -0,0 +1,51 @@
+from spire_env.mock_server import connect_mock, ScriptedGame
+from spire_env.logic.combat import wait_for_new_turn
+from spire_env.logic.latency import LatencyModel
+from spire_env.logic.settle import encounter_key
+from spire_env.logic.wait_engine import WaitEngine
+
+def _connect(**kwargs):
+    conn = connect_mock(ScriptedGame.demo(max_turns=40), log_filename="test_wait.txt", **kwargs)
+    # 每个测试一份不存盘的延迟模型，不和别的测试共享样本
+    conn.wait_engine = WaitEngine(conn, latency=LatencyModel(""))
+    return conn
+
+def _send(conn, cmd):
+    return conn.wait_for_response(conn.send_command(cmd), timeout=2.0)
+
+def _end_turn(conn, state):
+    wait_for_new_turn(conn, state, ticket=conn.send_command("end"))
+    return _send(conn, "state")
+
+def test_slow_turn_after_fast_ones_is_waited_out():
+    conn = _connect(latency_by_command={"end": 0.0})
+    try:
+        for cmd in ("start", "choose 0", "choose 0"):
+            state = _send(conn, cmd)
+        assert state.turn == 1 and encounter_key(state) == "Cultist"
+
+        for _ in range(25):
+            state = _end_turn(conn, state)
+        assert state.turn == 26
+        latency = conn.wait_engine.latency
+        # 一串快回合之后，只按分位数推导的超时已经比下面这个慢回合短了
+        assert latency.timeout("COMBAT", "end", "Cultist", 60.0) < 1.0
+
+        conn.mock_server.latency_by_command["end"] = 1.0
+        state = _end_turn(conn, state)
+        assert state.turn == 27
+        assert conn.wait_engine.stats()["new_turn"]["timeouts"] == 0
+    finally:
+        conn.close()
+
+def test_end_latency_is_keyed_by_encounter():
+    latency = LatencyModel("")
+    for _ in range(30):
+        latency.observe("COMBAT", "end", "Cultist", 0.02)
+    for _ in range(30):
+        latency.observe("COMBAT", "end", "Hexaghost", 3.0)
+    assert latency.timeout("COMBAT", "end", "Cultist", 60.0) < 1.0
+    assert latency.timeout("COMBAT", "end", "Hexaghost", 60.0) > 9.0
+    # 下限只抬高，不超过上限
+    assert latency.timeout("COMBAT", "end", "Cultist", 60.0, floor=10.0) == 10.0
+    assert latency.timeout("COMBAT", "end", "Cultist", 5.0, floor=10.0) == 5.0
@@ -0,0 +1,97 @@
+"""
+Actor / Learner 分离训练 (见 spire_env/actor_learner.py)
+每个游戏一个 actor 进程，各自在 SPIRE_BROKER_ADDRESS 派生出的地址上等 relay 连入：
+    第 i 个游戏的 relay:  --address /tmp/spire_broker_<i>.sock   (TCP 则为 port+i)
+    python train_async.py --actors 4
+不开游戏、用本地战斗模拟器跑通整条链路:
+    python train_async.py --actors 2 --mock
+"""
+import os
+import argparse
+from functools import partial
+
+import numpy as np
+from gymnasium import spaces
+from sb3_contrib import MaskablePPO
+from stable_baselines3.common.logger import configure
+
+from spire_env.definitions import ObservationConfig, ActionConfig
+from spire_env.relay import DEFAULT_ADDRESS
+from spire_env.broker import indexed_address, make_broker_env
+from spire_env.actor_learner import Learner, spaces_only_env
+
+n_steps = 512 # 每个 actor 每段的步数；总的一次更新 = n_steps * actor 数
+
+def mock_env(seed):
+    """actor 进程里用：连到本进程内的 SimGame 替身"""
+    from spire_env.env import SlayTheSpireEnv
+    from spire_env.mock_server import connect_mock
+    from spire_env.sim.combat import SimGame
+    return SlayTheSpireEnv(conn=connect_mock(SimGame(seed=seed), mailbox=True, log_filename=f"ai_debug_log_{seed}.txt"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Actor/Learner 分离训练")
+    parser.add_argument("--actors", type=int, default=int(os.environ.get("SPIRE_NUM_GAMES", "2")))
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="broker 基础地址，第 i 个 actor 用 indexed_address(address, i)")
+    parser.add_argument("--mock", action="store_true", help="不连游戏，actor 用本地 SimGame")
+    parser.add_argument("--slots", type=int, default=2, help="每个 actor 的共享内存环形缓冲槽位数")
+    parser.add_argument("--timesteps", type=int, default=500000)
+    parser.add_argument("--device", default="cuda")
+    args = parser.parse_args()
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    models_dir = os.path.join(current_dir, "models")
+    logs_dir = os.path.join(current_dir, "logs", "sb3_async")
+    os.makedirs(models_dir, exist_ok=True)
+    os.makedirs(logs_dir, exist_ok=True)
+    latest_model_path = os.path.join(models_dir, "spire_ai_latest.zip")
+
+    if args.mock:
+        factories = [partial(mock_env, i) for i in range(args.actors)]
+    else:
+        factories = [partial(make_broker_env, indexed_address(args.address, i), i) for i in range(args.actors)]
+        for i in range(args.actors):
+            print(f">>> actor{i} 等待 relay: {indexed_address(args.address, i)}")
+
+    # learner 只需要空间信息，和 SlayTheSpireEnv 保持一致
+    observation_space = spaces.Box(low=-5.0, high=1000.0, shape=(ObservationConfig.SIZE,), dtype=np.float32)
+    action_space = spaces.Discrete(ActionConfig.TOTAL_ACTIONS)
+    env = spaces_only_env(args.actors, observation_space, action_space)
+
+    model, reset_timesteps = None, True
+    if os.path.exists(latest_model_path) and not args.mock:
+        try:
+            model = MaskablePPO.load(latest_model_path, env=env, device=args.device, n_steps=n_steps)
+            reset_timesteps = False
+            print(">>> 模型加载完毕，继续之前的训练进度 <<<")
+        except Exception as e:
+            print(f"模型加载失败，将重新开始: {e}")
+            model = None
+    if model is None:
+        model = MaskablePPO(
+            "MlpPolicy",
+            env,
+            verbose=1,
+            device=args.device,
+            learning_rate=3e-4,
+            gamma=0.995,
+            ent_coef=0.02,
+            batch_size=256,
+            n_steps=n_steps,
+            policy_kwargs=dict(net_arch=[512, 512]),
+        )
+    model.set_logger(configure(logs_dir, ["stdout", "csv", "tensorboard"]))
+
+    learner = Learner(model, factories, slots=args.slots)
+    save_path = None if args.mock else latest_model_path
+    try:
+        learner.learn(args.timesteps, reset_num_timesteps=reset_timesteps, save_path=save_path)
+    except KeyboardInterrupt:
+        print("检测到 Ctrl+C，正在保存...")
+    finally:
+        learner.close()
+        if save_path:
+            model.save(save_path)
+
+if __name__ == '__main__':
+    main()
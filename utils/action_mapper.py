@@ -1,4 +1,5 @@
 from spire_env.definitions import ActionConfig
+from spire_env.state import as_state
 
 class ActionMapper:
     def __init__(self):
@@ -9,26 +10,23 @@ class ActionMapper:
         [精准掩码 V2]
         根据 ActionConfig (67维) 生成合法动作掩码。
         能够区分指向性卡牌和非指向性卡牌。
+        :param state: GameState 视图 (原始 dict 也行，会先建成视图)
         """
         mask = [False] * self.cfg.TOTAL_ACTIONS
+        state = as_state(state)
         if not state: return mask
         
-        cmds = state.get('available_commands', [])
-        game = state.get('game_state', {})
+        cmds = state.command_set
         
         # --- 场景 A: 战斗 (Combat) ---
         if 'play' in cmds:
-            combat = game.get('combat_state', {})
-            hand = combat.get('hand', [])
-            monsters = combat.get('monsters', [])
-            player = combat.get('player', {})
-            energy = player.get('energy', 0)
+            hand = state.hand
+            energy = state.energy
+            # 可以被选为目标的怪物 (活着且不是半死状态)，建视图时已算好
+            targets = state.targets
             
             # 1. 检查特殊状态 (缠身 Entangled)
-            is_entangled = False
-            for p in player.get('powers', []):
-                if p.get('id') == 'Entangled':
-                    is_entangled = True; break
+            is_entangled = state.entangled
             
             # 2. 遍历手牌 (0-9)
             for i, card in enumerate(hand):
@@ -55,11 +53,8 @@ class ActionMapper:
                 
                 if has_target:
                     # 指向性卡牌：激活所有活着的怪物对应的动作
-                    for m_idx, m in enumerate(monsters):
-                        if m_idx >= self.cfg.MAX_MONSTERS: break
-                        # 只有怪活着且不是半死状态，才能选为目标
-                        if not m.get('is_gone') and not m.get('half_dead'):
-                            mask[base_idx + m_idx] = True
+                    for m_idx in targets:
+                        mask[base_idx + m_idx] = True
                 else:
                     # 非指向性卡牌 (AOE/能力/自身Buff)：
                     # 只激活 [Target 0] 作为默认动作，其他 Target 屏蔽
@@ -67,8 +62,7 @@ class ActionMapper:
                     mask[base_idx + 0] = True
             
             # 3. 药水 (50-64)
-            potions = game.get('potions', [])
-            for i, pot in enumerate(potions):
+            for i, pot in enumerate(state.potions):
                 if i >= self.cfg.MAX_POTIONS: break
                 if not pot.get('can_use'): continue
                 if pot.get('id') == 'Potion Slot': continue
@@ -77,10 +71,8 @@ class ActionMapper:
                 requires_target = pot.get('requires_target', False)
                 
                 if requires_target:
-                    for m_idx, m in enumerate(monsters):
-                        if m_idx >= self.cfg.MAX_MONSTERS: break
-                        if not m.get('is_gone') and not m.get('half_dead'):
-                            mask[base_idx + m_idx] = True
+                    for m_idx in targets:
+                        mask[base_idx + m_idx] = True
                 else:
                     mask[base_idx + 0] = True
             
@@ -90,21 +82,18 @@ class ActionMapper:
 
         # --- 场景 B: 选择 (Choice) ---
         elif 'choose' in cmds:
-            choices = game.get('choice_list', [])
             # 复用卡牌动作的前 N 个位置
             # Action 0 -> choose 0, Action 1 -> choose 1 ...
-            for i in range(len(choices)):
-                if i < self.cfg.TOTAL_ACTIONS:
-                    mask[i] = True
+            for i in range(min(len(state.choices), self.cfg.TOTAL_ACTIONS)):
+                mask[i] = True
             
             # 允许取消/跳过
-            prio_cmds = ['cancel', 'leave', 'return', 'proceed', 'skip', 'confirm']
-            if any(c in cmds for c in prio_cmds):
+            if state.has('cancel', 'leave', 'return', 'proceed', 'skip', 'confirm'):
                 mask[self.cfg.END_TURN_IDX] = True
                 mask[self.cfg.CANCEL_IDX] = True
 
         # --- 场景 C: 纯过场 ---
-        elif any(c in cmds for c in ['proceed', 'confirm', 'leave', 'skip', 'return', 'start']):
+        elif state.has('proceed', 'confirm', 'leave', 'skip', 'return', 'start'):
             mask[self.cfg.END_TURN_IDX] = True
             if 'return' in cmds or 'cancel' in cmds:
                 mask[self.cfg.CANCEL_IDX] = True
@@ -119,8 +108,9 @@ class ActionMapper:
         """
         将 0-66 的数字翻译回游戏指令
         """
+        state = as_state(state)
         if not state: return "state"
-        cmds = state.get('available_commands', [])
+        cmds = state.command_set
         
         # 1. 通用指令 (End/Confirm)
         if action == self.cfg.END_TURN_IDX:
@@ -142,7 +132,7 @@ class ActionMapper:
                 target_idx = action % self.cfg.MAX_MONSTERS
                 
                 # 越界检查
-                hand = state['game_state']['combat_state']['hand']
+                hand = state.hand
                 if card_idx >= len(hand): return None
                 
                 card = hand[card_idx]
@@ -177,7 +167,7 @@ class ActionMapper:
             c_idx = action // self.cfg.MAX_MONSTERS
             t_idx = action % self.cfg.MAX_MONSTERS
             try:
-                c_name = state['game_state']['combat_state']['hand'][c_idx]['name']
+                c_name = as_state(state).hand[c_idx]['name']
                 return f"打出: {c_name} (目标{t_idx})"
             except:
                 return f"卡牌 {c_idx} (目标{t_idx})"
@@ -1,156 +1,401 @@
 # state_encoder.py
-import numpy as np
+"""
+CommunicationMod 状态 -> 定长观察向量 (布局见 definitions.ObservationConfig)
+各段偏移在导入时算好，卡牌/遗物等 id 第一次出现时查表并缓存，
+编码时通过 memoryview 直接按下标写非零位置 (比逐个 numpy 标量赋值快一倍，全 0 的位置不写)。
+    encode_state(state)    -> (SIZE,)
+    encode_states(states)  -> (N, SIZE)  批量版，整批只分配一次、写一次
+    encode_tokens(state)   -> dict       稀疏模式：卡/怪/意图是整数 id，其余数值放进小的 dense 块
+state 是 GameState 视图 (spire_env/state.py)；传原始 dict 也行，会先建成视图。
+"""
+import math
+from operator import itemgetter
 import zlib # [优化] 移到这里
+import numpy as np
 from spire_env.definitions import ObservationConfig
+from spire_env.state import as_state
+from spire_env.diff import section_changed as _changed
 from spire_env.vocabulary import get_card_index, get_monster_index, get_intent_index, VOCAB_SIZE, VOCAB_MONSTER_SIZE, VOCAB_INTENT_SIZE
 
 # 引用计算好的总长度
 OBSERVATION_SIZE = ObservationConfig.SIZE
 
-def encode_state(state):
-    # 初始化全 0 向量
-    obs = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
-    
-    if not state or 'game_state' not in state:
-        return obs
+# --- 各段起点 (顺序与 ObservationConfig 一致) ---
+OFF_PLAYER = 0
+OFF_HAND = OFF_PLAYER + ObservationConfig.PLAYER_SIZE
+OFF_MONSTER = OFF_HAND + ObservationConfig.HAND_SIZE
+OFF_RELIC = OFF_MONSTER + ObservationConfig.MONSTER_SIZE
+OFF_PILE = OFF_RELIC + ObservationConfig.RELIC_SIZE
+OFF_GLOBAL = OFF_PILE + ObservationConfig.PILE_SIZE
+OFF_POTION = OFF_GLOBAL + ObservationConfig.GLOBAL_SIZE
+OFF_SCREEN = OFF_POTION + ObservationConfig.POTION_SIZE
+assert OFF_SCREEN + ObservationConfig.SCREEN_SIZE == OBSERVATION_SIZE
+
+HAND_STRIDE = ObservationConfig.HAND_FEATURE_SIZE
+MONSTER_STRIDE = ObservationConfig.MONSTER_FEATURE_SIZE
+MONSTER_INTENT_OFF = 3                      # 怪物段内：3 个基础值之后是意图 One-Hot
+MONSTER_ID_OFF = 3 + VOCAB_INTENT_SIZE      # 再之后是身份 One-Hot
+
+# 玩家段内的位置
+_P_HP, _P_DYING, _P_ENERGY, _P_BLOCK, _P_POWERS = 0, 1, 2, 8, 9
+_PLAYER_POWERS = ('Strength', 'Dexterity', 'Vulnerable', 'Weak', 'Frail')
+
+_CARD_TYPE_SLOT = {'ATTACK': 1, 'SKILL': 2, 'POWER': 3} # 手牌特征里类型标志的位置
+
+SCREENS = ['NONE', 'COMBAT', 'MAP', 'EVENT', 'SHOP', 'REST', 'COMBAT_REWARD', 'BOSS_REWARD']
+_SCREEN_INDEX = {s: i for i, s in enumerate(SCREENS)}
+
+# CommunicationMod 的卡牌/怪物字典字段是齐全的，一次 itemgetter 在 C 里取完；缺字段时退回 .get
+_CARD_FIELDS = itemgetter('cost', 'type', 'upgrades', 'id')
+_MONSTER_FIELDS = itemgetter('is_gone', 'half_dead', 'current_hp', 'block', 'move_adjusted_damage', 'intent', 'id')
+_TYPE = itemgetter('type')
+_ID = itemgetter('id')
+
+# --- id -> 下标 缓存 (词表外的 id 也会被缓存成 UNKNOWN 的下标) ---
+_card_cache = {}
+_monster_cache = {}
+_intent_cache = {}
+_relic_cache = {}
+
+def _card_index(card_id):
+    idx = _card_cache.get(card_id)
+    if idx is None:
+        idx = _card_cache[card_id] = get_card_index(card_id)
+    return idx
 
-    game_state = state['game_state']
-    combat_state = game_state.get('combat_state', {})
-    player = combat_state.get('player', {})
-    cmds = state.get('available_commands', [])
+def _monster_index(m_id):
+    idx = _monster_cache.get(m_id)
+    if idx is None:
+        idx = _monster_cache[m_id] = get_monster_index(m_id)
+    return idx
 
-    # --- 指针 ---
-    cursor = 0
+def _intent_index(intent):
+    idx = _intent_cache.get(intent)
+    if idx is None:
+        idx = _intent_cache[intent] = get_intent_index(intent)
+    return idx
 
-    # 1. 玩家信息 (14维) [重要：definitions.py 需预留 14]
-    # A. 血量 (2)
+def _relic_value(relic_id):
+    v = _relic_cache.get(relic_id)
+    if v is None:
+        v = _relic_cache[relic_id] = (zlib.crc32(relic_id.encode('utf-8')) % 100) / 100.0
+    return v
+
+# --- 分段写入：每段只看自己的源字段，pos 是该段在目标向量里的起点 ---
+def _write_player(mv, pos, player):
+    """1. 玩家信息 (14维)"""
     hp_ratio = player.get('current_hp', 0) / max(1, player.get('max_hp', 80))
-    obs[cursor] = hp_ratio
-    # 濒死信号
-    obs[cursor+1] = 1.0 if hp_ratio < 0.15 else 0.0
-    cursor += 2
-
-    # B. 能量 (6) - One-Hot (0-5)
-    e = player.get('energy', 0)
-    e_idx = min(max(0, e), 5)
-    obs[cursor + e_idx] = 1.0
-    cursor += 6
-
-    # C. 格挡 (1)
-    obs[cursor] = player.get('block', 0) / 50.0
-    cursor += 1
-    
-    # D. 状态 (5)
-    powers = player.get('powers', [])
-    def get_pow(pid):
+    mv[pos + _P_HP] = hp_ratio
+    if hp_ratio < 0.15:
+        mv[pos + _P_DYING] = 1.0
+    mv[pos + _P_ENERGY + min(max(0, player.get('energy', 0)), 5)] = 1.0
+    mv[pos + _P_BLOCK] = player.get('block', 0) / 50.0
+    powers = player.get('powers')
+    if powers:
+        pw = {}
         for p in powers:
-            if p['id'] == pid: return p['amount']
-        return 0
-
-    obs[cursor] = get_pow('Strength') / 10.0
-    obs[cursor+1] = get_pow('Dexterity') / 10.0
-    obs[cursor+2] = 1.0 if get_pow('Vulnerable') > 0 else 0.0
-    obs[cursor+3] = 1.0 if get_pow('Weak') > 0 else 0.0
-    obs[cursor+4] = 1.0 if get_pow('Frail') > 0 else 0.0
-    cursor += 5
-
-    # 2. 手牌信息 (10 * (5 + VOCAB_SIZE))
-    hand = combat_state.get('hand', [])
-    for i in range(10):
-        if i < len(hand):
-            card = hand[i]
-            # [基础特征 5个]
-            obs[cursor] = card.get('cost', 0) / 3.0
-            ctype = card.get('type', 'UNKNOWN')
-            obs[cursor+1] = 1.0 if ctype == 'ATTACK' else 0.0
-            obs[cursor+2] = 1.0 if ctype == 'SKILL' else 0.0
-            obs[cursor+3] = 1.0 if ctype == 'POWER' else 0.0
-            obs[cursor+4] = 1.0 if card.get('upgrades', 0) > 0 else 0.0
-            
-            # [身份特征 VOCAB_SIZE个] -> One-Hot
-            card_idx = get_card_index(card.get('id', ''))
-            if 0 <= card_idx < VOCAB_SIZE:
-                obs[cursor + 5 + card_idx] = 1.0
-            
-        cursor += ObservationConfig.HAND_FEATURE_SIZE
-
-    # 3. 怪物信息 (25)
-    monsters = combat_state.get('monsters', [])
-    for i in range(5):
-        if i < len(monsters):
-            m = monsters[i]
-            # 只有活着的怪才编码，死的怪全是 0
-            if not m.get('is_gone') and not m.get('half_dead'):
-                
-                # A. 基础数值 (3维)
-                obs[cursor] = m.get('current_hp', 0) / 100.0
-                obs[cursor+1] = m.get('block', 0) / 50.0
-                # 伤害值 (0-50 归一化)
-                dmg = m.get('move_adjusted_damage', 0)
-                obs[cursor+2] = dmg / 50.0
-                
-                # B. 意图 One-Hot (VOCAB_INTENT_SIZE)
-                intent = m.get('intent', 'UNKNOWN')
-                intent_idx = get_intent_index(intent)
-                if 0 <= intent_idx < VOCAB_INTENT_SIZE:
-                    obs[cursor + 3 + intent_idx] = 1.0
-                
-                # C. 怪物身份 One-Hot (VOCAB_MONSTER_SIZE)
-                # 偏移量 = 3(基础) + 意图长度
-                mid_offset = 3 + VOCAB_INTENT_SIZE
-                m_id = m.get('id', '')
-                m_idx = get_monster_index(m_id)
-                if 0 <= m_idx < VOCAB_MONSTER_SIZE:
-                    obs[cursor + mid_offset + m_idx] = 1.0
-                    
-        # 移动指针
-        cursor += ObservationConfig.MONSTER_FEATURE_SIZE
-
-    # 4. 遗物 (10)
-    relics = game_state.get('relics', [])
-    for i in range(10):
-        if i < len(relics):
-            obs[cursor] = (zlib.crc32(relics[i].get('id','').encode('utf-8')) % 100) / 100.0
-        cursor += 1
-
-    # 5. 牌堆统计 (12)
-    draw = combat_state.get('draw_pile', [])
-    discard = combat_state.get('discard_pile', [])
-    
-    obs[cursor] = len(draw) / 30.0
-    obs[cursor+1] = len(discard) / 30.0
-    
-    def count_stats(pile):
-        a = len([c for c in pile if c.get('type')=='ATTACK'])
-        s = len([c for c in pile if c.get('type')=='SKILL'])
-        p = len([c for c in pile if c.get('type')=='POWER'])
-        return a/20.0, s/20.0, p/20.0, 0.0, 0.0 
-    
-    obs[cursor+2:cursor+7] = count_stats(draw)
-    obs[cursor+7:cursor+12] = count_stats(discard)
-    cursor += 12
-
-    # 6. 全局 (2)
-    gold = game_state.get('gold', 0)
-    # [优化] 使用 Log10 处理金币
-    obs[cursor] = np.log10(gold + 1) / 4.0
-    obs[cursor+1] = game_state.get('floor', 0) / 50.0
-    cursor += 2
-
-    # 7. 药水 (3)
-    potions = game_state.get('potions', [])
-    for i in range(3):
-        if i < len(potions) and potions[i].get('id') != 'Potion Slot':
-            obs[cursor] = 1.0 
-        cursor += 1
-        
-    # 8. 屏幕类型 (8)
-    raw_screen = game_state.get('screen_type', 'NONE')
-    if 'play' in cmds or 'end' in cmds: raw_screen = 'COMBAT'
-    
-    screens = ['NONE', 'COMBAT', 'MAP', 'EVENT', 'SHOP', 'REST', 'COMBAT_REWARD', 'BOSS_REWARD']
-    for s in screens:
-        obs[cursor] = 1.0 if raw_screen == s else 0.0
-        cursor += 1
-
-    return obs
\ No newline at end of file
+            pw.setdefault(p['id'], p['amount']) # 同名取第一个
+        for k, pid in enumerate(_PLAYER_POWERS):
+            amount = pw.get(pid, 0)
+            if amount:
+                mv[pos + _P_POWERS + k] = amount / 10.0 if k < 2 else (1.0 if amount > 0 else 0.0)
+
+def _write_hand(mv, pos, hand, stride=HAND_STRIDE, tokens=None):
+    """
+    2. 手牌 (10 * stride)：每张 5 个基础特征 + 身份 One-Hot
+    tokens 给出时 (token 模式) 不写 One-Hot，改为 tokens[k] = 卡牌下标 + 1
+    """
+    for k, card in enumerate(hand[:10]):
+        try:
+            cost, ctype, upgrades, cid = _CARD_FIELDS(card)
+        except KeyError:
+            cost, ctype, upgrades, cid = card.get('cost', 0), card.get('type'), card.get('upgrades', 0), card.get('id', '')
+        mv[pos] = cost / 3.0
+        slot = _CARD_TYPE_SLOT.get(ctype)
+        if slot:
+            mv[pos + slot] = 1.0
+        if upgrades > 0:
+            mv[pos + 4] = 1.0
+        idx = _card_cache.get(cid)
+        if idx is None:
+            idx = _card_index(cid)
+        if tokens is None:
+            mv[pos + 5 + idx] = 1.0
+        else:
+            tokens[k] = idx + 1
+        pos += stride
+
+def _write_monster(mv, pos, m, tokens=None):
+    """
+    3. 单个怪物 (MONSTER_STRIDE)，死掉/半死的怪整段为 0
+    tokens=(怪物 id 视图, 意图 id 视图, 槽位) 时 (token 模式) 只写 3 个数值，身份/意图写成 id + 1
+    """
+    try:
+        gone, half_dead, hp, block, dmg, intent, m_id = _MONSTER_FIELDS(m)
+    except KeyError:
+        gone, half_dead = m.get('is_gone'), m.get('half_dead')
+        hp, block, dmg = m.get('current_hp', 0), m.get('block', 0), m.get('move_adjusted_damage', 0)
+        intent, m_id = m.get('intent', 'UNKNOWN'), m.get('id', '')
+    if not gone and not half_dead:
+        mv[pos] = hp / 100.0
+        mv[pos + 1] = block / 50.0
+        mv[pos + 2] = dmg / 50.0
+        if tokens is None:
+            mv[pos + MONSTER_INTENT_OFF + _intent_index(intent)] = 1.0
+            mv[pos + MONSTER_ID_OFF + _monster_index(m_id)] = 1.0
+        else:
+            monster_ids, intent_ids, i = tokens
+            monster_ids[i] = _monster_index(m_id) + 1
+            intent_ids[i] = _intent_index(intent) + 1
+
+def _write_relics(mv, pos, relics):
+    """4. 遗物 (10)"""
+    for relic in relics[:10]:
+        relic_id = relic.get('id', '')
+        v = _relic_cache.get(relic_id)
+        mv[pos] = v if v is not None else _relic_value(relic_id)
+        pos += 1
+
+def _write_piles(mv, pos, draw, discard):
+    """5. 牌堆统计 (12)：张数 + 攻击/技能/能力 张数 (后两格留空)"""
+    mv[pos] = len(draw) / 30.0
+    mv[pos + 1] = len(discard) / 30.0
+    for start, pile in ((pos + 2, draw), (pos + 7, discard)):
+        if pile:
+            try:
+                types = list(map(_TYPE, pile))
+            except KeyError:
+                types = [c.get('type') for c in pile]
+            mv[start] = types.count('ATTACK') / 20.0
+            mv[start + 1] = types.count('SKILL') / 20.0
+            mv[start + 2] = types.count('POWER') / 20.0
+
+def _write_global(mv, pos, gold, floor):
+    """6. 全局 (2)：金币 Log10 缩放、层数"""
+    mv[pos] = math.log10(gold + 1) / 4.0
+    mv[pos + 1] = floor / 50.0
+
+def _write_potions(mv, pos, potions):
+    """7. 药水 (3)"""
+    for potion in potions[:3]:
+        if potion.get('id') != 'Potion Slot':
+            mv[pos] = 1.0
+        pos += 1
+
+def _write_screen(mv, pos, screen):
+    """8. 屏幕类型 (8)"""
+    k = _SCREEN_INDEX.get(screen)
+    if k is not None:
+        mv[pos + k] = 1.0
+
+def _write(state, mv, base):
+    """把一个状态 (GameState) 的非零特征写进 mv[base : base+SIZE] (mv 是清零过的 float32 memoryview)"""
+    _write_player(mv, base + OFF_PLAYER, state.player)
+    _write_hand(mv, base + OFF_HAND, state.hand)
+    pos = base + OFF_MONSTER
+    for m in state.monsters[:5]:
+        _write_monster(mv, pos, m)
+        pos += MONSTER_STRIDE
+    _write_relics(mv, base + OFF_RELIC, state.relics)
+    _write_piles(mv, base + OFF_PILE, state.draw_pile, state.discard_pile)
+    _write_global(mv, base + OFF_GLOBAL, state.gold, state.floor)
+    _write_potions(mv, base + OFF_POTION, state.potions)
+    _write_screen(mv, base + OFF_SCREEN, state.screen_key)
+
+def _valid(state):
+    """dict / GameState / None -> 可编码的 GameState，无效状态 (None / 没有 game_state) 返回 None"""
+    state = as_state(state)
+    return state if state is not None and state.in_game else None
+
+def encode_state(state, out=None):
+    """
+    :param out: 可选的 (SIZE,) float32 数组，传入则原地清零后写入 (省一次分配)
+    """
+    if out is None:
+        obs = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+    else:
+        obs = out
+        obs.fill(0.0)
+    state = _valid(state)
+    if state is not None:
+        _write(state, memoryview(obs), 0)
+    return obs
+
+def encode_states(states, out=None):
+    """批量编码 -> (N, SIZE)；无效状态 (None / 没有 game_state) 对应全 0 行"""
+    n = len(states)
+    if out is None:
+        obs = np.zeros((n, OBSERVATION_SIZE), dtype=np.float32)
+    else:
+        obs = out
+        obs.fill(0.0)
+    mv = memoryview(obs.reshape(-1))
+    for i, state in enumerate(states):
+        state = _valid(state)
+        if state is not None:
+            _write(state, mv, i * OBSERVATION_SIZE)
+    return obs
+
+# --- 稀疏 (token) 模式 ---
+# dense 块布局：玩家 | 手牌数值 10x5 | 怪物数值 5x3 | 遗物 | 牌堆 | 全局 | 药水 | 屏幕 (各段含义同上)
+D_OFF_HAND = ObservationConfig.PLAYER_SIZE
+D_OFF_MONSTER = D_OFF_HAND + ObservationConfig.TOKEN_HAND * ObservationConfig.HAND_NUMERIC_SIZE
+D_OFF_RELIC = D_OFF_MONSTER + ObservationConfig.TOKEN_MONSTERS * ObservationConfig.MONSTER_NUMERIC_SIZE
+D_OFF_PILE = D_OFF_RELIC + ObservationConfig.RELIC_SIZE
+D_OFF_GLOBAL = D_OFF_PILE + ObservationConfig.PILE_SIZE
+D_OFF_POTION = D_OFF_GLOBAL + ObservationConfig.GLOBAL_SIZE
+D_OFF_SCREEN = D_OFF_POTION + ObservationConfig.POTION_SIZE
+assert D_OFF_SCREEN + ObservationConfig.SCREEN_SIZE == ObservationConfig.DENSE_SIZE
+
+# token 的取值上限 (含 0 = 空位)
+TOKEN_CARD_VOCAB = VOCAB_SIZE + 1
+TOKEN_MONSTER_VOCAB = VOCAB_MONSTER_SIZE + 1
+TOKEN_INTENT_VOCAB = VOCAB_INTENT_SIZE + 1
+
+def encode_tokens(state):
+    """
+    token 模式的观察：{'cards': (10,), 'monsters': (5,), 'intents': (5,) 整数 id, 'dense': (DENSE_SIZE,) float32}
+    id 为 0 表示空位；数值特征与 encode_state 完全相同，只是去掉了 One-Hot
+    """
+    obs = {
+        'cards': np.zeros(ObservationConfig.TOKEN_HAND, dtype=np.int64),
+        'monsters': np.zeros(ObservationConfig.TOKEN_MONSTERS, dtype=np.int64),
+        'intents': np.zeros(ObservationConfig.TOKEN_MONSTERS, dtype=np.int64),
+        'dense': np.zeros(ObservationConfig.DENSE_SIZE, dtype=np.float32),
+    }
+    state = _valid(state)
+    if state is None:
+        return obs
+    mv = memoryview(obs['dense'])
+    _write_player(mv, 0, state.player)
+    _write_hand(mv, D_OFF_HAND, state.hand,
+                stride=ObservationConfig.HAND_NUMERIC_SIZE, tokens=memoryview(obs['cards']))
+    monster_tokens = (memoryview(obs['monsters']), memoryview(obs['intents']))
+    pos = D_OFF_MONSTER
+    for i, m in enumerate(state.monsters[:5]):
+        _write_monster(mv, pos, m, tokens=monster_tokens + (i,))
+        pos += ObservationConfig.MONSTER_NUMERIC_SIZE
+    _write_relics(mv, D_OFF_RELIC, state.relics)
+    _write_piles(mv, D_OFF_PILE, state.draw_pile, state.discard_pile)
+    _write_global(mv, D_OFF_GLOBAL, state.gold, state.floor)
+    _write_potions(mv, D_OFF_POTION, state.potions)
+    _write_screen(mv, D_OFF_SCREEN, state.screen_key)
+    return obs
+
+def tokens_to_dense(obs):
+    """token 观察还原成 encode_state 的稠密向量 (对拍/可视化用)"""
+    C = ObservationConfig
+    out = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+    dense = obs['dense']
+    out[:C.PLAYER_SIZE] = dense[:C.PLAYER_SIZE]
+    for k in range(C.TOKEN_HAND):
+        pos = OFF_HAND + k * HAND_STRIDE
+        out[pos:pos + 5] = dense[D_OFF_HAND + 5 * k:D_OFF_HAND + 5 * k + 5]
+        if obs['cards'][k]:
+            out[pos + 5 + obs['cards'][k] - 1] = 1.0
+    for i in range(C.TOKEN_MONSTERS):
+        pos = OFF_MONSTER + i * MONSTER_STRIDE
+        out[pos:pos + 3] = dense[D_OFF_MONSTER + 3 * i:D_OFF_MONSTER + 3 * i + 3]
+        if obs['monsters'][i]:
+            out[pos + MONSTER_INTENT_OFF + obs['intents'][i] - 1] = 1.0
+            out[pos + MONSTER_ID_OFF + obs['monsters'][i] - 1] = 1.0
+    out[OFF_RELIC:] = dense[D_OFF_RELIC:]
+    return out
+
+_ZEROS = memoryview(np.zeros(OBSERVATION_SIZE, dtype=np.float32))
+_SECTION_NAMES = ('player', 'hand', 'monsters', 'global', 'screen') # 参与比较的段
+
+_MONSTER_KEYS = tuple(f'monster{i}' for i in range(5))
+
+
+class IncrementalEncoder:
+    """
+    逐步编码：记住上一步的向量和各段的源字段，玩家 / 手牌 / 每只怪 / 全局 / 屏幕 只在源字段变了时重编。
+    源字段用 == 比较 (C 里逐层比较，比这几段重新编码便宜 3~10 倍)；同一个 dict/list 对象可能被原地改过，一律算变了。
+    遗物/牌堆/药水的比较不比重编便宜，每步照常重写。
+    每次返回内部向量的拷贝，调用方可以放心保存。
+    """
+    def __init__(self):
+        self.obs = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        self._mv = memoryview(self.obs)
+        self._prev = None # 上一步各段的源字段
+        self.encoded = dict.fromkeys(_SECTION_NAMES, 0) # 各段实际重编次数 (怪物按只计)
+        self.calls = 0
+
+    def reset(self):
+        """换局/状态不连续时调用，下一次全量编码"""
+        self._prev = None
+
+    def _clear(self, lo, hi):
+        self._mv[lo:hi] = _ZEROS[lo:hi]
+
+    def encode(self, state, changed=None):
+        """
+        :param changed: 可选，调用方已经知道哪些段变了 (比如 env.step 里 diff(prev, curr).sections)：
+                        {'player', 'hand', 'monster0'..'monster4', 'global', 'screen'} 的子集，
+                        给出时不再逐段比较，不在集合里的段直接沿用上一步
+        """
+        self.calls += 1
+        state = _valid(state)
+        if state is None:
+            self._prev = None
+            return np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        mv, encoded = self._mv, self.encoded
+        player = state.player
+        hand = state.hand
+        monsters = state.monsters[:5]
+        relics = state.relics
+        draw, discard = state.draw_pile, state.discard_pile
+        gold, floor = state.gold, state.floor
+        potions = state.potions
+        screen = state.screen_key
+
+        prev = self._prev
+        full = prev is None
+        if full:
+            changed = None
+            self.obs.fill(0.0)
+            prev = ({}, (), (), None, None, None)
+        p_player, p_hand, p_monsters, p_gold, p_floor, p_screen = prev
+
+        if full or (_changed(player, p_player) if changed is None else 'player' in changed):
+            if not full:
+                self._clear(OFF_PLAYER, OFF_HAND)
+            _write_player(mv, OFF_PLAYER, player)
+            encoded['player'] += 1
+        if full or (_changed(hand, p_hand) if changed is None else 'hand' in changed):
+            if not full:
+                self._clear(OFF_HAND, OFF_MONSTER)
+            _write_hand(mv, OFF_HAND, hand)
+            encoded['hand'] += 1
+        n_prev = len(p_monsters)
+        pos = OFF_MONSTER
+        for i in range(max(len(monsters), n_prev)):
+            m = monsters[i] if i < len(monsters) else None
+            old = p_monsters[i] if i < n_prev else None
+            if full or (_changed(m, old) if changed is None else _MONSTER_KEYS[i] in changed):
+                if not full:
+                    self._clear(pos, pos + MONSTER_STRIDE)
+                if m is not None:
+                    _write_monster(mv, pos, m)
+                encoded['monsters'] += 1
+            pos += MONSTER_STRIDE
+        # 遗物/牌堆/药水：逐项比较不比直接重编便宜 (牌堆比较要走遍每张卡的每个字段)，每步都重写
+        if not full:
+            self._clear(OFF_RELIC, OFF_GLOBAL)
+        _write_relics(mv, OFF_RELIC, relics)
+        _write_piles(mv, OFF_PILE, draw, discard)
+        if full or (gold != p_gold or floor != p_floor if changed is None else 'global' in changed):
+            _write_global(mv, OFF_GLOBAL, gold, floor) # 两格都会被覆盖，不用先清零
+            encoded['global'] += 1
+        if not full:
+            self._clear(OFF_POTION, OFF_SCREEN)
+        _write_potions(mv, OFF_POTION, potions)
+        if full or (screen != p_screen if changed is None else 'screen' in changed):
+            if not full:
+                self._clear(OFF_SCREEN, OBSERVATION_SIZE)
+            _write_screen(mv, OFF_SCREEN, screen)
+            encoded['screen'] += 1
+
+        self._prev = (player, hand, monsters, gold, floor, screen)
+        return self.obs.copy()